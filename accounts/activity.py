@@ -0,0 +1,251 @@
+# accounts/activity.py
+"""
+Buffered ingestion pipeline for UserActivity rows and CustomUser.last_activity.
+
+UserActivityMiddleware used to perform two synchronous writes per
+authenticated request. It now hands events to this pipeline, which:
+
+- queues UserActivity events in a bounded in-memory queue, dropping (and
+  counting) events when the queue is full instead of blocking requests;
+- coalesces last_activity updates per user, keeping only the newest timestamp;
+- flushes both with bulk_create/bulk_update from a background thread, either
+  every ACCOUNTS_ACTIVITY_FLUSH_INTERVAL seconds or as soon as
+  ACCOUNTS_ACTIVITY_BATCH_SIZE events are waiting.
+
+UserActivity.timestamp is auto_now_add, so buffered rows are stamped with the
+flush time, at most one flush interval after the request.
+
+Counters for monitoring are available from stats().
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ActivityPipeline:
+    """Bounded, batching writer for user activity"""
+
+    def __init__(self, max_queue_size=None, batch_size=None, flush_interval=None, run_async=None):
+        self.max_queue_size = max_queue_size or _setting('ACCOUNTS_ACTIVITY_QUEUE_SIZE', 10000)
+        self.batch_size = batch_size or _setting('ACCOUNTS_ACTIVITY_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or _setting('ACCOUNTS_ACTIVITY_FLUSH_INTERVAL', 5)
+        self.run_async = _setting('ACCOUNTS_ACTIVITY_ASYNC', True) if run_async is None else run_async
+
+        self._events = queue.Queue(maxsize=self.max_queue_size)
+        self._last_activity = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_flush = time.monotonic()
+
+        self._counters = {
+            'enqueued': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'written_events': 0,
+            'written_last_activity': 0,
+            'flushes': 0,
+            'backpressure_flushes': 0,
+            'flush_errors': 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def record_event(self, user_id, action, ip_address=None, user_agent=''):
+        """Queue a UserActivity row; returns False if it was dropped"""
+        event = {
+            'user_id': user_id,
+            'action': action[:50],
+            'ip_address': ip_address,
+            'user_agent': (user_agent or '')[:500],
+        }
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            self._count('dropped')
+            self._trigger()
+            return False
+
+        self._count('enqueued')
+        if self._events.qsize() >= self.batch_size:
+            self._count('backpressure_flushes')
+            self._trigger()
+        else:
+            self._maybe_trigger()
+        return True
+
+    def touch_user(self, user_id, timestamp):
+        """Record a last_activity timestamp, keeping only the newest per user"""
+        with self._lock:
+            previous = self._last_activity.get(user_id)
+            if previous is not None:
+                self._counters['coalesced'] += 1
+                if previous >= timestamp:
+                    return
+            elif len(self._last_activity) >= self.max_queue_size:
+                self._counters['dropped'] += 1
+                return
+            self._last_activity[user_id] = timestamp
+        self._maybe_trigger()
+
+    def _maybe_trigger(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._trigger()
+
+    def _trigger(self):
+        if self.run_async:
+            self._ensure_thread()
+            self._wakeup.set()
+        else:
+            self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='accounts-activity-writer', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # The writer thread owns its own DB connection
+                close_old_connections()
+
+    def _drain(self):
+        events = []
+        while len(events) < self.max_queue_size:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            last_activity, self._last_activity = self._last_activity, {}
+        return events, last_activity
+
+    def flush(self):
+        """Write everything queued so far; safe to call from any thread"""
+        from .models import CustomUser
+
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            events, last_activity = self._drain()
+            if not events and not last_activity:
+                return 0
+
+            written_events = 0
+            if events:
+                try:
+                    written_events = self._write_events(events)
+                except Exception as e:
+                    self._count('flush_errors')
+                    logger.error(f"Error flushing {len(events)} activity events: {str(e)}")
+                self._count('dropped', len(events) - written_events)
+
+            written_last_activity = 0
+            if last_activity:
+                try:
+                    # Rows of deleted users simply match nothing
+                    users = [
+                        CustomUser(pk=user_id, last_activity=timestamp)
+                        for user_id, timestamp in last_activity.items()
+                    ]
+                    CustomUser.objects.bulk_update(users, ['last_activity'], batch_size=self.batch_size)
+                    written_last_activity = len(last_activity)
+                except Exception as e:
+                    self._count('flush_errors')
+                    self._count('dropped', len(last_activity))
+                    logger.error(f"Error flushing {len(last_activity)} last_activity updates: {str(e)}")
+
+            with self._lock:
+                self._counters['flushes'] += 1
+                self._counters['written_events'] += written_events
+                self._counters['written_last_activity'] += written_last_activity
+            return written_events + written_last_activity
+
+    def _write_events(self, events):
+        """
+        bulk_create the events; returns how many were written.
+
+        If the batch violates a constraint, which in practice means an event
+        for a user deleted since the request, the events of missing users
+        are dropped and the rest written again.
+        """
+        from .models import CustomUser, UserActivity
+
+        try:
+            with transaction.atomic():
+                UserActivity.objects.bulk_create(
+                    [UserActivity(**event) for event in events], batch_size=self.batch_size
+                )
+            return len(events)
+        except IntegrityError:
+            user_ids = {str(event['user_id']) for event in events}
+            existing = {
+                str(pk) for pk in CustomUser.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+            }
+            events = [event for event in events if str(event['user_id']) in existing]
+            with transaction.atomic():
+                UserActivity.objects.bulk_create(
+                    [UserActivity(**event) for event in events], batch_size=self.batch_size
+                )
+            return len(events)
+
+    def stats(self):
+        """Snapshot of pipeline counters for monitoring"""
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot['pending_last_activity'] = len(self._last_activity)
+        snapshot['queue_depth'] = self._events.qsize()
+        snapshot['queue_capacity'] = self.max_queue_size
+        snapshot['writer_alive'] = bool(self._thread and self._thread.is_alive())
+        return snapshot
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """Return the process-wide pipeline, creating it on first use"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = ActivityPipeline()
+    return _pipeline
+
+
+def stats():
+    return get_pipeline().stats()
+
+
+@atexit.register
+def _flush_on_exit():
+    if _pipeline is not None:
+        try:
+            _pipeline.flush()
+        except Exception as e:
+            logger.error(f"Error flushing activity pipeline on exit: {str(e)}")
@@ -1,25 +1,36 @@
 # accounts/middleware.py
+from datetime import timedelta
+from django.conf import settings
 from django.utils import timezone
-from .models import UserActivity, SiteSettings
+from .models import SiteSettings
+from .activity import get_pipeline
 
 class UserActivityMiddleware:
-    """Middleware to track user activity"""
+    """Middleware to track user activity through the buffered activity pipeline"""
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.last_activity_interval = timedelta(
+            seconds=getattr(settings, 'ACCOUNTS_LAST_ACTIVITY_INTERVAL', 300)
+        )
 
     def __call__(self, request):
         response = self.get_response(request)
         
         if request.user.is_authenticated:
-            # Update last activity
-            request.user.last_activity = timezone.now()
-            request.user.save(update_fields=['last_activity'])
+            pipeline = get_pipeline()
+            now = timezone.now()
+
+            # Only update last activity once it has moved by more than the interval
+            last_activity = request.user.last_activity
+            if last_activity is None or now - last_activity >= self.last_activity_interval:
+                request.user.last_activity = now
+                pipeline.touch_user(request.user.pk, now)
             
             # Log activity for certain actions
             if request.path.startswith('/accounts/') or request.path.startswith('/lms/'):
-                UserActivity.objects.create(
-                    user=request.user,
+                pipeline.record_event(
+                    user_id=request.user.pk,
                     action=f'VISIT_{request.path.strip("/").upper()}',
                     ip_address=self.get_client_ip(request),
                     user_agent=request.META.get('HTTP_USER_AGENT', '')
@@ -1,9 +1,14 @@
 # accounts/models.py
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
+import threading
+import time
 import uuid
 from django.core.validators import RegexValidator
+from lms.cache_tokens import get_or_add, new_token
 
 class CustomUser(AbstractUser):
     """
@@ -160,6 +165,19 @@ class PasswordResetToken(models.Model):
         return not self.used and not self.is_expired()
 
 
+# SiteSettings is read on nearly every page, so load() serves it from a
+# process-local copy, revalidated against a shared cache version at most every
+# ACCOUNTS_SITE_SETTINGS_LOCAL_TTL seconds. save()/delete() move the version.
+# The version is a random token (see lms.cache_tokens)
+SITE_SETTINGS_VERSION_KEY = 'accounts:site_settings:version'
+_site_settings_local = {'version': None, 'instance': None, 'checked_at': 0.0}
+_site_settings_lock = threading.Lock()
+
+
+def _site_settings_key(version):
+    return f'accounts:site_settings:v{version}'
+
+
 class SiteSettings(models.Model):
     """
     Global site settings for the accounts app
@@ -192,14 +210,52 @@ class SiteSettings(models.Model):
 
     @classmethod
     def load(cls):
-        """Get or create the singleton instance of SiteSettings"""
-        obj, created = cls.objects.get_or_create(pk=1)
+        """Get or create the singleton instance of SiteSettings, served from cache"""
+        local = _site_settings_local
+        ttl = getattr(settings, 'ACCOUNTS_SITE_SETTINGS_LOCAL_TTL', 5)
+        now = time.monotonic()
+        if local['instance'] is not None and now - local['checked_at'] < ttl:
+            return local['instance']
+
+        version = cls.cache_version()
+        if local['instance'] is not None and local['version'] == version:
+            local['checked_at'] = now
+            return local['instance']
+
+        obj = cache.get(_site_settings_key(version))
+        if obj is None:
+            obj, created = cls.objects.get_or_create(pk=1)
+            # Copies under replaced versions are never read again; let them expire
+            timeout = getattr(settings, 'ACCOUNTS_SITE_SETTINGS_CACHE_TIMEOUT', 60 * 60 * 24)
+            cache.set(_site_settings_key(version), obj, timeout)
+
+        with _site_settings_lock:
+            local.update(version=version, instance=obj, checked_at=now)
         return obj
 
+    @classmethod
+    def cache_version(cls):
+        """Current shared cache version for the settings singleton"""
+        return get_or_add(cache, SITE_SETTINGS_VERSION_KEY)
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Move every process to a new cache version and drop the local copy"""
+        cache.set(SITE_SETTINGS_VERSION_KEY, new_token(), None)
+        with _site_settings_lock:
+            _site_settings_local.update(version=None, instance=None, checked_at=0.0)
+
     def save(self, *args, **kwargs):
         """Ensure only one instance exists"""
         self.pk = 1
         super().save(*args, **kwargs)
+        # Admin edits and programmatic saves both go through here
+        transaction.on_commit(self.invalidate_cache)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(self.invalidate_cache)
+        return result
 
     def clean(self):
         """Validate model data"""
@@ -1,3 +1,77 @@
-from django.test import TestCase
+import datetime
+import uuid
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .activity import ActivityPipeline
+from .models import CustomUser, UserActivity
+
+
+def make_pipeline(**kwargs):
+    """A synchronous pipeline that only flushes when asked to"""
+    options = {'max_queue_size': 100, 'batch_size': 50, 'flush_interval': 3600, 'run_async': False}
+    options.update(kwargs)
+    return ActivityPipeline(**options)
+
+
+class ActivityPipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('learner', 'learner@example.com', 'password')
+
+    def test_full_queue_drops_events(self):
+        pipeline = make_pipeline(max_queue_size=2)
+        self.assertTrue(pipeline.record_event(self.user.pk, 'login'))
+        self.assertTrue(pipeline.record_event(self.user.pk, 'view_resource'))
+        # The dropped event triggers a flush of the full queue
+        self.assertFalse(pipeline.record_event(self.user.pk, 'download_resource'))
+        stats = pipeline.stats()
+        self.assertEqual((stats['enqueued'], stats['dropped'], stats['written_events']), (2, 1, 2))
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 2)
+
+    def test_batch_size_triggers_a_flush(self):
+        pipeline = make_pipeline(batch_size=3)
+        for _ in range(3):
+            pipeline.record_event(self.user.pk, 'view_resource')
+        self.assertEqual(pipeline.stats()['backpressure_flushes'], 1)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 3)
+
+    def test_last_activity_keeps_the_newest_timestamp(self):
+        pipeline = make_pipeline()
+        now = timezone.now()
+        for minutes in (5, 30, 10):
+            pipeline.touch_user(self.user.pk, now - datetime.timedelta(minutes=minutes))
+        stats = pipeline.stats()
+        self.assertEqual((stats['coalesced'], stats['pending_last_activity']), (2, 1))
+
+        self.assertEqual(pipeline.flush(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_activity, now - datetime.timedelta(minutes=5))
+        self.assertEqual(pipeline.stats()['written_last_activity'], 1)
+
+    def test_flush_with_nothing_queued(self):
+        pipeline = make_pipeline()
+        self.assertEqual(pipeline.flush(), 0)
+        self.assertEqual(pipeline.stats()['flushes'], 0)
+
+
+class ActivityPipelineDeletedUserTests(TransactionTestCase):
+    # Foreign keys are checked on commit, so the writes must really commit
+
+    def test_events_of_deleted_users_do_not_sink_the_batch(self):
+        user = CustomUser.objects.create_user('learner', 'learner@example.com', 'password')
+        pipeline = make_pipeline()
+        now = timezone.now()
+        pipeline.record_event(user.pk, 'login')
+        pipeline.record_event(uuid.uuid4(), 'login')
+        pipeline.record_event(user.pk, 'view_resource')
+        pipeline.touch_user(user.pk, now)
+
+        self.assertEqual(pipeline.flush(), 3)
+        self.assertEqual(UserActivity.objects.filter(user=user).count(), 2)
+        user.refresh_from_db()
+        self.assertEqual(user.last_activity, now)
+        stats = pipeline.stats()
+        self.assertEqual((stats['written_events'], stats['dropped'], stats['flush_errors']), (2, 1, 0))
@@ -43,6 +43,7 @@ urlpatterns = [
     # API endpoints
     path('check-username/', views.check_username, name='check_username'),
     path('check-email/', views.check_email, name='check_email'),
+    path('activity-pipeline/', views.activity_pipeline_stats, name='activity_pipeline_stats'),
 
     # Static pages
     path('about/', views.about, name='about'),
@@ -24,6 +24,7 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import PasswordChangeForm
 from .forms import CustomUserCreationForm, CustomUserChangeForm, CustomPasswordResetForm, CustomSetPasswordForm
 from .models import CustomUser, UserActivity, EmailVerificationToken, PasswordResetToken, SiteSettings
+from . import activity
 import os
 import logging
 
@@ -413,6 +414,15 @@ def check_email(request):
         return JsonResponse({'available': False, 'error': 'An error occurred. Please try again.'})
 
 
+@require_http_methods(["GET"])
+def activity_pipeline_stats(request):
+    """Expose activity pipeline queue depth, drop and backpressure counters (staff only)"""
+    if not request.user.is_staff:
+        logger.warning(f"Unauthorized access to activity_pipeline_stats by {request.user}")
+        return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
+    return JsonResponse({'success': True, 'stats': activity.stats()})
+
+
 def about(request):
     """About page view with error handling"""
     try:
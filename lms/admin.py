@@ -1,12 +1,16 @@
 # lms/admin.py
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.shortcuts import render
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth import get_user_model
 from django.utils.html import format_html
 from .models import (
     EducationLevel, Grade, SubjectCategory, Subject, 
-    Pathway, ResourceType, Resource
+    Pathway, ResourceType, Resource, ResourceStat, ProcessingJob, UploadSession
 )
+from . import bulk, processing, uploads
+from .forms import MoveResourcesForm
 import logging
 
 # Get the custom user model
@@ -162,15 +166,26 @@ class ResourceTypeAdmin(admin.ModelAdmin):
         return format_html('<span style="color: #9CA3AF;">No icon</span>')
     icon_preview.short_description = 'Icon'
 
+def _flag_action(name, description, flags):
+    """Admin action applying one of bulk.FLAG_ACTIONS to the selection"""
+    def action(modeladmin, request, queryset):
+        changed = bulk.set_flags(queryset, **flags)
+        logger.info(f"Bulk {name} changed {changed} resources, by {request.user.username}")
+        modeladmin.message_user(request, f'{changed} resources updated')
+    action.__name__ = name
+    action.short_description = description
+    return action
+
+
 class ResourceAdmin(admin.ModelAdmin):
     list_display = [
-        'title', 'subject', 'resource_type', 'get_file_size', 
+        'title', 'subject', 'grade', 'resource_type', 'get_file_size', 
         'download_count', 'view_count', 'is_active', 'is_premium', 
-        'allow_download', 'uploaded_by', 'upload_date'
+        'allow_download', 'processing_status', 'uploaded_by', 'upload_date'
     ]
     list_filter = [
-        'subject', 'resource_type', 'is_active', 'is_premium', 
-        'allow_download', 'upload_date'
+        'subject', 'grade', 'resource_type', 'is_active', 'is_premium', 
+        'allow_download', 'processing_status', 'upload_date'
     ]
     search_fields = ['title', 'subject__name', 'uploaded_by__username']
     ordering = ['-upload_date']
@@ -178,18 +193,22 @@ class ResourceAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Resource Information', {
-            'fields': ('title', 'description', 'subject', 'resource_type', 'file')
+            'fields': ('title', 'description', 'subject', 'grade', 'resource_type', 'file')
         }),
         ('Access Control', {
             'fields': ('is_active', 'is_premium', 'allow_download')
         }),
         ('Upload Information', {
-            'fields': ('uploaded_by', 'upload_date', 'download_count', 'view_count', 'file_size')
+            'fields': ('uploaded_by', 'upload_date', 'download_count', 'view_count', 'file_size', 'processing_status')
         }),
     )
     
-    readonly_fields = ['upload_date', 'download_count', 'view_count', 'file_size']
+    readonly_fields = ['upload_date', 'download_count', 'view_count', 'file_size', 'processing_status']
     autocomplete_fields = ['uploaded_by', 'subject']
+    # Applied with set-based UPDATEs by lms.bulk, however many rows are selected
+    actions = [
+        _flag_action(name, description, flags) for name, (description, flags) in bulk.FLAG_ACTIONS.items()
+    ] + ['move_resources']
     
     def get_file_size(self, obj):
         if obj.file_size:
@@ -218,9 +237,90 @@ class ResourceAdmin(admin.ModelAdmin):
             
         super().save_model(request, obj, form, change)
 
+    def move_resources(self, request, queryset):
+        form = MoveResourcesForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            subject, grade = form.cleaned_data['subject'], form.cleaned_data['grade']
+            moved = bulk.move(queryset, subject.pk, grade.pk if grade else None)
+            logger.info(f"Bulk move of {moved} resources to subject {subject.pk} by {request.user.username}")
+            self.message_user(request, f'{moved} resources moved to {subject.name}')
+            return None
+        return render(request, 'admin/lms/resource/move_resources.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Move resources to another subject',
+            'opts': self.model._meta,
+            'form': form,
+            'count': queryset.count(),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+    move_resources.short_description = 'Move selected resources to another subject'
+
 # Register the Resource model with the custom admin class
 admin.site.register(Resource, ResourceAdmin)
 
+
+@admin.register(ResourceStat)
+class ResourceStatAdmin(admin.ModelAdmin):
+    list_display = [
+        'subject', 'grade', 'resource_type', 'active_count', 'premium_count',
+        'downloadable_count', 'total_downloads', 'updated_at'
+    ]
+    list_filter = ['resource_type', 'grade']
+    search_fields = ['subject__name']
+    list_select_related = ['subject', 'grade', 'resource_type']
+    list_per_page = 50
+
+    # Maintained by lms.stats; rebuild with `manage.py rebuild_resource_stats`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'resource', 'status', 'attempts', 'run_after', 'locked_by', 'updated_at']
+    list_filter = ['kind', 'status']
+    search_fields = ['resource__title']
+    list_select_related = ['resource']
+    readonly_fields = ['resource', 'kind', 'attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'updated_at']
+    list_per_page = 50
+    actions = ['retry_jobs']
+
+    # Queued by lms.processing; run with `manage.py process_jobs`
+    def has_add_permission(self, request):
+        return False
+
+    def retry_jobs(self, request, queryset):
+        updated = processing.retry(queryset)
+        self.message_user(request, f'{updated} jobs queued for retry')
+    retry_jobs.short_description = 'Retry selected jobs'
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'status', 'received', 'size', 'resource', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'user__username']
+    list_select_related = ['user', 'resource']
+    list_per_page = 50
+
+    # Created by the chunked upload API; stale ones go with `manage.py clear_stale_uploads`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    # Deleting a session also removes its staging file
+    def delete_model(self, request, obj):
+        uploads.abort(obj)
+
+    def delete_queryset(self, request, queryset):
+        for session in queryset:
+            uploads.abort(session)
+
 # # AdminProfile admin
 # @admin.register(AdminProfile)
 # class AdminProfileAdmin(admin.ModelAdmin):
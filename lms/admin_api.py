@@ -0,0 +1,309 @@
+# lms/admin_api.py
+"""
+Batched, cacheable reads of curriculum and resource data for admin clients.
+
+One GET to `superuser/read/` answers several entity requests at once:
+
+    /superuser/read/?include=grades,subjects,resources
+        &grades.level=2
+        &subjects.grade=7&subjects.fields=id,name
+        &resources.ids=41,42
+
+- `include` lists the entities wanted (ENTITIES below);
+- `<entity>.ids` restricts one to some ids (required for resources);
+- `<entity>.fields` picks the fields returned (all by default);
+- `<entity>.<filter>` applies the entity's filters (level, grade, category).
+
+Curriculum entities come from the in-memory tree and resource types and
+resources from one query each, so a batch costs at most two queries
+however many entities it asks for.
+
+Responses carry an ETag and an X-Data-Version header. For reference data
+(everything but resources) the ETag is derived from the curriculum and
+resource type versions before anything is built, so an unchanged batch is
+answered 304 without work; batches with resources are tagged by a hash of
+their body. Both versions are random tokens, so a version lost from the
+cache can never reproduce an ETag a client holds for older data.
+Responses are `Cache-Control: private, no-cache`, so browsers keep them
+and revalidate each time.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from . import curriculum
+from .cache_tokens import get_or_add, new_token
+
+TYPES_VERSION_KEY = 'lms:admin-api:resource-types:version'
+MAX_IDS = 500
+
+
+class BadRequest(ValueError):
+    """A malformed batch: unknown entity, field or filter, or bad ids"""
+
+
+def _ids(nodes):
+    return [node.id for node in nodes]
+
+
+class Entity:
+    """A readable entity: its fields, filters and where rows come from"""
+
+    # field name -> function(row) returning the value
+    fields = {}
+    # filter name -> function(rows, id) narrowing them
+    filters = {}
+    # Part of the versioned reference data
+    reference = True
+    requires_ids = False
+
+    def read(self, ids, filters, fields):
+        rows = self.rows(ids, filters, fields)
+        getters = [(name, self.fields[name]) for name in fields]
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+
+class TreeEntity(Entity):
+    """Entities served from the curriculum tree"""
+
+    # function(tree) returning the entity's nodes
+    nodes = None
+
+    def rows(self, ids, filters, fields):
+        tree = curriculum.get_tree()
+        nodes = self.nodes(tree)
+        if ids is not None:
+            wanted = set(ids)
+            nodes = [node for node in nodes if node.id in wanted]
+        for name, value in filters.items():
+            nodes = [node for node in nodes if self.filters[name](node, value)]
+        return nodes
+
+
+class EducationLevels(TreeEntity):
+    fields = {
+        'id': lambda n: n.id,
+        'name': lambda n: n.name,
+        'order': lambda n: n.order,
+        'description': lambda n: n.description,
+        'icon': lambda n: n.icon,
+        'grade_ids': lambda n: _ids(n.grades),
+    }
+    nodes = staticmethod(lambda tree: tree.levels)
+
+
+class Grades(TreeEntity):
+    fields = {
+        'id': lambda n: n.id,
+        'name': lambda n: n.name,
+        'order': lambda n: n.order,
+        'description': lambda n: n.description,
+        'education_level_id': lambda n: n.education_level.id,
+        'education_level': lambda n: n.education_level.name,
+        'subject_ids': lambda n: _ids(n.subjects),
+    }
+    filters = {'level': lambda n, value: n.education_level.id == value}
+    nodes = staticmethod(lambda tree: list(tree.grades_by_id.values()))
+
+
+class Categories(TreeEntity):
+    fields = {
+        'id': lambda n: n.id,
+        'name': lambda n: n.name,
+        'icon': lambda n: n.icon,
+        'description': lambda n: n.description,
+        'subject_ids': lambda n: _ids(n.subjects),
+    }
+    nodes = staticmethod(lambda tree: sorted(tree.categories_by_id.values(), key=lambda n: (n.name, n.id)))
+
+
+class Subjects(TreeEntity):
+    fields = {
+        'id': lambda n: n.id,
+        'name': lambda n: n.name,
+        'description': lambda n: n.description,
+        'category_id': lambda n: n.category.id,
+        'category': lambda n: n.category.name,
+        'grade_ids': lambda n: _ids(n.grades),
+        'grades': lambda n: [grade.name for grade in n.grades],
+        'pathway_ids': lambda n: _ids(n.pathways),
+    }
+    filters = {
+        'grade': lambda n, value: any(grade.id == value for grade in n.grades),
+        'category': lambda n, value: n.category.id == value,
+    }
+    nodes = staticmethod(lambda tree: list(tree.subjects_by_id.values()))
+
+
+class Pathways(TreeEntity):
+    fields = {
+        'id': lambda n: n.id,
+        'name': lambda n: n.name,
+        'description': lambda n: n.description,
+        'grade_id': lambda n: n.grade.id,
+        'subject_ids': lambda n: _ids(n.subjects),
+    }
+    filters = {'grade': lambda n, value: n.grade.id == value}
+    nodes = staticmethod(lambda tree: list(tree.pathways_by_id.values()))
+
+
+class ModelEntity(Entity):
+    """Entities read with one query, selecting only the requested columns"""
+
+    model = None
+    ordering = ('id',)
+    # API field -> model columns it needs
+    columns = {}
+
+    def rows(self, ids, filters, fields):
+        queryset = self.model.objects.order_by(*self.ordering)
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        needed = {'pk'} | {column for name in fields for column in self.columns.get(name, (name,))}
+        return list(queryset.only(*needed))
+
+
+class ResourceTypes(ModelEntity):
+    ordering = ('name', 'id')
+    fields = {
+        'id': lambda r: r.id,
+        'name': lambda r: r.name,
+        'icon': lambda r: r.icon,
+        'description': lambda r: r.description,
+    }
+
+    @property
+    def model(self):
+        from .models import ResourceType
+        return ResourceType
+
+
+class Resources(ModelEntity):
+    reference = False
+    requires_ids = True
+    fields = {
+        'id': lambda r: r.id,
+        'title': lambda r: r.title,
+        'description': lambda r: r.description,
+        'subject_id': lambda r: r.subject_id,
+        'grade_id': lambda r: r.grade_id,
+        'resource_type_id': lambda r: r.resource_type_id,
+        'is_active': lambda r: r.is_active,
+        'allow_download': lambda r: r.allow_download,
+        'is_premium': lambda r: r.is_premium,
+        'download_count': lambda r: r.download_count,
+        'view_count': lambda r: r.view_count,
+        'upload_date': lambda r: r.upload_date,
+    }
+
+    @property
+    def model(self):
+        from .models import Resource
+        return Resource
+
+
+ENTITIES = {
+    'education_levels': EducationLevels(),
+    'grades': Grades(),
+    'categories': Categories(),
+    'subjects': Subjects(),
+    'pathways': Pathways(),
+    'resource_types': ResourceTypes(),
+    'resources': Resources(),
+}
+
+
+def _parse_ids(value, label):
+    try:
+        ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise BadRequest(f'{label} must be a comma-separated list of ids')
+    if len(ids) > MAX_IDS:
+        raise BadRequest(f'{label} lists more than {MAX_IDS} ids')
+    return ids
+
+
+def parse(params):
+    """{entity: (ids or None, filters, fields)} from the query string; raises BadRequest"""
+    names = [name.strip() for name in params.get('include', '').split(',') if name.strip()]
+    if not names:
+        raise BadRequest('Name the entities to read in include')
+    spec = {}
+    for name in names:
+        entity = ENTITIES.get(name)
+        if entity is None:
+            raise BadRequest(f'Unknown entity {name}')
+        ids = params.get(f'{name}.ids')
+        ids = _parse_ids(ids, f'{name}.ids') if ids is not None else None
+        if entity.requires_ids and ids is None:
+            raise BadRequest(f'{name} must be requested by {name}.ids')
+
+        fields = [f.strip() for f in params.get(f'{name}.fields', '').split(',') if f.strip()] or list(entity.fields)
+        unknown = [f for f in fields if f not in entity.fields]
+        if unknown:
+            raise BadRequest(f'Unknown {name} fields: {", ".join(unknown)}')
+
+        filters = {}
+        for key in params:
+            prefix, _, filter_name = key.partition('.')
+            if prefix != name or filter_name in ('ids', 'fields'):
+                continue
+            if filter_name not in entity.filters:
+                raise BadRequest(f'Unknown {name} filter {filter_name}')
+            try:
+                filters[filter_name] = int(params[key])
+            except ValueError:
+                raise BadRequest(f'{key} must be an id')
+        spec[name] = (ids, filters, fields)
+    return spec
+
+
+def types_version():
+    """Random token moved whenever resource types change; see the module docstring"""
+    return get_or_add(cache, TYPES_VERSION_KEY)
+
+
+def _bump_types_version():
+    cache.set(TYPES_VERSION_KEY, new_token(), None)
+
+
+def invalidate_types():
+    """Resource types changed: refresh cached batches once the transaction commits"""
+    transaction.on_commit(_bump_types_version)
+
+
+def data_version():
+    return f'{curriculum.current_version()}.{types_version()}'
+
+
+def _canonical(spec):
+    return json.dumps(
+        {name: [ids, sorted(filters.items()), fields] for name, (ids, filters, fields) in sorted(spec.items())},
+        separators=(',', ':'),
+    )
+
+
+def _tag(text):
+    return '"' + hashlib.sha256(text.encode()).hexdigest()[:32] + '"'
+
+
+def version_etag(spec, version):
+    """ETag of a reference-only batch without building it, else None"""
+    if not all(ENTITIES[name].reference for name in spec):
+        return None
+    return _tag(f'{version}:{_canonical(spec)}')
+
+
+def read(spec, version):
+    """The response body of a batch, as JSON text"""
+    payload = {'success': True, 'version': version}
+    for name, (ids, filters, fields) in spec.items():
+        payload[name] = ENTITIES[name].read(ids, filters, fields)
+    return json.dumps(payload, cls=DjangoJSONEncoder)
+
+
+def body_etag(body):
+    return _tag(body)
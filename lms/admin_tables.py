@@ -0,0 +1,261 @@
+# lms/admin_tables.py
+"""
+Paginated JSON listings behind the superuser dashboard tabs.
+
+The dashboard page renders only its frame and a few counters; each tab
+fetches its rows from `superuser/tables/<name>/` the first time it is
+opened and asks for more with the cursor of the previous response:
+
+    /superuser/tables/resources/?sort=-upload_date&grade=3&status=active&q=algebra
+
+A Table names its queryset (with select_related, so serialising a row
+needs no further queries), the sort orders it accepts, the GET filters it
+understands and how a row is serialised. Sort orders only use local,
+non-NULL columns and end with the primary key, as KeysetPaginator needs.
+Curriculum names come from the in-memory tree and resource totals from
+ResourceStat, so a page costs the same couple of queries however large the
+catalogue is.
+"""
+from django.urls import reverse
+
+from . import curriculum, stats
+from .models import EducationLevel, Grade, SubjectCategory, Subject, ResourceType, Pathway, Resource
+from .pagination import KeysetPaginator
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _page_size(value):
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+
+
+class Table:
+    """One dashboard tab: queryset, sort orders, filters and row format"""
+
+    model = None
+    # sort key -> ordering; the first one is the default
+    sorts = {}
+    # GET parameter -> lookup taking an id
+    filters = {}
+    # Field matched by ?q=
+    search_field = None
+
+    def queryset(self):
+        return self.model.objects.all()
+
+    def filtered(self, params):
+        """The queryset narrowed by the filters in params, and the filters applied"""
+        queryset = self.queryset()
+        applied = {}
+        for param, lookup in self.filters.items():
+            value = _as_id(params.get(param))
+            if value is not None:
+                applied[param] = value
+                queryset = queryset.filter(**{lookup: value})
+        query = params.get('q', '').strip()
+        if query and self.search_field:
+            applied['q'] = query
+            queryset = queryset.filter(**{f'{self.search_field}__icontains': query})
+        return queryset, applied
+
+    def total(self, queryset, applied):
+        """Number of matching rows, or None when it cannot be had cheaply"""
+        # Curriculum tables are small: counting them is cheap
+        return queryset.count
+
+    def edit_url(self, obj):
+        opts = self.model._meta
+        return reverse(f'admin:{opts.app_label}_{opts.model_name}_change', args=[obj.pk])
+
+    def page(self, params):
+        """JSON payload of the page the params ask for; raises InvalidCursor"""
+        sort = params.get('sort')
+        if sort not in self.sorts:
+            sort = next(iter(self.sorts))
+        queryset, applied = self.filtered(params)
+        paginator = KeysetPaginator(
+            queryset,
+            self.sorts[sort],
+            _page_size(params.get('per_page')),
+            total=self.total(queryset, applied),
+        )
+        page = paginator.page(params.get('cursor') or None)
+        tree = curriculum.get_tree()
+        rows = []
+        for obj in page:
+            row = self.row(obj, tree)
+            row['id'] = obj.pk
+            row['edit_url'] = self.edit_url(obj)
+            rows.append(row)
+        return {'success': True, 'rows': rows, 'sort': sort, 'filters': applied, 'page': page.meta()}
+
+
+class EducationLevelTable(Table):
+    model = EducationLevel
+    sorts = {
+        'order': ('order', 'id'),
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    search_field = 'name'
+
+    def row(self, level, tree):
+        return {'name': level.name, 'order': level.order, 'icon': level.icon}
+
+
+class GradeTable(Table):
+    model = Grade
+    sorts = {
+        'order': ('order', 'id'),
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    filters = {'level': 'education_level_id'}
+    search_field = 'name'
+
+    def row(self, grade, tree):
+        node = tree.grade(grade.pk)
+        return {
+            'name': grade.name,
+            'order': grade.order,
+            'education_level': node.education_level.name if node else '',
+        }
+
+
+class CategoryTable(Table):
+    model = SubjectCategory
+    sorts = {
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    search_field = 'name'
+
+    def row(self, category, tree):
+        return {'name': category.name, 'icon': category.icon}
+
+
+class SubjectTable(Table):
+    model = Subject
+    sorts = {
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    filters = {'category': 'category_id', 'grade': 'grades'}
+    search_field = 'name'
+
+    def row(self, subject, tree):
+        node = tree.subject(subject.pk)
+        return {
+            'name': subject.name,
+            'category': node.category.name if node else '',
+            'grades': [grade.name for grade in node.grades] if node else [],
+        }
+
+
+class ResourceTypeTable(Table):
+    model = ResourceType
+    sorts = {
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    search_field = 'name'
+
+    def row(self, resource_type, tree):
+        return {'name': resource_type.name, 'icon': resource_type.icon, 'description': resource_type.description}
+
+
+class PathwayTable(Table):
+    model = Pathway
+    sorts = {
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+    }
+    filters = {'grade': 'grade_id'}
+    search_field = 'name'
+
+    def row(self, pathway, tree):
+        node = tree.grade(pathway.grade_id)
+        return {'name': pathway.name, 'grade': node.name if node else ''}
+
+
+class ResourceTable(Table):
+    model = Resource
+    sorts = {
+        '-upload_date': ('-upload_date', '-id'),
+        'upload_date': ('upload_date', 'id'),
+        'title': ('title', 'id'),
+        '-title': ('-title', '-id'),
+        '-download_count': ('-download_count', '-id'),
+        '-view_count': ('-view_count', '-id'),
+    }
+    filters = {'subject': 'subject_id', 'grade': 'grade_id', 'type': 'resource_type_id'}
+    search_field = 'title'
+
+    def queryset(self):
+        return Resource.objects.select_related('subject', 'resource_type')
+
+    def filtered(self, params):
+        queryset, applied = super().filtered(params)
+        status = params.get('status')
+        if status in ('active', 'inactive'):
+            applied['status'] = status
+            queryset = queryset.filter(is_active=status == 'active')
+        return queryset, applied
+
+    def total(self, queryset, applied):
+        if 'q' in applied:
+            return None
+
+        def count():
+            counts = stats.totals(
+                [applied['subject']] if 'subject' in applied else None,
+                grade_id=applied.get('grade'),
+                resource_type_id=applied.get('type'),
+            )
+            status = applied.get('status')
+            if status == 'active':
+                return counts['active_count']
+            if status == 'inactive':
+                return counts['resource_count'] - counts['active_count']
+            return counts['resource_count']
+        return count
+
+    def edit_url(self, resource):
+        return f"{reverse('lms:admin_edit_resource')}?resource_id={resource.pk}"
+
+    def row(self, resource, tree):
+        grade = tree.grade(resource.grade_id)
+        return {
+            'title': resource.title,
+            'subject': resource.subject.name,
+            'grade': grade.name if grade else '',
+            'type': resource.resource_type.name,
+            'views': resource.view_count,
+            'downloads': resource.download_count,
+            'is_active': resource.is_active,
+            'upload_date': resource.upload_date.strftime('%Y-%m-%d'),
+            'view_url': reverse('lms:view_resource', args=[resource.pk]),
+            'delete_url': reverse('lms:delete_resource', args=[resource.pk]),
+        }
+
+
+TABLES = {
+    'education-levels': EducationLevelTable(),
+    'grades': GradeTable(),
+    'categories': CategoryTable(),
+    'subjects': SubjectTable(),
+    'resource-types': ResourceTypeTable(),
+    'pathways': PathwayTable(),
+    'resources': ResourceTable(),
+}
@@ -0,0 +1,497 @@
+# lms/benchmark.py
+"""
+Synthetic data and a load harness for the public browsing paths.
+
+`manage.py generate_benchmark_data` runs populate_data for the real
+curriculum and resource types, then adds a scaled synthetic catalogue on
+top: N education levels, grades per level, subjects per grade, resources
+and users. Everything it creates is named with BENCH_PREFIX and hangs off
+the BENCH_CATEGORY subject category, so `--clear` removes it again without
+touching real data. All resources share a few sample PDFs under
+benchmark/ in the resource storage.
+
+`manage.py run_benchmarks` drives the dashboards, the viewer, downloads
+and search through the Django test client and/or a real HTTP server
+started in-process, at a chosen concurrency. For every scenario it reports
+p50/p95/p99 latency, queries per request and throughput, and writes a
+JSON report that a later run can be compared against with --compare.
+"""
+import io
+import json
+import logging
+import platform
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import curriculum, search, stats, suggest
+from .classifier import synthetic_filenames
+from .models import EducationLevel, Grade, Resource, ResourceType, Subject, SubjectCategory
+from .storage import resource_storage
+
+logger = logging.getLogger(__name__)
+
+BENCH_PREFIX = 'Bench'
+BENCH_CATEGORY = 'Benchmark'
+BENCH_USERNAME = 'bench-user'
+BENCH_PASSWORD = 'benchmark'
+SAMPLE_FILES = {'small': 2, 'large': 40}
+BATCH_SIZE = 1000
+
+SCENARIOS = (
+    'grade_level_dashboard',
+    'education_level_dashboard',
+    'grade_dashboard',
+    'subject_dashboard',
+    'view_resource',
+    'download_resource',
+    'search',
+)
+QUERIES_HEADER = 'X-Benchmark-Queries'
+
+
+def _sample_pdf(pages):
+    """A minimal valid PDF with `pages` pages of text"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{3 + 2 * n} 0 R' for n in range(pages))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {pages} >>')
+    font = 3 + 2 * pages
+    for n in range(pages):
+        stream = f'BT /F1 24 Tf 72 720 Td (Benchmark page {n + 1}) Tj ET'
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * n} 0 R '
+            f'/Resources << /Font << /F1 {font} 0 R >> >> >>'
+        )
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+    objects.append('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    out = '%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'
+    out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    return out.encode('latin-1')
+
+
+def _sample_files():
+    """Names and sizes of the shared sample PDFs, creating them on first use"""
+    storage = resource_storage()
+    files = []
+    for label, pages in SAMPLE_FILES.items():
+        name = f'benchmark/sample-{label}.pdf'
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(_sample_pdf(pages)))
+        files.append((name, storage.size(name)))
+    return files
+
+
+def _title(name):
+    words = name.replace('_', ' ').replace('-', ' ').replace('.', ' ').split()
+    return ' '.join(word.capitalize() for word in words) or 'Untitled'
+
+
+def generate_data(levels=5, grades_per_level=3, subjects_per_grade=8, resources=10000, users=100,
+                  seed=0, stdout=None):
+    """Create a synthetic catalogue of the given size; returns the counts created"""
+    rng = random.Random(seed)
+    call_command('populate_data', stdout=stdout or io.StringIO())
+
+    resource_types = list(ResourceType.objects.order_by('pk'))
+    pdf_type = next((t for t in resource_types if t.name == 'PDF'), resource_types[0])
+    files = _sample_files()
+
+    with transaction.atomic():
+        start = EducationLevel.objects.filter(name__startswith=f'{BENCH_PREFIX} ').count()
+        new_levels = EducationLevel.objects.bulk_create([
+            EducationLevel(name=f'{BENCH_PREFIX} Level {start + i + 1}', order=100 + start + i,
+                           description=f'Synthetic education level {start + i + 1}')
+            for i in range(levels)
+        ])
+        new_grades = Grade.objects.bulk_create([
+            Grade(name=f'{BENCH_PREFIX} {level.name.rsplit(" ", 1)[-1]}.{j + 1}', education_level=level,
+                  order=j + 1, description=f'Synthetic grade {j + 1} of {level.name}')
+            for level in new_levels
+            for j in range(grades_per_level)
+        ])
+        category, _ = SubjectCategory.objects.get_or_create(
+            name=BENCH_CATEGORY, defaults={'description': 'Synthetic subjects for benchmarks'}
+        )
+        new_subjects = Subject.objects.bulk_create([
+            Subject(name=f'{BENCH_PREFIX} Subject {grade.name.split(" ", 1)[1]}.{k + 1}', category=category,
+                    description=f'Synthetic subject {k + 1} of {grade.name}')
+            for grade in new_grades
+            for k in range(subjects_per_grade)
+        ])
+        subject_grades = dict(zip(
+            (subject.pk for subject in new_subjects),
+            (grade for grade in new_grades for _ in range(subjects_per_grade)),
+        ))
+        Subject.grades.through.objects.bulk_create([
+            Subject.grades.through(subject_id=subject_id, grade_id=grade.pk)
+            for subject_id, grade in subject_grades.items()
+        ])
+
+        User = get_user_model()
+        user_start = User.objects.filter(username__startswith=f'{BENCH_USERNAME}-').count()
+        password = make_password(BENCH_PASSWORD)
+        new_users = User.objects.bulk_create([
+            User(username=f'{BENCH_USERNAME}-{n}', email=f'{BENCH_USERNAME}-{n}@example.com', password=password)
+            for n in range(user_start + 1, user_start + users + 1)
+        ], batch_size=BATCH_SIZE)
+        uploader = User.objects.filter(is_staff=True).order_by('date_joined').first() or (
+            new_users[0] if new_users else User.objects.order_by('date_joined').first()
+        )
+
+        new_ids = []
+        if new_subjects and resources:
+            names = synthetic_filenames(resources, seed)
+            for batch_start in range(0, resources, BATCH_SIZE):
+                batch = []
+                for name in names[batch_start:batch_start + BATCH_SIZE]:
+                    file_name, file_size = rng.choice(files)
+                    subject = rng.choice(new_subjects)
+                    batch.append(Resource(
+                        title=_title(name)[:200],
+                        subject=subject,
+                        grade=subject_grades[subject.pk],
+                        resource_type=pdf_type,
+                        file=file_name,
+                        file_size=file_size,
+                        uploaded_by=uploader,
+                        allow_download=rng.random() < 0.9,
+                        is_premium=rng.random() < 0.1,
+                        download_count=int(rng.paretovariate(1.5)) - 1,
+                        view_count=int(rng.paretovariate(1.2)) - 1,
+                    ))
+                new_ids.extend(resource.pk for resource in Resource.objects.bulk_create(batch))
+
+    # bulk_create sends no signals: bring the derived data up to date at once
+    curriculum.invalidate()
+    stats.rebuild()
+    search.reindex(Resource.objects.filter(pk__in=new_ids).select_related('resource_type').order_by('pk'))
+    suggest.update_resources(Resource.objects.filter(pk__in=new_ids).values_list('pk', 'title', 'is_active'))
+    return {
+        'levels': len(new_levels),
+        'grades': len(new_grades),
+        'subjects': len(new_subjects),
+        'resources': len(new_ids),
+        'users': len(new_users),
+    }
+
+
+def clear_data():
+    """Delete everything generate_data created; returns the number of resources removed"""
+    User = get_user_model()
+    with transaction.atomic():
+        removed = Resource.objects.filter(subject__category__name=BENCH_CATEGORY).count()
+        Resource.objects.filter(subject__category__name=BENCH_CATEGORY).delete()
+        SubjectCategory.objects.filter(name=BENCH_CATEGORY).delete()
+        EducationLevel.objects.filter(name__startswith=f'{BENCH_PREFIX} ').delete()
+        User.objects.filter(username__startswith=f'{BENCH_USERNAME}-').delete()
+    stats.rebuild()
+    search.rebuild()
+    return removed
+
+
+def dataset_size():
+    return {
+        'levels': EducationLevel.objects.count(),
+        'grades': Grade.objects.count(),
+        'subjects': Subject.objects.count(),
+        'resources': Resource.objects.count(),
+        'users': get_user_model().objects.count(),
+    }
+
+
+class RequestPlan:
+    """Random but reproducible URLs for each scenario, drawn from the current data"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        tree = curriculum.get_tree()
+        self.levels = [level.id for level in tree.levels]
+        self.grades = list(tree.grades_by_id)
+        self.subjects = [(grade.id, subject.id) for grade in tree.grades_by_id.values() for subject in grade.subjects]
+        resources = Resource.objects.filter(is_active=True)
+        self.resources = list(resources.values_list('pk', flat=True))
+        self.downloads = list(resources.filter(allow_download=True, is_premium=False).values_list('pk', flat=True))
+        titles = resources.order_by('?').values_list('title', flat=True)[:500]
+        self.terms = sorted({word for title in titles for word in title.split() if len(word) > 3 and word.isalpha()})
+
+    def _pick(self, values, scenario):
+        if not values:
+            raise ValueError(f'No data for the {scenario} scenario; run generate_benchmark_data first')
+        return self.rng.choice(values)
+
+    def path(self, scenario):
+        if scenario == 'grade_level_dashboard':
+            return reverse('lms:grade_level_dashboard')
+        if scenario == 'education_level_dashboard':
+            return reverse('lms:education_level_dashboard', args=[self._pick(self.levels, scenario)])
+        if scenario == 'grade_dashboard':
+            return reverse('lms:grade_dashboard', args=[self._pick(self.grades, scenario)])
+        if scenario == 'subject_dashboard':
+            return reverse('lms:subject_dashboard', args=self._pick(self.subjects, scenario))
+        if scenario == 'view_resource':
+            return reverse('lms:view_resource', args=[self._pick(self.resources, scenario)])
+        if scenario == 'download_resource':
+            return reverse('lms:download_resource', args=[self._pick(self.downloads, scenario)])
+        if scenario == 'search':
+            terms = self.rng.sample(self.terms, min(len(self.terms), self.rng.randint(1, 2)))
+            return f"{reverse('lms:search')}?q={'+'.join(terms)}"
+        raise ValueError(f'Unknown scenario {scenario}')
+
+    def paths(self, scenario, count):
+        return [self.path(scenario) for _ in range(count)]
+
+
+def _count_queries():
+    """Context manager counting the queries of this thread on every alias; yields a one-item list"""
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(wrapper))
+    return stack, counter
+
+
+def _session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+class TestClientDriver:
+    """Requests through django.test.Client, one client per worker thread"""
+
+    name = 'test'
+
+    def __init__(self, users=()):
+        self.users = list(users)
+        self._local = threading.local()
+        self._next_user = 0
+        self._lock = threading.Lock()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client()
+            if self.users:
+                with self._lock:
+                    user = self.users[self._next_user % len(self.users)]
+                    self._next_user += 1
+                client.force_login(user)
+        return client
+
+    def get(self, path):
+        client = self._client()
+        stack, counter = _count_queries()
+        with stack:
+            response = client.get(path)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        return response.status_code, counter[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LiveServerDriver:
+    """Requests over HTTP to a WSGI server started in this process"""
+
+    name = 'live'
+
+    def __init__(self, users=()):
+        self.cookies = [_session_cookie(user) for user in users]
+        self._local = threading.local()
+        self._next_user = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    def _app(self):
+        application = get_wsgi_application()
+
+        def counted(environ, start_response):
+            stack, counter = _count_queries()
+            with stack:
+                def start(status, headers, exc_info=None):
+                    return start_response(status, headers + [(QUERIES_HEADER, str(counter[0]))], exc_info)
+                return application(environ, start)
+        return counted
+
+    def __enter__(self):
+        self.server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=False)
+        self.server.set_app(self._app())
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _cookie(self):
+        if not self.cookies:
+            return None
+        cookie = getattr(self._local, 'cookie', None)
+        if cookie is None:
+            with self._lock:
+                cookie = self._local.cookie = self.cookies[self._next_user % len(self.cookies)]
+                self._next_user += 1
+        return cookie
+
+    def get(self, path):
+        request = urllib.request.Request(self.base_url + path)
+        cookie = self._cookie()
+        if cookie:
+            request.add_header('Cookie', f'{settings.SESSION_COOKIE_NAME}={cookie}')
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status, int(response.headers.get(QUERIES_HEADER, 0))
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, int(e.headers.get(QUERIES_HEADER, 0))
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _summarize(samples, elapsed):
+    latencies = sorted(seconds for seconds, _, _ in samples)
+    queries = [count for _, count, _ in samples]
+    errors = sum(1 for _, _, status in samples if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'queries_max': max(queries, default=0),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def run_scenario(driver, paths, concurrency=1, warmup=0):
+    """Request every path with `concurrency` workers; returns the scenario's figures"""
+    def timed(path):
+        started = time.perf_counter()
+        status, queries = driver.get(path)
+        return time.perf_counter() - started, queries, status
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        list(pool.map(timed, paths[:warmup]))
+        started = time.perf_counter()
+        samples = list(pool.map(timed, paths[warmup:]))
+        elapsed = time.perf_counter() - started
+    return _summarize(samples, elapsed)
+
+
+def run(modes=('test',), scenarios=SCENARIOS, requests=200, concurrency=4, warmup=20, seed=0, users=0,
+        progress=None):
+    """Benchmark each scenario in each mode; returns the report as a dict"""
+    plan = RequestPlan(seed)
+    login_users = list(get_user_model().objects.filter(
+        username__startswith=f'{BENCH_USERNAME}-'
+    ).order_by('username')[:users]) if users else []
+    if users and not login_users:
+        raise ValueError('No benchmark users to sign in as; run generate_benchmark_data first')
+    drivers = {'test': TestClientDriver, 'live': LiveServerDriver}
+
+    report = {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'modes': list(modes),
+            'requests': requests,
+            'concurrency': concurrency,
+            'warmup': warmup,
+            'seed': seed,
+            'signed_in_users': len(login_users),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'dataset': dataset_size(),
+        },
+        'results': {},
+    }
+    hosts = list(settings.ALLOWED_HOSTS) + ['testserver', '127.0.0.1']
+    with override_settings(ALLOWED_HOSTS=hosts):
+        for mode in modes:
+            results = report['results'][mode] = {}
+            with drivers[mode](login_users) as driver:
+                for scenario in scenarios:
+                    paths = plan.paths(scenario, requests + warmup)
+                    results[scenario] = run_scenario(driver, paths, concurrency, warmup)
+                    if progress:
+                        progress(mode, scenario, results[scenario])
+    return report
+
+
+def compare(baseline, report):
+    """Lines describing how each scenario moved against a baseline report"""
+    lines = []
+    for mode, results in report['results'].items():
+        for scenario, current in results.items():
+            previous = baseline.get('results', {}).get(mode, {}).get(scenario)
+            if not previous:
+                lines.append(f'{mode}/{scenario}: not in baseline')
+                continue
+            changes = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+                before, after = previous[key], current[key]
+                change = f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+                changes.append(f'{key} {before} -> {after} ({change})')
+            changes.append(f"queries {previous['queries_mean']} -> {current['queries_mean']}")
+            lines.append(f'{mode}/{scenario}: ' + ', '.join(changes))
+    return lines
+
+
+def load_report(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def write_report(report, path):
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2)
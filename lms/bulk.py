@@ -0,0 +1,169 @@
+# lms/bulk.py
+"""
+Set-based bulk changes to resources.
+
+The admin toggles (visibility, downloads) load and save() one resource per
+request. These functions change any selection of resources, by ids or by
+filters, with UPDATE statements instead:
+
+- the selection is walked in primary key order, LMS_BULK_CHUNK_SIZE (500)
+  ids at a time with a keyset on pk, so rows leaving the selection as they
+  change are neither skipped nor revisited; each chunk is updated in its
+  own transaction, so very large selections never hold long locks or big
+  id lists;
+- rows that already have the requested values are left alone, and the
+  functions return the number of resources actually changed;
+- what save() signals would have kept in step is updated per chunk once
+  it commits: the search documents and suggestion entries of the changed
+  resources, and at the end the ResourceStat slices they left or joined
+  and then the cached pages showing them.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from . import curriculum, page_cache, search, stats, suggest
+from .models import Resource
+
+logger = logging.getLogger(__name__)
+
+FLAGS = ('is_active', 'allow_download', 'is_premium')
+
+# name -> (description, flag values); shared by the endpoint and the admin actions
+FLAG_ACTIONS = {
+    'activate': ('Make selected resources visible', {'is_active': True}),
+    'deactivate': ('Hide selected resources', {'is_active': False}),
+    'allow_download': ('Allow downloading selected resources', {'allow_download': True}),
+    'block_download': ('Block downloading selected resources', {'allow_download': False}),
+    'premium': ('Mark selected resources as premium', {'is_premium': True}),
+    'free': ('Mark selected resources as free', {'is_premium': False}),
+}
+
+# selection filter -> Resource field
+FILTERS = {
+    'subject': 'subject_id',
+    'grade': 'grade_id',
+    'type': 'resource_type_id',
+    'uploader': 'uploaded_by_id',
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def chunk_size():
+    return max(int(_setting('LMS_BULK_CHUNK_SIZE', 500)), 1)
+
+
+def select(ids=None, **filters):
+    """Resources with the given ids and/or matching FILTERS; refuses to select everything"""
+    if ids is None and not filters:
+        raise ValueError('Select resources by ids or by at least one filter')
+    unknown = set(filters) - set(FILTERS)
+    if unknown:
+        raise ValueError(f'Unknown filters: {", ".join(sorted(unknown))}')
+    queryset = Resource.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=list(ids))
+    return queryset.filter(**{FILTERS[name]: value for name, value in filters.items()})
+
+
+def _chunks(queryset):
+    """Primary keys of queryset in ascending chunks"""
+    size = chunk_size()
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        pks = list(page.values_list('pk', flat=True)[:size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def _after_commit(func, *args):
+    def run():
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"Error updating indexes after a bulk resource change: {str(e)}")
+    transaction.on_commit(run)
+
+
+def set_flags(queryset, **flags):
+    """Set is_active/allow_download/is_premium on the selected resources; returns how many changed"""
+    unknown = set(flags) - set(FLAGS)
+    if not flags or unknown:
+        raise ValueError(f'Bulk updates can set {", ".join(FLAGS)}')
+
+    changed = 0
+    slices = set()
+    places = set()
+    for pks in _chunks(queryset):
+        with transaction.atomic():
+            rows = list(
+                Resource.objects.filter(pk__in=pks).exclude(**flags)
+                .values_list('pk', 'title', 'subject_id', 'resource_type_id', 'grade_id')
+            )
+            if not rows:
+                continue
+            ids = [row[0] for row in rows]
+            changed += Resource.objects.filter(pk__in=ids).update(**flags)
+            slices.update((subject_id, type_id) for _, _, subject_id, type_id, _ in rows)
+            places.update((subject_id, grade_id) for _, _, subject_id, _, grade_id in rows)
+            if 'is_active' in flags:
+                is_active = flags['is_active']
+                _after_commit(search.set_active, ids, is_active)
+                _after_commit(suggest.update_resources, [(pk, title, is_active) for pk, title, _, _, _ in rows])
+    stats.schedule_refresh(*slices)
+    page_cache.invalidate_resources(places)
+    return changed
+
+
+def move(queryset, subject_id, grade_id=None):
+    """
+    Move the selected resources to another subject; returns how many moved.
+
+    Without a grade, resources keep theirs when the new subject is taught in
+    it and take the subject's first grade otherwise.
+    """
+    subject = curriculum.get_tree().subject(subject_id)
+    if subject is None:
+        raise ValueError(f'No subject {subject_id}')
+    allowed = [grade.id for grade in subject.grades]
+    if grade_id is not None and grade_id not in allowed:
+        raise ValueError(f'{subject.name} is not taught in grade {grade_id}')
+    fallback = grade_id if grade_id is not None else (allowed[0] if allowed else None)
+
+    moved = 0
+    slices = set()
+    places = set()
+    for pks in _chunks(queryset):
+        with transaction.atomic():
+            rows = Resource.objects.filter(pk__in=pks)
+            if grade_id is not None:
+                rows = rows.exclude(subject_id=subject_id, grade_id=grade_id)
+            else:
+                rows = rows.exclude(subject_id=subject_id, grade_id__in=allowed)
+            rows = list(rows.values_list('pk', 'subject_id', 'resource_type_id', 'grade_id'))
+            if not rows:
+                continue
+            kept = {pk for pk, _, _, grade in rows if grade_id is None and grade in allowed}
+            regrade = [pk for pk, _, _, _ in rows if pk not in kept]
+            if kept:
+                moved += Resource.objects.filter(pk__in=kept).update(subject_id=subject_id)
+            if regrade:
+                moved += Resource.objects.filter(pk__in=regrade).update(subject_id=subject_id, grade_id=fallback)
+            for pk, old_subject_id, type_id, old_grade_id in rows:
+                slices.add((old_subject_id, type_id))
+                slices.add((subject_id, type_id))
+                places.add((old_subject_id, old_grade_id))
+                places.add((subject_id, old_grade_id if pk in kept else fallback))
+            # Documents carry the subject, category and grade names
+            search.schedule_reindex(pk__in=[row[0] for row in rows])
+    stats.schedule_refresh(*slices)
+    page_cache.invalidate_resources(places)
+    return moved
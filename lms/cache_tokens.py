@@ -0,0 +1,47 @@
+# lms/cache_tokens.py
+"""
+Version tokens shared between processes through the Django cache.
+
+Local copies (the curriculum tree, site settings, search indexes, cached
+pages) record the token they were built for and are stale once the shared
+token differs. A missing token, never set or evicted, is replaced by a new
+value no process has built anything for; counters restarting at 1 could
+bring back a copy built before the last change.
+
+Tokens bumped with cache.incr(), which lets a process recognise its own
+bump, start from a random number for the same reason.
+"""
+import random
+import uuid
+
+
+def new_token():
+    """Random token for cache.set() when the data behind it changes"""
+    return uuid.uuid4().hex[:12]
+
+
+def new_counter():
+    """Random starting value for a token that is bumped with cache.incr()"""
+    return random.randrange(1, 2 ** 62)
+
+
+def get_or_add(cache, key, initial=new_token):
+    """Current token under `key`, adding `initial()` if there is none"""
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, initial(), None)
+        # Another process may have added its own token first
+        token = cache.get(key)
+    return token
+
+
+def get_or_add_many(cache, keys, initial=new_token):
+    """{key: token} for several keys in two round trips when all are present"""
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, initial(), None)
+        # Another process may have added its own token first
+        found.update(cache.get_many(missing))
+    return found
@@ -0,0 +1,361 @@
+# lms/classifier.py
+"""
+Filename classifier used by the import_pdfs command.
+
+A file name is normalised into lowercase word and number tokens
+("Grade7_Maths-Notes.pdf" -> grade 7 maths notes) and classified in one pass:
+
+- a grade extractor recognises pg/playgroup, pp1/pp2 and g1..g12 (also
+  written "grade 7", "gr7", "grade_10") and maps the grade to its level.
+  In past papers "PP1" means paper 1, so pp1/pp2 is not read as a
+  pre-primary grade when the name also names a national exam (KCSE, ...)
+  or a subject only taught in secondary school ("KCSE-BIOLOGY-PP1-2017");
+- subject keywords are compiled into a token trie. Keywords are exact tokens
+  ("pe") or prefixes ("math*" matches maths/mathematics), and a phrase such
+  as "home science" must appear as adjacent tokens.
+
+When several subject rules match, the winner is decided by explicit
+priorities rather than table order alone:
+
+1. rules for the education level of the extracted grade, or, when the name
+   has no grade, of the national exam it names (KCSE, KJSEA, KCPE);
+2. the longest matched phrase ("integrated science" beats "science");
+3. the number of distinct keywords matched (a repeated word counts once);
+4. the rule's `priority` (generic words such as "education" rank low);
+5. earlier rules in SUBJECT_RULES.
+
+benchmark() classifies synthetic names to measure throughput, and
+CoverageReport summarises coverage and rule conflicts for --dry-run.
+"""
+import random
+import re
+import time
+from collections import Counter, namedtuple
+
+LEVEL_GRADES = {
+    'Pre-Primary': ['pg', 'pp1', 'pp2'],
+    'Lower Primary': ['g1', 'g2', 'g3'],
+    'Upper Primary': ['g4', 'g5', 'g6'],
+    'Junior Secondary': ['g7', 'g8', 'g9'],
+    'Senior Secondary': ['g10', 'g11', 'g12'],
+}
+GRADE_LEVELS = {grade: level for level, grades in LEVEL_GRADES.items() for grade in grades}
+
+# Tokens that introduce a grade number ("g7", "grade 7", "gr 7", "pp1")
+GRADE_WORDS = {'g', 'gr', 'grade'}
+PLAYGROUP_WORDS = {'pg', 'playgroup'}
+
+# Subjects per education level. Keywords ending in "*" match as prefixes;
+# multi-word keywords must appear as adjacent tokens.
+SUBJECT_RULES = [
+    # Pre-Primary
+    {'subject': 'CRE', 'education_level': 'Pre-Primary', 'keywords': ['cre', 'christian religious', 'faith']},
+    {'subject': 'IRE', 'education_level': 'Pre-Primary', 'keywords': ['ire', 'islamic*', 'muslim*']},
+    {'subject': 'HRE', 'education_level': 'Pre-Primary', 'keywords': ['hre', 'hindu*']},
+    {'subject': 'Mathematics', 'education_level': 'Pre-Primary', 'keywords': ['math*', 'numbers']},
+    {'subject': 'Languages', 'education_level': 'Pre-Primary', 'keywords': ['language*', 'english', 'kiswahili'], 'priority': -1},
+    {'subject': 'Environment', 'education_level': 'Pre-Primary', 'keywords': ['environment*', 'science', 'nature']},
+    {'subject': 'Psychomotor', 'education_level': 'Pre-Primary', 'keywords': ['psychomotor', 'art', 'arts', 'creative*']},
+
+    # Lower Primary
+    {'subject': 'Creative Activities', 'education_level': 'Lower Primary', 'keywords': ['creative*', 'art', 'arts', 'craft*']},
+    {'subject': 'English Activities', 'education_level': 'Lower Primary', 'keywords': ['english', 'activities'], 'priority': -1},
+    {'subject': 'Kiswahili', 'education_level': 'Lower Primary', 'keywords': ['kiswahili']},
+    {'subject': 'Mathematics', 'education_level': 'Lower Primary', 'keywords': ['math*']},
+
+    # Upper Primary
+    {'subject': 'Mathematics', 'education_level': 'Upper Primary', 'keywords': ['math*']},
+    {'subject': 'Kiswahili', 'education_level': 'Upper Primary', 'keywords': ['kiswahili']},
+    {'subject': 'Home Science', 'education_level': 'Upper Primary', 'keywords': ['home science']},
+    {'subject': 'Social Studies', 'education_level': 'Upper Primary', 'keywords': ['social studies']},
+    {'subject': 'Music', 'education_level': 'Upper Primary', 'keywords': ['music*']},
+    {'subject': 'PE', 'education_level': 'Upper Primary', 'keywords': ['pe', 'physical education']},
+    {'subject': 'Chinese', 'education_level': 'Upper Primary', 'keywords': ['chinese']},
+    {'subject': 'German', 'education_level': 'Upper Primary', 'keywords': ['german']},
+    {'subject': 'Indigenous Language', 'education_level': 'Upper Primary', 'keywords': ['indigenous language*']},
+    {'subject': 'PHE', 'education_level': 'Upper Primary', 'keywords': ['phe', 'physical health']},
+
+    # Junior Secondary
+    {'subject': 'Mathematics', 'education_level': 'Junior Secondary', 'keywords': ['math*']},
+    {'subject': 'Kiswahili', 'education_level': 'Junior Secondary', 'keywords': ['kiswahili']},
+    {'subject': 'Biology', 'education_level': 'Junior Secondary', 'keywords': ['biology']},
+    {'subject': 'Arabic', 'education_level': 'Junior Secondary', 'keywords': ['arabic']},
+    {'subject': 'French', 'education_level': 'Junior Secondary', 'keywords': ['french']},
+    {'subject': 'German', 'education_level': 'Junior Secondary', 'keywords': ['german']},
+    {'subject': 'Pre-Technical', 'education_level': 'Junior Secondary', 'keywords': ['pre technical', 'pretechnical']},
+    {'subject': 'Life Skills', 'education_level': 'Junior Secondary', 'keywords': ['life skills']},
+    {'subject': 'Computer Science', 'education_level': 'Junior Secondary', 'keywords': ['computer science']},
+    {'subject': 'Integrated Science', 'education_level': 'Junior Secondary', 'keywords': ['integrated science']},
+    {'subject': 'Physical Health Education', 'education_level': 'Junior Secondary', 'keywords': ['physical health education']},
+    {'subject': 'Sports', 'education_level': 'Junior Secondary', 'keywords': ['sports']},
+
+    # Senior Secondary STEM
+    {'subject': 'Mathematics', 'education_level': 'Senior Secondary', 'keywords': ['math*']},
+    {'subject': 'Physics', 'education_level': 'Senior Secondary', 'keywords': ['physics']},
+    {'subject': 'Chemistry', 'education_level': 'Senior Secondary', 'keywords': ['chemistry']},
+    {'subject': 'Biology', 'education_level': 'Senior Secondary', 'keywords': ['biology']},
+    {'subject': 'Computer Science', 'education_level': 'Senior Secondary', 'keywords': ['computer science']},
+    {'subject': 'Technical Subjects', 'education_level': 'Senior Secondary', 'keywords': ['technical subjects']},
+
+    # Senior Secondary Social Sciences
+    {'subject': 'Geography', 'education_level': 'Senior Secondary', 'keywords': ['geography']},
+    {'subject': 'History and Government', 'education_level': 'Senior Secondary', 'keywords': ['history', 'government']},
+    {'subject': 'Religious Education', 'education_level': 'Senior Secondary', 'keywords': ['religious*', 'education'], 'priority': -1},
+    {'subject': 'Business Education', 'education_level': 'Senior Secondary', 'keywords': ['business*', 'education'], 'priority': -1},
+
+    # Senior Secondary Creative Arts
+    {'subject': 'Music', 'education_level': 'Senior Secondary', 'keywords': ['music*']},
+    {'subject': 'Drama', 'education_level': 'Senior Secondary', 'keywords': ['drama']},
+    {'subject': 'Dance', 'education_level': 'Senior Secondary', 'keywords': ['dance']},
+    {'subject': 'Visual Arts', 'education_level': 'Senior Secondary', 'keywords': ['visual art*']},
+    {'subject': 'Fashion Design', 'education_level': 'Senior Secondary', 'keywords': ['fashion*', 'design*'], 'priority': -1},
+]
+
+# Exams pre-primary learners never sit; plain "exam" is left out because
+# pre-primary classes have term exams too
+EXAM_WORDS = {'kcse', 'kcpe', 'kjsea', 'mock', 'mocks'}
+SECONDARY_LEVELS = {'Junior Secondary', 'Senior Secondary'}
+# Level of the learners sitting each national exam
+EXAM_LEVELS = {
+    'kcse': 'Senior Secondary',
+    'kjsea': 'Junior Secondary',
+    'kcpe': 'Upper Primary',
+}
+
+
+def _secondary_words(rules):
+    """Single-word keywords of secondary subjects that no other level uses"""
+    secondary, other = set(), set()
+    for spec in rules:
+        for keyword in spec['keywords']:
+            words = keyword.rstrip('*').split()
+            if spec['education_level'] in SECONDARY_LEVELS and len(words) == 1 and not keyword.endswith('*'):
+                secondary.update(words)
+            else:
+                other.update(words)
+    return secondary - other
+
+
+SECONDARY_WORDS = _secondary_words(SUBJECT_RULES)
+
+Rule = namedtuple('Rule', ['index', 'subject', 'education_level', 'keywords', 'priority'])
+
+Classification = namedtuple('Classification', [
+    'rule',        # winning Rule, or None when no subject keyword matched
+    'grade',       # grade token found in the name ('g7', 'pp1', ...) or None
+    'candidates',  # every matching Rule, best first
+])
+
+_TOKEN_RE = re.compile(r'[a-z]+|\d+')
+
+
+def tokenize(filename):
+    """Lowercase word and number tokens; letters and digits are split apart"""
+    return _TOKEN_RE.findall(filename.lower())
+
+
+def _names_paper(tokens):
+    """True if pp1/pp2 in the name more likely means paper 1/2 than a grade"""
+    return not (EXAM_WORDS.isdisjoint(tokens) and SECONDARY_WORDS.isdisjoint(tokens))
+
+
+def extract_grade(tokens):
+    """Return the first grade token in the name ('pg', 'pp1', 'g1'..'g12') or None"""
+    papers = None
+    for i, token in enumerate(tokens):
+        if token in PLAYGROUP_WORDS:
+            return 'pg'
+        if i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            number = int(tokens[i + 1])
+            if token == 'pp' and number in (1, 2):
+                if papers is None:
+                    papers = _names_paper(tokens)
+                if not papers:
+                    return f'pp{number}'
+            if token in GRADE_WORDS and 1 <= number <= 12:
+                return f'g{number}'
+    return None
+
+
+def exam_level(tokens):
+    """Education level of the first national exam named in the tokens, or None"""
+    for token in tokens:
+        level = EXAM_LEVELS.get(token)
+        if level is not None:
+            return level
+    return None
+
+
+def grade_key(name):
+    """Grade token for a Grade name ("G7", "PP1", "Grade 10"), used to match grades"""
+    return extract_grade(tokenize(name))
+
+
+class _Node:
+    __slots__ = ('exact', 'prefix', 'hits')
+
+    def __init__(self):
+        self.exact = {}
+        self.prefix = {}
+        self.hits = []
+
+
+class Classifier:
+    """Token-trie classifier compiled once from a rule table"""
+
+    def __init__(self, rules=None):
+        self.rules = []
+        self._root = _Node()
+        self._prefix_lengths = set()
+        for index, spec in enumerate(SUBJECT_RULES if rules is None else rules):
+            rule = Rule(index, spec['subject'], spec['education_level'], tuple(spec['keywords']), spec.get('priority', 0))
+            self.rules.append(rule)
+            for keyword in rule.keywords:
+                self._add(keyword, rule.index)
+        self._prefix_lengths = sorted(self._prefix_lengths)
+
+    def _add(self, keyword, rule_index):
+        node = self._root
+        words = keyword.split()
+        for word in words:
+            if word.endswith('*'):
+                word = word[:-1]
+                self._prefix_lengths.add(len(word))
+                children = node.prefix
+            else:
+                children = node.exact
+            node = children.setdefault(word, _Node())
+        node.hits.append((rule_index, len(words)))
+
+    def _children(self, node, token):
+        child = node.exact.get(token)
+        if child is not None:
+            yield child
+        if node.prefix:
+            for length in self._prefix_lengths:
+                if length > len(token):
+                    break
+                child = node.prefix.get(token[:length])
+                if child is not None:
+                    yield child
+
+    def _match(self, tokens):
+        """rule index -> [longest phrase, set of matched keyword nodes]"""
+        matches = {}
+        for start in range(len(tokens)):
+            frontier = [self._root]
+            position = start
+            while frontier and position < len(tokens):
+                token = tokens[position]
+                next_frontier = []
+                for node in frontier:
+                    for child in self._children(node, token):
+                        for rule_index, length in child.hits:
+                            found = matches.get(rule_index)
+                            if found is None:
+                                matches[rule_index] = [length, {child}]
+                            else:
+                                found[0] = max(found[0], length)
+                                found[1].add(child)
+                        next_frontier.append(child)
+                frontier = next_frontier
+                position += 1
+        return matches
+
+    def classify(self, filename):
+        tokens = tokenize(filename)
+        grade = extract_grade(tokens)
+        matches = self._match(tokens)
+        if not matches:
+            return Classification(None, grade, ())
+
+        level = GRADE_LEVELS.get(grade) if grade else exam_level(tokens)
+
+        def score(rule_index):
+            rule = self.rules[rule_index]
+            longest, keywords = matches[rule_index]
+            return (rule.education_level == level, longest, len(keywords), rule.priority, -rule_index)
+
+        ranked = sorted(matches, key=score, reverse=True)
+        candidates = tuple(self.rules[index] for index in ranked)
+        return Classification(candidates[0], grade, candidates)
+
+
+class CoverageReport:
+    """Accumulates classification outcomes for a --dry-run report"""
+
+    def __init__(self):
+        self.total = 0
+        self.matched = 0
+        self.with_grade = 0
+        self.level_conflicts = 0
+        self.assignments = Counter()  # (subject, level) -> files
+        self.conflicts = Counter()  # (winner, runner-up) -> files, for different subjects
+        self.unmatched_tokens = Counter()
+
+    def add(self, filename, classification):
+        self.total += 1
+        rule = classification.rule
+        if classification.grade:
+            self.with_grade += 1
+        if rule is None:
+            self.unmatched_tokens.update(
+                token for token in tokenize(filename) if not token.isdigit() and len(token) > 2
+            )
+            return
+        self.matched += 1
+        self.assignments[(rule.subject, rule.education_level)] += 1
+        level = GRADE_LEVELS.get(classification.grade)
+        if level and level != rule.education_level:
+            self.level_conflicts += 1
+        for other in classification.candidates[1:]:
+            if other.subject != rule.subject:
+                self.conflicts[(
+                    f'{rule.subject} ({rule.education_level})',
+                    f'{other.subject} ({other.education_level})',
+                )] += 1
+                break
+
+    def percent(self, count):
+        return 100.0 * count / self.total if self.total else 0.0
+
+
+def synthetic_filenames(count, seed=0):
+    """Generate plausible archive file names for benchmarking"""
+    rng = random.Random(seed)
+    keywords = [keyword.rstrip('*') for spec in SUBJECT_RULES for keyword in spec['keywords']]
+    grades = ['g7', 'G10', 'grade 4', 'Grade_12', 'pp1', 'PP2', 'pg', 'gr5', '']
+    noise = ['notes', 'term', 'exam', 'revision', 'scheme', 'of', 'work', 'lesson', 'plan', 'paper', 'final', 'v2']
+    separators = ['_', '-', ' ', '.']
+    names = []
+    for _ in range(count):
+        parts = rng.sample(noise, rng.randint(1, 4))
+        if rng.random() < 0.9:
+            parts.insert(rng.randint(0, len(parts)), rng.choice(keywords))
+        grade = rng.choice(grades)
+        if grade:
+            parts.insert(rng.randint(0, len(parts)), grade)
+        if rng.random() < 0.5:
+            parts.append(str(rng.randint(2015, 2025)))
+        names.append(rng.choice(separators).join(parts))
+    return names
+
+
+def benchmark(count=100000, seed=0, classifier=None):
+    """Classify `count` synthetic names; returns timing and coverage figures"""
+    classifier = classifier or Classifier()
+    names = synthetic_filenames(count, seed)
+    report = CoverageReport()
+    started = time.perf_counter()
+    results = [classifier.classify(name) for name in names]
+    elapsed = time.perf_counter() - started
+    for name, result in zip(names, results):
+        report.add(name, result)
+    return {
+        'count': count,
+        'seconds': elapsed,
+        'per_second': count / elapsed if elapsed else 0.0,
+        'microseconds_each': elapsed * 1e6 / count if count else 0.0,
+        'matched_percent': report.percent(report.matched),
+        'grade_percent': report.percent(report.with_grade),
+    }
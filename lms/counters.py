@@ -0,0 +1,288 @@
+# lms/counters.py
+"""
+Write-behind buffer for Resource view and download counters.
+
+Every hit on view_resource/download_resource used to do a read-modify-write
+save() on the Resource row. Instead, increments are accumulated in the Django
+cache and periodically folded into the database with batched F() UPDATEs.
+
+Increments are grouped into time windows. Each window has its own counter
+keys plus a journal of the (field, resource_id) pairs touched in it, so a
+flusher can enumerate pending work without scanning the cache:
+
+    lms:counters:<window>:seq               -> number of journal entries
+    lms:counters:<window>:journal:<n>       -> (field, resource_id)
+    lms:counters:<window>:<field>:<id>      -> pending increment
+
+Closed windows (older than the current one plus a grace window) are flushed
+and deleted. Open windows can be force-flushed by decrementing the counter
+keys by the amount that was applied, so concurrent increments are never lost.
+
+Use a shared cache (Redis/Memcached) for the configured alias when running
+several worker processes, so the flush_resource_counters command can see the
+increments of every worker.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+VIEW_COUNT = 'view_count'
+DOWNLOAD_COUNT = 'download_count'
+COUNTER_FIELDS = (VIEW_COUNT, DOWNLOAD_COUNT)
+
+KEY_PREFIX = 'lms:counters'
+# Keep window keys around long enough for a late flush to still find them
+KEY_TIMEOUT = 60 * 60 * 24
+UPDATE_CHUNK_SIZE = 500
+
+_last_flush_attempt = 0.0
+_flush_guard = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    return caches[_setting('LMS_COUNTER_CACHE_ALIAS', 'default')]
+
+
+def _flush_interval():
+    return max(int(_setting('LMS_COUNTER_FLUSH_INTERVAL', 30)), 1)
+
+
+def _current_window(now=None):
+    return int((now if now is not None else time.time()) // _flush_interval())
+
+
+def _counter_key(window, field, resource_id):
+    return f'{KEY_PREFIX}:{window}:{field}:{resource_id}'
+
+
+def _seq_key(window):
+    return f'{KEY_PREFIX}:{window}:seq'
+
+
+def _journal_key(window, n):
+    return f'{KEY_PREFIX}:{window}:journal:{n}'
+
+
+def _flushed_window_key():
+    return f'{KEY_PREFIX}:flushed_window'
+
+
+def _lock_key():
+    return f'{KEY_PREFIX}:flush_lock'
+
+
+def buffering_enabled():
+    """Counters are buffered unless LMS_COUNTER_BUFFERING is set to False"""
+    return _setting('LMS_COUNTER_BUFFERING', True)
+
+
+def increment(resource_id, field, amount=1):
+    """
+    Record `amount` increments of `field` for a resource.
+
+    When buffering is disabled the increment is applied immediately with a
+    single F() UPDATE, which is still free of lost updates.
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Unknown counter field: {field}")
+
+    if not buffering_enabled():
+        _apply_deltas({(field, resource_id): amount})
+        return
+
+    cache = _cache()
+    window = _current_window()
+    key = _counter_key(window, field, resource_id)
+
+    # First touch of this counter in the window: journal it for the flusher
+    if cache.add(key, 0, KEY_TIMEOUT):
+        cache.add(_seq_key(window), 0, KEY_TIMEOUT)
+        n = cache.incr(_seq_key(window))
+        cache.set(_journal_key(window, n), (field, resource_id), KEY_TIMEOUT)
+
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Key evicted between add() and incr(); the journal entry still exists
+        cache.set(key, amount, KEY_TIMEOUT)
+
+    _maybe_flush()
+
+
+def record_view(resource):
+    """Buffer a view and bump the in-memory instance for rendering"""
+    increment(resource.pk, VIEW_COUNT)
+    resource.view_count += 1
+
+
+def record_download(resource):
+    """Buffer a download and bump the in-memory instance for rendering"""
+    increment(resource.pk, DOWNLOAD_COUNT)
+    resource.download_count += 1
+
+
+def _maybe_flush():
+    """Opportunistically flush closed windows from the request path"""
+    global _last_flush_attempt
+    now = time.time()
+    if now - _last_flush_attempt < _flush_interval():
+        return
+    if not _flush_guard.acquire(blocking=False):
+        return
+    try:
+        _last_flush_attempt = now
+        flush()
+    except Exception as e:
+        logger.error(f"Error flushing resource counters: {str(e)}")
+    finally:
+        _flush_guard.release()
+
+
+def _read_window(cache, window):
+    """Return {(field, resource_id): pending} for all counters journaled in a window"""
+    seq = cache.get(_seq_key(window)) or 0
+    if not seq:
+        return {}, []
+
+    journal_keys = [_journal_key(window, n) for n in range(1, seq + 1)]
+    entries = [entry for entry in cache.get_many(journal_keys).values() if entry]
+    counter_keys = {_counter_key(window, field, rid): (field, rid) for field, rid in entries}
+    values = cache.get_many(list(counter_keys))
+
+    pending = {}
+    for key, value in values.items():
+        if value:
+            pending[counter_keys[key]] = value
+    return pending, journal_keys + list(counter_keys)
+
+
+def _apply_deltas(deltas):
+    """
+    Fold {(field, resource_id): delta} into the database.
+
+    Resources sharing the same (field, delta) are updated in one statement,
+    so a flush costs a handful of UPDATEs regardless of how many rows it touches.
+    """
+    from .models import Resource
+    from . import stats
+
+    grouped = defaultdict(list)
+    downloads = {}
+    for (field, resource_id), delta in deltas.items():
+        if delta:
+            grouped[(field, delta)].append(resource_id)
+            if field == DOWNLOAD_COUNT:
+                downloads[resource_id] = delta
+
+    updated = 0
+    with transaction.atomic():
+        for (field, delta), resource_ids in grouped.items():
+            for start in range(0, len(resource_ids), UPDATE_CHUNK_SIZE):
+                chunk = resource_ids[start:start + UPDATE_CHUNK_SIZE]
+                updated += Resource.objects.filter(pk__in=chunk).update(**{field: F(field) + delta})
+        # Keep ResourceStat.total_downloads in step without re-aggregating
+        stats.apply_download_deltas(downloads)
+    return updated
+
+
+def _oldest_live_window(current):
+    """Oldest window whose keys can still be in the cache"""
+    return current - 2 - KEY_TIMEOUT // _flush_interval()
+
+
+def flush(include_open=False):
+    """
+    Apply buffered increments to the database.
+
+    Closed windows are applied and removed. With include_open=True the
+    current window is applied as well; its counters are decremented by the
+    applied amount instead of being deleted so in-flight hits are kept.
+
+    Returns the number of (field, resource) counters applied.
+    """
+    cache = _cache()
+    if not cache.add(_lock_key(), 1, 60):
+        logger.debug("Resource counter flush already running elsewhere")
+        return 0
+
+    try:
+        current = _current_window()
+        # One grace window so writers that read the clock just before the
+        # boundary have finished journaling
+        last_closed = current - 2
+        # Keys of older windows have expired, however long ago the last flush was
+        oldest = _oldest_live_window(current)
+        flushed_upto = cache.get(_flushed_window_key())
+        if flushed_upto is None or flushed_upto < oldest - 1:
+            flushed_upto = oldest - 1
+
+        applied = 0
+        window = flushed_upto + 1
+        while window <= last_closed:
+            pending, keys = _read_window(cache, window)
+            if pending:
+                _apply_deltas(pending)
+                applied += len(pending)
+            if keys:
+                cache.delete_many(keys + [_seq_key(window)])
+            cache.set(_flushed_window_key(), window, None)
+            window += 1
+
+        if include_open:
+            for window in range(max(flushed_upto, last_closed) + 1, current + 1):
+                pending, _ = _read_window(cache, window)
+                if not pending:
+                    continue
+                _apply_deltas(pending)
+                for (field, resource_id), value in pending.items():
+                    try:
+                        cache.decr(_counter_key(window, field, resource_id), value)
+                    except ValueError:
+                        pass
+                applied += len(pending)
+
+        if applied:
+            logger.info(f"Flushed {applied} buffered resource counters")
+        return applied
+    finally:
+        cache.delete(_lock_key())
+
+
+def pending_counts(resource_id):
+    """Return buffered increments not yet written for a resource"""
+    cache = _cache()
+    current = _current_window()
+    flushed_upto = cache.get(_flushed_window_key())
+    first = flushed_upto + 1 if flushed_upto is not None else current - 2
+    first = max(first, _oldest_live_window(current))
+    keys = {
+        _counter_key(window, field, resource_id): field
+        for window in range(first, current + 1)
+        for field in COUNTER_FIELDS
+    }
+    counts = dict.fromkeys(COUNTER_FIELDS, 0)
+    for key, value in cache.get_many(list(keys)).items():
+        counts[keys[key]] += value or 0
+    return counts
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        if buffering_enabled():
+            flush(include_open=True)
+    except Exception as e:
+        logger.error(f"Error flushing resource counters on exit: {str(e)}")
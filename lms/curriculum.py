@@ -0,0 +1,327 @@
+# lms/curriculum.py
+"""
+Materialized, in-memory curriculum tree.
+
+EducationLevel -> Grade -> Subject (grouped by SubjectCategory) -> Pathway
+changes rarely but is read by every navigation page. The whole hierarchy is
+loaded once per process with a handful of queries into immutable, id-indexed
+nodes, and rebuilt lazily after the signals in lms.signals report a change.
+
+Nodes mimic the attribute and related-manager names the templates already
+use (level.grades.count, grade.subjects.all, pathway.subjects.all, ...), so
+views can hand them to templates in place of model instances.
+
+Invalidation is shared between processes through a version token in the
+Django cache (see lms.cache_tokens); each process rechecks it at most every
+LMS_CURRICULUM_CHECK_INTERVAL seconds.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from .cache_tokens import get_or_add, new_token
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'lms:curriculum:version'
+
+_tree = None
+_tree_lock = threading.Lock()
+_last_check = 0.0
+_local_dirty = False
+
+
+class NodeList(tuple):
+    """Immutable sequence of nodes with the read-only bits of the manager API templates use"""
+
+    def all(self):
+        return self
+
+    def count(self):
+        return len(self)
+
+    def exists(self):
+        return bool(self)
+
+    def first(self):
+        return self[0] if self else None
+
+
+class _Node:
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _set(self, **attrs):
+        for name, value in attrs.items():
+            object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id}: {self.name}>"
+
+    def __str__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.id == other.id
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.id))
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class LevelNode(_Node):
+    __slots__ = ('id', 'name', 'order', 'description', 'icon', 'grades')
+
+
+class GradeNode(_Node):
+    __slots__ = ('id', 'name', 'order', 'description', 'education_level', 'subjects', 'pathways')
+
+    def __str__(self):
+        return f"{self.name} ({self.education_level.name})"
+
+    @property
+    def pathway_set(self):
+        return self.pathways
+
+
+class CategoryNode(_Node):
+    __slots__ = ('id', 'name', 'icon', 'description', 'subjects')
+
+
+class SubjectNode(_Node):
+    __slots__ = ('id', 'name', 'description', 'category', 'grades', 'pathways')
+
+
+class PathwayNode(_Node):
+    __slots__ = ('id', 'name', 'description', 'grade', 'subjects')
+
+    def __str__(self):
+        return f"{self.name} ({self.grade.name})"
+
+
+class CurriculumTree:
+    """Immutable snapshot of the curriculum hierarchy with O(1) lookups"""
+
+    def __init__(self, version, levels, grades, categories, subjects, pathways):
+        self.version = version
+        self.levels = NodeList(levels)
+        self.levels_by_id = {node.id: node for node in levels}
+        self.levels_by_name = {node.name: node for node in levels}
+        self.grades_by_id = {node.id: node for node in grades}
+        self.categories_by_id = {node.id: node for node in categories}
+        self.subjects_by_id = {node.id: node for node in subjects}
+        self.pathways_by_id = {node.id: node for node in pathways}
+        self.grade_count = len(grades)
+        self.subject_count = len(subjects)
+
+        self._subjects_by_grade_category = {}
+        for grade in grades:
+            grouped = {}
+            for subject in grade.subjects:
+                grouped.setdefault(subject.category.name, []).append(subject)
+            self._subjects_by_grade_category[grade.id] = {
+                name: NodeList(items) for name, items in grouped.items()
+            }
+
+        self._pathways_by_level = {}
+        self._subject_ids_by_level = {}
+        for level in levels:
+            level_pathways = []
+            subject_ids = set()
+            for grade in level.grades:
+                level_pathways.extend(grade.pathways)
+                subject_ids.update(subject.id for subject in grade.subjects)
+            self._pathways_by_level[level.id] = NodeList(level_pathways)
+            self._subject_ids_by_level[level.id] = frozenset(subject_ids)
+
+    def level(self, level_id):
+        return self.levels_by_id.get(_as_id(level_id))
+
+    def level_by_name(self, name):
+        return self.levels_by_name.get(name)
+
+    def grade(self, grade_id):
+        return self.grades_by_id.get(_as_id(grade_id))
+
+    def category(self, category_id):
+        return self.categories_by_id.get(_as_id(category_id))
+
+    def subject(self, subject_id):
+        return self.subjects_by_id.get(_as_id(subject_id))
+
+    def pathway(self, pathway_id):
+        return self.pathways_by_id.get(_as_id(pathway_id))
+
+    def subjects_for_grade_by_category(self, grade_id):
+        """{category name: subjects} for a grade, subjects ordered by name"""
+        return self._subjects_by_grade_category.get(_as_id(grade_id), {})
+
+    def pathways_for_level(self, level_id):
+        return self._pathways_by_level.get(_as_id(level_id), NodeList())
+
+    def subject_ids_for_level(self, level_id):
+        return self._subject_ids_by_level.get(_as_id(level_id), frozenset())
+
+    def subject_count_for_level(self, level_id):
+        return len(self.subject_ids_for_level(level_id))
+
+    def grade_has_subject(self, grade_id, subject_id):
+        grade = self.grade(grade_id)
+        return grade is not None and any(subject.id == _as_id(subject_id) for subject in grade.subjects)
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_tree(version=None):
+    """Load the curriculum hierarchy with a fixed number of queries"""
+    from .models import EducationLevel, Grade, SubjectCategory, Subject, Pathway
+
+    levels = {}
+    for row in EducationLevel.objects.order_by('order', 'id').values('id', 'name', 'order', 'description', 'icon'):
+        node = LevelNode()
+        node._set(grades=None, **row)
+        levels[row['id']] = node
+
+    categories = {}
+    for row in SubjectCategory.objects.order_by('name').values('id', 'name', 'icon', 'description'):
+        node = CategoryNode()
+        node._set(subjects=None, **row)
+        categories[row['id']] = node
+
+    grades = {}
+    for row in Grade.objects.order_by('order', 'id').values('id', 'name', 'order', 'description', 'education_level_id'):
+        node = GradeNode()
+        level = levels[row.pop('education_level_id')]
+        node._set(education_level=level, subjects=None, pathways=None, **row)
+        grades[row['id']] = node
+
+    subjects = {}
+    for row in Subject.objects.order_by('name', 'id').values('id', 'name', 'description', 'category_id'):
+        node = SubjectNode()
+        category = categories[row.pop('category_id')]
+        node._set(category=category, grades=None, pathways=None, **row)
+        subjects[row['id']] = node
+
+    pathways = {}
+    for row in Pathway.objects.order_by('id').values('id', 'name', 'description', 'grade_id'):
+        node = PathwayNode()
+        grade = grades[row.pop('grade_id')]
+        node._set(grade=grade, subjects=None, **row)
+        pathways[row['id']] = node
+
+    grades_by_subject = {subject_id: [] for subject_id in subjects}
+    subjects_by_grade = {grade_id: [] for grade_id in grades}
+    for subject_id, grade_id in Subject.grades.through.objects.values_list('subject_id', 'grade_id'):
+        grades_by_subject[subject_id].append(grades[grade_id])
+        subjects_by_grade[grade_id].append(subjects[subject_id])
+
+    pathways_by_subject = {subject_id: [] for subject_id in subjects}
+    subjects_by_pathway = {pathway_id: [] for pathway_id in pathways}
+    for pathway_id, subject_id in Pathway.subjects.through.objects.values_list('pathway_id', 'subject_id'):
+        pathways_by_subject[subject_id].append(pathways[pathway_id])
+        subjects_by_pathway[pathway_id].append(subjects[subject_id])
+
+    grades_by_level = {level_id: [] for level_id in levels}
+    for grade in grades.values():
+        grades_by_level[grade.education_level.id].append(grade)
+    subjects_by_category = {category_id: [] for category_id in categories}
+    for subject in subjects.values():
+        subjects_by_category[subject.category.id].append(subject)
+    pathways_by_grade = {grade_id: [] for grade_id in grades}
+    for pathway in pathways.values():
+        pathways_by_grade[pathway.grade.id].append(pathway)
+
+    # Children keep the same order the ORM default orderings produce
+    by_grade_order = lambda node: (node.order, node.id)
+    by_name = lambda node: (node.name, node.id)
+    for level in levels.values():
+        level._set(grades=NodeList(grades_by_level[level.id]))
+    for category in categories.values():
+        category._set(subjects=NodeList(subjects_by_category[category.id]))
+    for grade in grades.values():
+        grade._set(
+            subjects=NodeList(sorted(subjects_by_grade[grade.id], key=by_name)),
+            pathways=NodeList(pathways_by_grade[grade.id]),
+        )
+    for subject in subjects.values():
+        subject._set(
+            grades=NodeList(sorted(grades_by_subject[subject.id], key=by_grade_order)),
+            pathways=NodeList(pathways_by_subject[subject.id]),
+        )
+    for pathway in pathways.values():
+        pathway._set(subjects=NodeList(sorted(subjects_by_pathway[pathway.id], key=by_name)))
+
+    return CurriculumTree(
+        version,
+        list(levels.values()),
+        list(grades.values()),
+        list(categories.values()),
+        list(subjects.values()),
+        list(pathways.values()),
+    )
+
+
+def current_version():
+    """Shared curriculum version, used by caches layered on top of the tree"""
+    return get_or_add(cache, VERSION_KEY)
+
+
+def get_tree():
+    """Return the current curriculum tree, rebuilding it if it is stale"""
+    global _tree, _last_check, _local_dirty
+
+    tree = _tree
+    now = time.monotonic()
+    check_interval = getattr(settings, 'LMS_CURRICULUM_CHECK_INTERVAL', 2)
+    if tree is not None and not _local_dirty and now - _last_check < check_interval:
+        return tree
+
+    version = current_version()
+    if tree is not None and not _local_dirty and tree.version == version:
+        _last_check = now
+        return tree
+
+    with _tree_lock:
+        if _tree is None or _local_dirty or _tree.version != version:
+            _local_dirty = False
+            started = time.monotonic()
+            _tree = build_tree(version)
+            logger.debug(f"Built curriculum tree v{version} in {(time.monotonic() - started) * 1000:.1f}ms")
+        _last_check = now
+        return _tree
+
+
+def _bump_version():
+    global _local_dirty
+    cache.set(VERSION_KEY, new_token(), None)
+    _local_dirty = True
+
+
+def invalidate():
+    """Mark the tree stale in every process once the current transaction commits"""
+    global _local_dirty
+    _local_dirty = True
+    transaction.on_commit(_bump_version)
+
+
+def lookup_or_404(kind, pk):
+    """Fetch a level/grade/category/subject/pathway node or raise Http404"""
+    node = getattr(get_tree(), kind)(pk)
+    if node is None:
+        raise Http404(f"No {kind} matches the given query.")
+    return node
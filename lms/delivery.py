@@ -0,0 +1,392 @@
+# lms/delivery.py
+"""
+HTTP delivery of resource files with validators and byte ranges.
+
+deliver() answers a GET/HEAD for a file on disk, either in-process or by
+offloading the transfer to the front-end server (see deliver() for the
+LMS_FILE_DELIVERY backends). In-process responses come with:
+
+- a strong ETag derived from the file's size and modification time, and a
+  Last-Modified header, so clients can revalidate with If-None-Match or
+  If-Modified-Since and get a 304 without a body;
+- single (206 Partial Content) and multiple (multipart/byteranges) byte
+  ranges, honouring If-Range so a resumed download never mixes two versions
+  of a file, and 416 for unsatisfiable ranges;
+- a MIME type guessed from the file name instead of a blanket
+  application/octet-stream.
+
+The caller learns whether the response delivers the start of the file, so
+it can count a download once per full fetch or resumed-from-zero fetch
+instead of once per range request.
+"""
+import logging
+import mimetypes
+import os
+import re
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from django.views.decorators.http import require_http_methods
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def file_etag(stat):
+    """
+    Strong validator: changes whenever the file is replaced or rewritten.
+
+    Same format nginx uses for static files, so revalidation works whichever
+    layer answered the previous request.
+    """
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def guess_content_type(filename):
+    content_type, encoding = mimetypes.guess_type(filename)
+    if encoding or not content_type:
+        # Compressed files must not be announced as their decompressed type
+        return 'application/octet-stream'
+    return content_type
+
+
+def _etag_list(header):
+    return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+
+def _weak_match(etag, header):
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    tags = _etag_list(header)
+    if '*' in tags:
+        return True
+    strip = lambda tag: tag[2:] if tag.startswith('W/') else tag
+    return strip(etag) in {strip(tag) for tag in tags}
+
+
+def not_modified(request, etag, mtime):
+    """True when the client's cached copy is still current"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        return _weak_match(etag, if_none_match)
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _if_range_allows(request, etag, mtime):
+    """Ranges are only honoured if If-Range (when sent) still matches the file"""
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # Strong comparison; weak tags never match
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and if_range_date == int(mtime)
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header into sorted, merged (start, end) inclusive pairs.
+
+    Returns None when the header should be ignored (absent, not bytes, or
+    malformed), and [] when it is valid but nothing is satisfiable.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        if not sep:
+            return None
+        try:
+            if first.strip() == '':
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(first)
+                if last.strip():
+                    end = int(last)
+                    if end < start:
+                        return None
+                    end = min(end, size - 1)
+                else:
+                    end = size - 1
+        except ValueError:
+            return None
+        if start < size and start <= end:
+            ranges.append((start, end))
+
+    if len(ranges) > _setting('LMS_MAX_RANGES', 16):
+        # Too many pieces is a resource-exhaustion pattern; send the whole file
+        return None
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _multipart(path, ranges, size, content_type, boundary):
+    for start, end in ranges:
+        yield (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('latin-1')
+        yield from _read_range(path, start, end)
+    yield f'\r\n--{boundary}--\r\n'.encode('latin-1')
+
+
+def _multipart_length(ranges, size, content_type, boundary):
+    length = 0
+    for start, end in ranges:
+        length += len((
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('latin-1'))
+        length += end - start + 1
+    return length + len(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+
+
+def _set_validators(response, etag, mtime, as_attachment, filename):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = _setting('LMS_DOWNLOAD_CACHE_CONTROL', 'private, max-age=0, must-revalidate')
+    if filename:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+
+
+class _RangeFile:
+    """
+    File object limited to one byte range.
+
+    Exposes fileno() so a sendfile-capable wsgi.file_wrapper (gunicorn,
+    uWSGI) can send the range with sendfile(2) from the current offset for
+    Content-Length bytes; other servers fall back to the bounded read().
+    """
+
+    def __init__(self, path, start, length):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def _preflight(request, path, filename, content_type):
+    """Validators, conditional handling and range parsing shared by all backends"""
+    stat = os.stat(path)
+    info = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'etag': file_etag(stat),
+        'filename': filename or os.path.basename(path),
+        'is_head': request.method == 'HEAD',
+    }
+    info['content_type'] = content_type or guess_content_type(info['filename'])
+
+    if not_modified(request, info['etag'], info['mtime']):
+        response = HttpResponseNotModified()
+        _set_validators(response, info['etag'], info['mtime'], True, None)
+        return info, None, response
+
+    ranges = None
+    if _if_range_allows(request, info['etag'], info['mtime']):
+        ranges = parse_range(request.headers.get('Range'), info['size'])
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{info['size']}"
+        _set_validators(response, info['etag'], info['mtime'], True, None)
+        return info, ranges, response
+
+    if ranges == [(0, info['size'] - 1)]:
+        ranges = None
+    return info, ranges, None
+
+
+def _counts_as_download(info, ranges):
+    # A resumed download is counted once, when the first byte is fetched
+    return not info['is_head'] and (not ranges or ranges[0][0] == 0)
+
+
+def serve_file(request, path, filename=None, as_attachment=True, content_type=None, zero_copy=False):
+    """
+    Build the response for a file download request in this process.
+
+    With zero_copy the full file and single ranges are handed to the
+    server's wsgi.file_wrapper instead of being read by a generator.
+    Returns (response, counts_as_download); see the module docstring.
+    """
+    info, ranges, early = _preflight(request, path, filename, content_type)
+    if early is not None:
+        return early, False
+
+    size = info['size']
+    content_type = info['content_type']
+    is_head = info['is_head']
+
+    if not ranges:
+        if is_head:
+            response = HttpResponse(content_type=content_type)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        length = end - start + 1
+        if is_head:
+            response = HttpResponse(status=206, content_type=content_type)
+        elif zero_copy:
+            response = FileResponse(_RangeFile(path, start, length), status=206, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(_read_range(path, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    else:
+        boundary = uuid.uuid4().hex
+        body = () if is_head else _multipart(path, ranges, size, content_type, boundary)
+        response = StreamingHttpResponse(
+            body, status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = str(_multipart_length(ranges, size, content_type, boundary))
+
+    _set_validators(response, info['etag'], info['mtime'], as_attachment, info['filename'])
+    return response, _counts_as_download(info, ranges)
+
+
+def _x_accel_location(path):
+    """Internal nginx URI for a file under MEDIA_ROOT, or None if it lies elsewhere"""
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    real_path = os.path.realpath(path)
+    if os.path.commonpath([media_root, real_path]) != media_root:
+        return None
+    relative = os.path.relpath(real_path, media_root).replace(os.sep, '/')
+    prefix = _setting('LMS_X_ACCEL_PREFIX', '/protected-media/')
+    return prefix.rstrip('/') + '/' + quote(relative)
+
+
+def offload_file(request, path, filename=None, as_attachment=True, content_type=None, backend='x-accel'):
+    """
+    Hand the transfer to the front-end server after Django has authorised it.
+
+    nginx (X-Accel-Redirect) and Apache/lighttpd (X-Sendfile) then serve
+    ranges and conditional requests themselves. Django still answers 304/416
+    so those are never counted as downloads.
+    """
+    info, ranges, early = _preflight(request, path, filename, content_type)
+    if early is not None:
+        return early, False
+
+    response = HttpResponse(content_type=info['content_type'])
+    if backend == 'x-accel':
+        location = _x_accel_location(path)
+        if location is None:
+            logger.warning(f"{path} is outside MEDIA_ROOT; streaming it from Django instead")
+            return serve_file(request, path, filename, as_attachment, content_type)
+        response['X-Accel-Redirect'] = location
+    else:
+        response['X-Sendfile'] = os.path.realpath(path)
+    response['Content-Disposition'] = content_disposition_header(as_attachment, info['filename'])
+    return response, _counts_as_download(info, ranges)
+
+
+def deliver(request, path, filename=None, as_attachment=True, content_type=None):
+    """
+    Serve a file with the backend selected by LMS_FILE_DELIVERY:
+
+    'stream'      read and stream the file in the worker (default)
+    'sendfile'    hand full files and single ranges to wsgi.file_wrapper,
+                  which gunicorn/uWSGI implement with zero-copy sendfile(2)
+    'x-accel'     nginx X-Accel-Redirect to LMS_X_ACCEL_PREFIX, an
+                  `internal` location aliased to MEDIA_ROOT
+    'x-sendfile'  Apache mod_xsendfile / lighttpd X-Sendfile header
+
+    Permission checks stay with the caller; only the byte transfer moves.
+    """
+    backend = _setting('LMS_FILE_DELIVERY', 'stream')
+    if backend in ('x-accel', 'x-sendfile'):
+        return offload_file(request, path, filename, as_attachment, content_type, backend=backend)
+    if backend in ('stream', 'sendfile'):
+        return serve_file(request, path, filename, as_attachment, content_type, zero_copy=backend == 'sendfile')
+    raise ImproperlyConfigured(f"Unknown LMS_FILE_DELIVERY backend: {backend}")
+
+
+def serve_media(request, path):
+    """Serve a MEDIA_ROOT file inline through the configured delivery backend (DEBUG only)"""
+    # Staged chunked uploads (.uploads) and content-addressed blobs (.blobs)
+    # are internal; their files are reachable under their resource names
+    if any(part.startswith('.') for part in path.replace('\\', '/').split('/')):
+        raise Http404('Media file not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid media path')
+    if not os.path.isfile(full_path):
+        raise Http404('Media file not found')
+    response, _ = deliver(request, full_path, as_attachment=False)
+    return response
+
+
+def media_urlpatterns():
+    """URL pattern serving MEDIA_URL with range support (replaces static())"""
+    prefix = settings.MEDIA_URL.lstrip('/')
+    if not prefix or '://' in settings.MEDIA_URL:
+        return []
+    return [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(prefix), require_http_methods(['GET', 'HEAD'])(serve_media)),
+    ]
@@ -23,7 +23,7 @@ class ResourceUploadForm(forms.ModelForm):
 
     class Meta:
         model = Resource
-        fields = ['title', 'subject', 'resource_type', 'file', 'description', 'allow_download', 'is_premium']
+        fields = ['title', 'subject', 'grade', 'resource_type', 'file', 'description', 'allow_download', 'is_premium']
         widgets = {
             'title': forms.TextInput(attrs={
                 'class': 'w-full p-3 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:outline-none transition-all duration-300',
@@ -280,3 +280,18 @@ class PathwayForm(forms.ModelForm):
             raise forms.ValidationError("No grades are available. Please contact an administrator.")
         if not self.fields['subjects'].queryset.exists():
             raise forms.ValidationError("No subjects are available. Please contact an administrator.")
+
+class MoveResourcesForm(forms.Form):
+    """Target of the bulk 'move to subject' admin action"""
+    subject = forms.ModelChoiceField(queryset=Subject.objects.order_by('name'))
+    grade = forms.ModelChoiceField(
+        queryset=Grade.objects.order_by('education_level__order', 'order'), required=False,
+        help_text='Leave empty to keep each resource\'s grade where the subject is taught in it',
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        subject, grade = cleaned_data.get('subject'), cleaned_data.get('grade')
+        if subject and grade and not subject.grades.filter(pk=grade.pk).exists():
+            raise ValidationError(f"{subject.name} is not taught in {grade.name}.")
+        return cleaned_data
@@ -0,0 +1,345 @@
+# lms/instrumentation.py
+"""
+Per-request query, latency and size instrumentation with per-view budgets.
+
+InstrumentationMiddleware measures for every request:
+
+- the number of SQL queries and the time spent in them (on every database
+  alias, through connection.execute_wrapper);
+- the time spent rendering templates;
+- total latency and response size;
+
+and records them in histograms labelled by URL name (`lms:search`, ...).
+Add it first in MIDDLEWARE so the queries of the other middleware count:
+
+    MIDDLEWARE = ['lms.instrumentation.InstrumentationMiddleware', ...]
+
+Each process publishes its histograms to the Django cache every
+LMS_METRICS_PUBLISH_INTERVAL seconds; the `lms:metrics` view merges them
+into the Prometheus text format for staff users and for requests whose
+REMOTE_ADDR is in LMS_METRICS_ALLOWED_IPS. The list is empty by default: set
+it to the scraper's address, and never to 127.0.0.1 behind a reverse proxy
+on the same host, where every request comes from there. Use a shared cache
+when running several workers, as for lms.counters.
+
+Query budgets: decorate a view with @query_budget(n), or name it in the
+LMS_QUERY_BUDGETS setting ({'lms:search': 12}), to declare how many queries
+a request may take. Requests over budget are logged and counted; with
+LMS_ENFORCE_QUERY_BUDGETS = True (meant for the test settings) they raise
+QueryBudgetExceeded, so an N+1 regression fails the test that hits it.
+Budgets count every query of the request, including the session and user
+lookups and rebuilding cold caches such as the curriculum tree, so they
+must leave room for those.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'lms:metrics'
+UNRESOLVED = '<unresolved>'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+HISTOGRAMS = {
+    'lms_request_duration_seconds': ('Request latency', LATENCY_BUCKETS),
+    'lms_request_db_seconds': ('Time spent in SQL queries per request', LATENCY_BUCKETS),
+    'lms_request_template_seconds': ('Time spent rendering templates per request', LATENCY_BUCKETS),
+    'lms_request_queries': ('SQL queries per request', QUERY_BUCKETS),
+    'lms_response_bytes': ('Response body size', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'lms_requests_total': 'Requests by view and status code',
+    'lms_query_budget_exceeded_total': 'Requests that took more queries than their view allows',
+}
+
+_current = ContextVar('lms_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request took more queries than its view's budget"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def query_budget(queries):
+    """Declare the most queries one request to the decorated view may take"""
+    def decorator(view_func):
+        view_func.query_budget = queries
+        return view_func
+    return decorator
+
+
+class RequestMetrics:
+    """Measurements of the request being handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.view_func = None
+
+
+def current():
+    """Measurements of the current request, or None outside instrumented requests"""
+    return _current.get()
+
+
+def _count_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+_template_patch_lock = threading.Lock()
+_template_patched = False
+
+
+def _patch_template_render():
+    """Time Template.render; nested renders ({% include %}) count once"""
+    global _template_patched
+    with _template_patch_lock:
+        if _template_patched:
+            return
+        from django.template.base import Template
+
+        original = Template.render
+
+        def render(self, context):
+            metrics = _current.get()
+            if metrics is None or metrics.template_depth:
+                return original(self, context)
+            metrics.template_depth += 1
+            started = time.perf_counter()
+            try:
+                return original(self, context)
+            finally:
+                metrics.template_depth -= 1
+                metrics.template_time += time.perf_counter() - started
+
+        Template.render = render
+        _template_patched = True
+
+
+class MetricsRegistry:
+    """Histograms and counters of this process, keyed by metric name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.counters = {name: {} for name in COUNTERS}
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self._lock:
+            series = self.histograms[name].get(labels)
+            if series is None:
+                series = self.histograms[name][labels] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0, 'count': 0}
+            # Per-bucket counts; made cumulative when exported
+            series['buckets'][bisect_left(buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self.counters[name][labels] = self.counters[name].get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': {
+                    name: {labels: {'buckets': list(s['buckets']), 'sum': s['sum'], 'count': s['count']}
+                           for labels, s in series.items()}
+                    for name, series in self.histograms.items()
+                },
+                'counters': {name: dict(series) for name, series in self.counters.items()},
+            }
+
+
+registry = MetricsRegistry()
+_process_id = f'{socket.gethostname()}:{os.getpid()}'
+_last_publish = 0.0
+
+
+def _cache():
+    return caches[_setting('LMS_METRICS_CACHE_ALIAS', 'default')]
+
+
+def _processes_key():
+    return f'{KEY_PREFIX}:processes'
+
+
+def _process_key(process_id):
+    return f'{KEY_PREFIX}:process:{process_id}'
+
+
+def _expiry():
+    return int(_setting('LMS_METRICS_EXPIRY', 24 * 60 * 60))
+
+
+def publish(force=False):
+    """Store this process's snapshot in the cache for the metrics view"""
+    global _last_publish
+    now = time.time()
+    if not force and now - _last_publish < int(_setting('LMS_METRICS_PUBLISH_INTERVAL', 15)):
+        return
+    _last_publish = now
+    try:
+        cache = _cache()
+        cache.set(_process_key(_process_id), registry.snapshot(), _expiry())
+        processes = cache.get(_processes_key()) or []
+        if _process_id not in processes:
+            cache.set(_processes_key(), processes + [_process_id], None)
+    except Exception as e:
+        logger.error(f"Error publishing request metrics: {str(e)}")
+
+
+def collect():
+    """Merged snapshot of every process that published recently"""
+    publish(force=True)
+    cache = _cache()
+    processes = cache.get(_processes_key()) or []
+    snapshots = cache.get_many([_process_key(p) for p in processes])
+    live = [p for p in processes if _process_key(p) in snapshots]
+    if len(live) != len(processes):
+        cache.set(_processes_key(), live, None)
+
+    merged = {'histograms': {name: {} for name in HISTOGRAMS}, 'counters': {name: {} for name in COUNTERS}}
+    for snapshot in snapshots.values():
+        for name, series in snapshot['histograms'].items():
+            target = merged['histograms'].setdefault(name, {})
+            for labels, s in series.items():
+                total = target.get(labels)
+                if total is None:
+                    target[labels] = {'buckets': list(s['buckets']), 'sum': s['sum'], 'count': s['count']}
+                else:
+                    total['buckets'] = [a + b for a, b in zip(total['buckets'], s['buckets'])]
+                    total['sum'] += s['sum']
+                    total['count'] += s['count']
+        for name, series in snapshot['counters'].items():
+            target = merged['counters'].setdefault(name, {})
+            for labels, value in series.items():
+                target[labels] = target.get(labels, 0) + value
+    return merged
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus(snapshot):
+    """The Prometheus text exposition of a snapshot"""
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, s in sorted(snapshot['histograms'].get(name, {}).items()):
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], s['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_label_text(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_label_text(labels)} {s["sum"]:.6f}')
+            lines.append(f'{name}_count{_label_text(labels)} {s["count"]}')
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in sorted(snapshot['counters'].get(name, {}).items()):
+            lines.append(f'{name}{_label_text(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        try:
+            return int(response.get('Content-Length', 0))
+        except ValueError:
+            return 0
+    return len(response.content)
+
+
+def budget_for(view_name, view_func):
+    """Query budget of a view: LMS_QUERY_BUDGETS first, then @query_budget"""
+    budgets = _setting('LMS_QUERY_BUDGETS', {})
+    if view_name in budgets:
+        return budgets[view_name]
+    return getattr(view_func, 'query_budget', None)
+
+
+class InstrumentationMiddleware:
+    """Measure queries, DB time, template time, latency and size of every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _patch_template_render()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_count_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match and match.view_name else UNRESOLVED
+        labels = (('view', view_name),)
+        registry.observe('lms_request_duration_seconds', labels, duration)
+        registry.observe('lms_request_db_seconds', labels, metrics.db_time)
+        registry.observe('lms_request_template_seconds', labels, metrics.template_time)
+        registry.observe('lms_request_queries', labels, metrics.queries)
+        registry.observe('lms_response_bytes', labels, _response_size(response))
+        registry.inc('lms_requests_total', labels + (('status', str(response.status_code)),))
+
+        if settings.DEBUG:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries", '
+                f'tpl;dur={metrics.template_time * 1000:.1f}, total;dur={duration * 1000:.1f}'
+            )
+
+        budget = budget_for(view_name, metrics.view_func)
+        exceeded = budget is not None and metrics.queries > budget
+        if exceeded:
+            registry.inc('lms_query_budget_exceeded_total', labels)
+            logger.warning(f"{view_name} took {metrics.queries} queries for {request.path} (budget {budget})")
+        publish()
+        if exceeded and _setting('LMS_ENFORCE_QUERY_BUDGETS', False):
+            raise QueryBudgetExceeded(
+                f"{view_name} took {metrics.queries} queries for {request.path}, over its budget of {budget}"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_func = view_func
+        return None
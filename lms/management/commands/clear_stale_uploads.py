@@ -0,0 +1,22 @@
+# lms/management/commands/clear_stale_uploads.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from lms import uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned chunked uploads and their staging files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            help='Idle time after which an upload is abandoned (default LMS_UPLOAD_EXPIRY)'
+        )
+
+    def handle(self, *args, **options):
+        older_than = timedelta(hours=options['hours']) if options['hours'] is not None else None
+        removed = uploads.clear_stale(older_than)
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} abandoned uploads'))
@@ -0,0 +1,85 @@
+# lms/management/commands/dedupe_media.py
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lms.models import Resource
+from lms.storage import ContentAddressedStorage, hash_file
+
+
+def hash_stored_file(storage, name):
+    """SHA-256 of a stored file; runs in the worker pool"""
+    try:
+        return hash_file(storage.path(name)), None
+    except Exception as e:
+        return None, e
+
+
+class Command(BaseCommand):
+    help = 'Fold duplicate media files into shared content-addressed blobs and remove unreferenced blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how much space folding would free without changing any files'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of threads hashing files'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = Resource._meta.get_field('file').storage
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError('Resource files are not in content-addressed storage (LMS_CONTENT_ADDRESSED_STORAGE is off)')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        names = list(storage.files())
+        self.stdout.write(f'Hashing {len(names)} files not yet stored as blobs under {storage.location}')
+
+        by_digest = defaultdict(list)
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            results = pool.map(lambda name: hash_stored_file(storage, name), names)
+            for name, (digest, error) in zip(names, results):
+                if error is not None:
+                    self.stdout.write(self.style.ERROR(f'Error reading {name}: {str(error)}'))
+                    failed += 1
+                else:
+                    by_digest[digest].append(name)
+
+        folded, freed = 0, 0
+        for digest, group in by_digest.items():
+            if dry_run:
+                # All copies go if the blob exists already, all but one otherwise
+                keep = 0 if os.path.exists(storage.blob_path(digest)) else 1
+                sizes = sorted(storage.size(name) for name in group)
+                freed += sum(sizes[keep:])
+                folded += len(group)
+                continue
+            for name in group:
+                try:
+                    freed += storage.fold(name, digest)
+                    folded += 1
+                except OSError as e:
+                    self.stdout.write(self.style.ERROR(f'Error folding {name}: {str(e)}'))
+                    failed += 1
+
+        duplicates = sum(len(group) - 1 for group in by_digest.values())
+        blobs, blob_bytes = storage.collect_garbage(dry_run=dry_run)
+
+        verb = 'would free' if dry_run else 'freed'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{"Would fold" if dry_run else "Folded"} {folded} files ({duplicates} duplicates) {verb} {freed / (1024 * 1024):.1f} MB; '
+                f'{blobs} unreferenced blobs {verb} {blob_bytes / (1024 * 1024):.1f} MB; {failed} failed'
+            )
+        )
@@ -0,0 +1,26 @@
+# lms/management/commands/flush_resource_counters.py
+from django.core.management.base import BaseCommand
+from lms import counters
+
+
+class Command(BaseCommand):
+    help = 'Write buffered resource view/download counters to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--closed-only',
+            action='store_true',
+            help='Only flush closed buffer windows, leaving the current window to accumulate'
+        )
+
+    def handle(self, *args, **options):
+        if not counters.buffering_enabled():
+            self.stdout.write(
+                self.style.WARNING('Counter buffering is disabled (LMS_COUNTER_BUFFERING=False); nothing to flush')
+            )
+            return
+
+        applied = counters.flush(include_open=not options['closed_only'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed {applied} buffered resource counters')
+        )
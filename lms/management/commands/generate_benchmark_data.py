@@ -0,0 +1,38 @@
+# lms/management/commands/generate_benchmark_data.py
+from django.core.management.base import BaseCommand
+
+from lms import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Create (or remove) a synthetic catalogue for run_benchmarks on top of populate_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', type=int, default=5, help='Education levels to add')
+        parser.add_argument('--grades', type=int, default=3, help='Grades per education level')
+        parser.add_argument('--subjects', type=int, default=8, help='Subjects per grade')
+        parser.add_argument('--resources', type=int, default=10000, help='Resources spread over the new subjects')
+        parser.add_argument('--users', type=int, default=100, help='Users to add')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible data')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Remove previously generated benchmark data instead'
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            removed = benchmark.clear_data()
+            self.stdout.write(self.style.SUCCESS(f'Removed benchmark data ({removed} resources)'))
+            return
+
+        created = benchmark.generate_data(
+            levels=options['levels'],
+            grades_per_level=options['grades'],
+            subjects_per_grade=options['subjects'],
+            resources=options['resources'],
+            users=options['users'],
+            seed=options['seed'],
+        )
+        summary = ', '.join(f'{count} {name}' for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}'))
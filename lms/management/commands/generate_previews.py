@@ -0,0 +1,71 @@
+# lms/management/commands/generate_previews.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from lms import previews, processing
+from lms.models import Resource
+
+
+def render_resource(resource):
+    """Render one resource's previews; runs in the worker pool"""
+    try:
+        return previews.render(resource), None
+    except Exception as e:
+        return False, e
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Queue (or render) thumbnails and previews for resources that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Include resources that already have previews'
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Render in this process instead of queueing jobs for process_jobs'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of threads rendering with --sync'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Also delete previews no resource refers to any more'
+        )
+
+    def handle(self, *args, **options):
+        resources = Resource.objects.only('id', 'file', 'has_preview', 'content_hash').order_by('id')
+        if not options['force']:
+            resources = resources.filter(has_preview=False)
+        pending = [resource for resource in resources.iterator() if previews.can_preview(resource.file.name)]
+
+        if not options['sync']:
+            queued = processing.enqueue_many([resource.pk for resource in pending], 'render_preview')
+            self.stdout.write(self.style.SUCCESS(f'Queued {queued} preview jobs; run `manage.py process_jobs` to render them'))
+        else:
+            rendered, skipped, failed = 0, 0, 0
+            with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+                for resource, (done, error) in zip(pending, pool.map(render_resource, pending)):
+                    if error is not None:
+                        self.stdout.write(self.style.ERROR(f'Error rendering resource {resource.pk}: {str(error)}'))
+                        failed += 1
+                    elif done:
+                        rendered += 1
+                    else:
+                        skipped += 1
+            self.stdout.write(self.style.SUCCESS(f'Rendered previews for {rendered} resources, {skipped} skipped, {failed} failed'))
+
+        if options['prune']:
+            removed = previews.prune()
+            self.stdout.write(self.style.SUCCESS(f'Removed {removed} unused preview sets'))
@@ -0,0 +1,72 @@
+# lms/management/commands/process_jobs.py
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from lms import processing
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (document conversion, ...) with a bounded worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'LMS_PROCESSING_WORKERS', 2),
+            help='Number of jobs run concurrently (each conversion runs in its own child process)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when no due jobs remain instead of polling for new ones'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds between checks for new jobs when idle'
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        poll_interval = max(options['poll_interval'], 0.1)
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        succeeded = failed = 0
+
+        self.stdout.write(f'Processing jobs as {worker_id} with {workers} workers')
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    free = workers - len(running)
+                    if free:
+                        for job_id in processing.claim(worker_id, free):
+                            running.add(pool.submit(processing.run_job, job_id))
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future.result():
+                            succeeded += 1
+                        else:
+                            failed += 1
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING(f'Stopping; waiting for {len(running)} running jobs'))
+                for future in running:
+                    if future.result():
+                        succeeded += 1
+                    else:
+                        failed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Finished {succeeded} jobs ({failed} failed or rescheduled)')
+        )
@@ -0,0 +1,23 @@
+# lms/management/commands/rebuild_resource_stats.py
+from django.core.management.base import BaseCommand
+from lms import counters, stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the ResourceStat table from the Resource table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-counter-flush',
+            action='store_true',
+            help='Do not flush buffered download counters before rebuilding'
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_counter_flush'] and counters.buffering_enabled():
+            counters.flush(include_open=True)
+
+        written = stats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt resource statistics ({written} rows)')
+        )
@@ -0,0 +1,13 @@
+# lms/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from lms import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the resource full-text search index'
+
+    def handle(self, *args, **options):
+        total = search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {total} resources with the {search.backend()} search backend')
+        )
@@ -0,0 +1,61 @@
+# lms/management/commands/run_benchmarks.py
+from django.core.management.base import BaseCommand, CommandError
+
+from lms import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, queries per request and throughput of the public browsing paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['test', 'live', 'both'],
+            default='test',
+            help='Drive views through the test client, a local HTTP server, or both'
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=benchmark.SCENARIOS,
+            help='Scenario to run (repeatable; default all)'
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per scenario first')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent workers')
+        parser.add_argument('--users', type=int, default=0, help='Sign workers in as this many benchmark users')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the request plan')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Compare against a previous JSON report')
+
+    def handle(self, *args, **options):
+        modes = ['test', 'live'] if options['mode'] == 'both' else [options['mode']]
+        baseline = benchmark.load_report(options['compare']) if options['compare'] else None
+
+        def progress(mode, scenario, result):
+            self.stdout.write(
+                f"{mode:>4} {scenario:<26} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                f"p99 {result['p99_ms']:>8.2f} ms  {result['queries_mean']:>6.1f} queries  "
+                f"{result['throughput_rps']:>7.1f} req/s  {result['errors']} errors"
+            )
+
+        try:
+            report = benchmark.run(
+                modes=modes,
+                scenarios=options['scenario'] or benchmark.SCENARIOS,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                users=options['users'],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            benchmark.write_report(report, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"Wrote benchmark report to {options['output']}"))
+        if baseline is not None:
+            for line in benchmark.compare(baseline, report):
+                self.stdout.write(line)
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_resource_stats(apps, schema_editor):
+    Resource = apps.get_model('lms', 'Resource')
+    ResourceStat = apps.get_model('lms', 'ResourceStat')
+    SubjectGrades = apps.get_model('lms', 'Subject').grades.through
+
+    grade_ids = {}
+    for subject_id, grade_id in SubjectGrades.objects.values_list('subject_id', 'grade_id'):
+        grade_ids.setdefault(subject_id, []).append(grade_id)
+
+    active = Q(is_active=True)
+    rows = Resource.objects.order_by().values('subject_id', 'resource_type_id').annotate(
+        resource_count=Count('id'),
+        active_count=Count('id', filter=active),
+        premium_count=Count('id', filter=active & Q(is_premium=True)),
+        downloadable_count=Count('id', filter=active & Q(allow_download=True)),
+        total_bytes=Sum('file_size', filter=active),
+        total_downloads=Sum('download_count', filter=active),
+    )
+    stats = []
+    for row in rows:
+        row['total_bytes'] = row['total_bytes'] or 0
+        row['total_downloads'] = row['total_downloads'] or 0
+        for grade_id in [None] + grade_ids.get(row['subject_id'], []):
+            stats.append(ResourceStat(grade_id=grade_id, **row))
+    ResourceStat.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource_count', models.PositiveIntegerField(default=0)),
+                ('active_count', models.PositiveIntegerField(default=0)),
+                ('premium_count', models.PositiveIntegerField(default=0, help_text='Active premium resources')),
+                ('downloadable_count', models.PositiveIntegerField(default=0, help_text='Active resources that allow downloads')),
+                ('total_bytes', models.PositiveBigIntegerField(default=0, help_text='Size of active resources')),
+                ('total_downloads', models.PositiveBigIntegerField(default=0, help_text='Downloads of active resources')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('grade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resource_stats', to='lms.grade')),
+                ('resource_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resource_stats', to='lms.resourcetype')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resource_stats', to='lms.subject')),
+            ],
+            options={
+                'verbose_name': 'Resource Statistic',
+                'verbose_name_plural': 'Resource Statistics',
+                'indexes': [models.Index(fields=['subject', 'grade'], name='lms_resstat_subject_grade')],
+                'constraints': [models.UniqueConstraint(fields=('grade', 'subject', 'resource_type'), name='lms_resourcestat_grade_subject_type'), models.UniqueConstraint(condition=models.Q(('grade__isnull', True)), fields=('subject', 'resource_type'), name='lms_resourcestat_subject_type_total')],
+            },
+        ),
+        migrations.RunPython(populate_resource_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'lms_searchdocument_fts'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body,
+        content='lms_searchdocument', content_rowid='resource_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER lms_searchdocument_ai AFTER INSERT ON lms_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.resource_id, new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER lms_searchdocument_ad AFTER DELETE ON lms_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.resource_id, old.title, old.body);
+    END""",
+    f"""CREATE TRIGGER lms_searchdocument_au AFTER UPDATE ON lms_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.resource_id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.resource_id, new.title, new.body);
+    END""",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS lms_searchdocument_au",
+    "DROP TRIGGER IF EXISTS lms_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS lms_searchdocument_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_FORWARD = [
+    """ALTER TABLE lms_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX lms_searchdoc_vector_gin ON lms_searchdocument USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS lms_searchdoc_vector_gin",
+    "ALTER TABLE lms_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            has_fts5 = cursor.fetchone()[0]
+        # Without FTS5 lms.search falls back to its in-process index
+        if has_fts5:
+            _run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+def populate_search_documents(apps, schema_editor):
+    Resource = apps.get_model('lms', 'Resource')
+    SearchDocument = apps.get_model('lms', 'SearchDocument')
+
+    docs = []
+    resources = Resource.objects.select_related('resource_type', 'subject__category').prefetch_related(
+        'subject__grades__education_level'
+    )
+    for resource in resources.iterator(chunk_size=1000):
+        grades = list(resource.subject.grades.all())
+        parts = [
+            resource.description,
+            resource.resource_type.name,
+            resource.subject.name,
+            resource.subject.category.name,
+        ] + [grade.name for grade in grades] + sorted({grade.education_level.name for grade in grades})
+        docs.append(SearchDocument(
+            resource_id=resource.pk,
+            title=resource.title,
+            body=' '.join(part for part in parts if part),
+            subject_id=resource.subject_id,
+            resource_type_id=resource.resource_type_id,
+            is_active=resource.is_active,
+            upload_date=resource.upload_date,
+        ))
+        if len(docs) >= 1000:
+            SearchDocument.objects.bulk_create(docs)
+            docs = []
+    SearchDocument.objects.bulk_create(docs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0002_resourcestat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='lms.resource')),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('upload_date', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resource_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lms.resourcetype')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lms.subject')),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'verbose_name_plural': 'Search Documents',
+                'indexes': [models.Index(fields=['is_active', 'resource_type'], name='lms_searchdoc_active_type'), models.Index(fields=['subject'], name='lms_searchdoc_subject')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
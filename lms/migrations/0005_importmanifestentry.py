@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0004_processingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportManifestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_path', models.CharField(max_length=1024, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('mtime_ns', models.BigIntegerField(help_text='Source modification time in nanoseconds')),
+                ('content_hash', models.CharField(db_index=True, help_text='SHA-256 of the file contents', max_length=64)),
+                ('status', models.CharField(choices=[('imported', 'Imported'), ('duplicate', 'Duplicate'), ('skipped', 'Skipped'), ('failed', 'Failed')], max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resource', models.ForeignKey(blank=True, help_text='Resource created from this file, or the one it duplicates', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_entries', to='lms.resource')),
+            ],
+            options={
+                'verbose_name': 'Import Manifest Entry',
+                'verbose_name_plural': 'Import Manifest Entries',
+                'ordering': ['source_path'],
+            },
+        ),
+    ]
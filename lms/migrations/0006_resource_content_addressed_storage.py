@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:23
+
+import django.core.validators
+import lms.models
+import lms.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0005_importmanifestentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resource',
+            name='file',
+            field=models.FileField(storage=lms.storage.resource_storage, upload_to=lms.models.resource_file_path, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'ppt', 'pptx', 'xls', 'xlsx', 'txt', 'jpg', 'jpeg', 'png', 'gif', 'mp4', 'avi', 'mov', 'mp3', 'wav'])]),
+        ),
+    ]
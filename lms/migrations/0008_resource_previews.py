@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0007_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file when its thumbnail and preview were rendered', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='has_preview',
+            field=models.BooleanField(default=False, help_text='Thumbnail and preview images are available'),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='kind',
+            field=models.CharField(choices=[('convert_pdf', 'Convert to PDF'), ('render_preview', 'Render Preview')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0008_resource_previews'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['subject', '-download_count', '-upload_date', '-id'], name='lms_res_subject_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['-upload_date', '-id'], name='lms_res_recent'),
+        ),
+    ]
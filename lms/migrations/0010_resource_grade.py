@@ -0,0 +1,96 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def _slug(name):
+    return name.replace(' ', '_').lower()
+
+
+def backfill_resource_grades(apps, schema_editor):
+    """Give each resource the grade its file was filed under, else its subject's first grade"""
+    Grade = apps.get_model('lms', 'Grade')
+    Resource = apps.get_model('lms', 'Resource')
+    ResourceStat = apps.get_model('lms', 'ResourceStat')
+    SearchDocument = apps.get_model('lms', 'SearchDocument')
+    SubjectGrades = apps.get_model('lms', 'Subject').grades.through
+
+    grades = {grade.id: grade for grade in Grade.objects.select_related('education_level').order_by('order', 'id')}
+    paths = {grade_id: f'{_slug(grade.education_level.name)}/{_slug(grade.name)}/' for grade_id, grade in grades.items()}
+    subject_grades = {}
+    for subject_id, grade_id in SubjectGrades.objects.values_list('subject_id', 'grade_id'):
+        subject_grades.setdefault(subject_id, []).append(grade_id)
+    for grade_ids in subject_grades.values():
+        grade_ids.sort(key=lambda grade_id: (grades[grade_id].order, grade_id))
+
+    by_grade = {}
+    for resource_id, subject_id, name in Resource.objects.values_list('id', 'subject_id', 'file').iterator():
+        candidates = subject_grades.get(subject_id, [])
+        grade_id = next((g for g in candidates if (name or '').startswith(paths[g])), None)
+        if grade_id is None and candidates:
+            grade_id = candidates[0]
+        if grade_id is not None:
+            by_grade.setdefault(grade_id, []).append(resource_id)
+    for grade_id, resource_ids in by_grade.items():
+        for start in range(0, len(resource_ids), 500):
+            batch = resource_ids[start:start + 500]
+            Resource.objects.filter(pk__in=batch).update(grade_id=grade_id)
+            SearchDocument.objects.filter(resource_id__in=batch).update(grade_id=grade_id)
+
+    # Grade rows of ResourceStat now count the resources of that grade
+    # instead of repeating the subject's totals for every grade
+    active = Q(is_active=True)
+    rows = Resource.objects.order_by().values('subject_id', 'resource_type_id', 'grade_id').annotate(
+        resource_count=Count('id'),
+        active_count=Count('id', filter=active),
+        premium_count=Count('id', filter=active & Q(is_premium=True)),
+        downloadable_count=Count('id', filter=active & Q(allow_download=True)),
+        total_bytes=Sum('file_size', filter=active),
+        total_downloads=Sum('download_count', filter=active),
+    )
+    stats = []
+    for row in rows:
+        if row['grade_id'] is None:
+            continue
+        row['total_bytes'] = row['total_bytes'] or 0
+        row['total_downloads'] = row['total_downloads'] or 0
+        stats.append(ResourceStat(**row))
+    ResourceStat.objects.filter(grade__isnull=False).delete()
+    ResourceStat.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0009_resource_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='resource',
+            name='lms_res_subject_popular',
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='grade',
+            field=models.ForeignKey(blank=True, help_text='Grade the resource is for; defaults to the first grade of its subject', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resources', to='lms.grade'),
+        ),
+        migrations.AddField(
+            model_name='searchdocument',
+            name='grade',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lms.grade'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['grade', 'subject', '-download_count', '-upload_date', '-id'], name='lms_res_grade_subject_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=models.Index(fields=['grade'], name='lms_searchdoc_grade'),
+        ),
+        migrations.RunPython(backfill_resource_grades, migrations.RunPython.noop),
+    ]
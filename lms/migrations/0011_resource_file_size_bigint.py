@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0010_resource_grade'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resource',
+            name='file_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.db import models
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
 import os
+import uuid
+
+from .storage import resource_storage
 
 class EducationLevel(models.Model):
     """
@@ -112,11 +115,13 @@ class ResourceType(models.Model):
 
 def resource_file_path(instance, filename):
     """Generate file path for a resource file based on education level and grade"""
+    grade = instance.grade or instance.default_grade()
+    
     # Get the education level name and replace spaces with underscores
-    level_name = instance.subject.grades.first().education_level.name.replace(' ', '_').lower()
+    level_name = grade.education_level.name.replace(' ', '_').lower()
     
     # Get the grade name and replace spaces with underscores
-    grade_name = instance.subject.grades.first().name.replace(' ', '_').lower()
+    grade_name = grade.name.replace(' ', '_').lower()
     
     # Get the resource type and replace spaces with underscores
     resource_type = instance.resource_type.name.lower().replace(' ', '_')
@@ -128,11 +133,22 @@ class Resource(models.Model):
     """
     Represents educational resources uploaded to the system.
     """
+    PROCESSING_CHOICES = [
+        ('ready', 'Ready'),
+        ('processing', 'Processing'),
+        ('failed', 'Processing Failed'),
+    ]
+
     title = models.CharField(max_length=200)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='resources')
+    grade = models.ForeignKey(
+        Grade, on_delete=models.SET_NULL, null=True, blank=True, related_name='resources',
+        help_text='Grade the resource is for; defaults to the first grade of its subject'
+    )
     resource_type = models.ForeignKey(ResourceType, on_delete=models.CASCADE)
     file = models.FileField(
         upload_to=resource_file_path,
+        storage=resource_storage,
         validators=[FileExtensionValidator(allowed_extensions=[
             'pdf', 'doc', 'docx', 'ppt', 'pptx', 'xls', 'xlsx', 'txt', 'jpg', 'jpeg', 'png', 'gif', 'mp4', 'avi', 'mov', 'mp3', 'wav'
         ])]
@@ -145,24 +161,258 @@ class Resource(models.Model):
     allow_download = models.BooleanField(default=False)
     is_premium = models.BooleanField(default=False)
     description = models.TextField(blank=True)
-    file_size = models.PositiveIntegerField(default=0)
+    file_size = models.PositiveBigIntegerField(default=0)
     download_count = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     view_count = models.PositiveIntegerField(default=0)
+    processing_status = models.CharField(
+        max_length=20, choices=PROCESSING_CHOICES, default='ready',
+        help_text='Background conversion state; the original file is served until ready'
+    )
+    content_hash = models.CharField(
+        max_length=64, blank=True, db_index=True,
+        help_text='SHA-256 of the file when its thumbnail and preview were rendered'
+    )
+    has_preview = models.BooleanField(default=False, help_text='Thumbnail and preview images are available')
     
     class Meta:
         verbose_name = 'Resource'
         verbose_name_plural = 'Resources'
         ordering = ['-upload_date']
+        indexes = [
+            # Keyset pagination of subject pages and of the resource list. is_active
+            # stays out: Django filters booleans as a bare column, which cannot
+            # match an index column, and it would stop the index providing the order
+            models.Index(fields=['grade', 'subject', '-download_count', '-upload_date', '-id'], name='lms_res_grade_subject_popular'),
+            models.Index(fields=['-upload_date', '-id'], name='lms_res_recent'),
+        ]
     
     def __str__(self):
         return self.title
     
+    def default_grade(self):
+        """First grade the subject is taught in, for resources saved without one"""
+        return self.subject.grades.first()
+    
     def save(self, *args, **kwargs):
+        if self.grade_id is None and self.subject_id:
+            self.grade = self.default_grade()
         if self.file and self.file.size:
             self.file_size = self.file.size
         super().save(*args, **kwargs)
     
     @property
     def file_extension(self):
-        return os.path.splitext(self.file.name)[1][1:].upper()
\ No newline at end of file
+        return os.path.splitext(self.file.name)[1][1:].upper()
+
+    @property
+    def thumbnail_url(self):
+        from .previews import derivative_url
+        return derivative_url(self.content_hash, 'thumb') if self.has_preview and self.content_hash else None
+
+    @property
+    def preview_url(self):
+        from .previews import derivative_url
+        return derivative_url(self.content_hash, 'preview') if self.has_preview and self.content_hash else None
+
+    def can_download(self, user):
+        """Downloads must be allowed; premium resources need a signed-in user"""
+        if not self.allow_download:
+            return False
+        if user.is_staff or not self.is_premium:
+            return True
+        return user.is_authenticated
+
+class ResourceStat(models.Model):
+    """
+    Denormalized resource counters per (grade, subject, resource type).
+
+    Rows with a grade hold the figures of the resources filed under that
+    grade; the row with grade=NULL holds the totals for the subject and type,
+    so level and site totals can be summed without double counting.
+    Maintained by lms.stats; rebuild with `manage.py rebuild_resource_stats`.
+    """
+    grade = models.ForeignKey(Grade, on_delete=models.CASCADE, null=True, blank=True, related_name='resource_stats')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='resource_stats')
+    resource_type = models.ForeignKey(ResourceType, on_delete=models.CASCADE, related_name='resource_stats')
+    resource_count = models.PositiveIntegerField(default=0)
+    active_count = models.PositiveIntegerField(default=0)
+    premium_count = models.PositiveIntegerField(default=0, help_text='Active premium resources')
+    downloadable_count = models.PositiveIntegerField(default=0, help_text='Active resources that allow downloads')
+    total_bytes = models.PositiveBigIntegerField(default=0, help_text='Size of active resources')
+    total_downloads = models.PositiveBigIntegerField(default=0, help_text='Downloads of active resources')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resource Statistic'
+        verbose_name_plural = 'Resource Statistics'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['grade', 'subject', 'resource_type'],
+                name='lms_resourcestat_grade_subject_type',
+            ),
+            models.UniqueConstraint(
+                fields=['subject', 'resource_type'],
+                condition=models.Q(grade__isnull=True),
+                name='lms_resourcestat_subject_type_total',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['subject', 'grade'], name='lms_resstat_subject_grade'),
+        ]
+
+    def __str__(self):
+        grade_name = self.grade.name if self.grade_id else 'All grades'
+        return f"{self.subject.name} / {self.resource_type.name} ({grade_name})"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized search text for a resource, maintained by lms.search.
+
+    On SQLite it feeds an FTS5 table through triggers and on PostgreSQL a
+    generated tsvector column with a GIN index (see migration 0003); other
+    databases use the in-process index in lms.search.
+    """
+    resource = models.OneToOneField(Resource, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='+')
+    grade = models.ForeignKey(Grade, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    resource_type = models.ForeignKey(ResourceType, on_delete=models.CASCADE, related_name='+')
+    is_active = models.BooleanField(default=True)
+    upload_date = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Search Document'
+        verbose_name_plural = 'Search Documents'
+        indexes = [
+            models.Index(fields=['is_active', 'resource_type'], name='lms_searchdoc_active_type'),
+            models.Index(fields=['subject'], name='lms_searchdoc_subject'),
+            models.Index(fields=['grade'], name='lms_searchdoc_grade'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class ProcessingJob(models.Model):
+    """
+    A unit of background work on a resource (e.g. DOC/PPT to PDF conversion).
+
+    Jobs are queued by lms.processing and run by `manage.py process_jobs`,
+    which claims pending rows, runs them in a bounded pool with a timeout and
+    retries failures with exponential backoff.
+    """
+    KIND_CHOICES = [
+        ('convert_pdf', 'Convert to PDF'),
+        ('render_preview', 'Render Preview'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='processing_jobs')
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(help_text='Earliest time the job may be claimed')
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Processing Job'
+        verbose_name_plural = 'Processing Jobs'
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='lms_procjob_status_run'),
+            models.Index(fields=['resource', 'kind'], name='lms_procjob_resource_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.resource_id} ({self.status})"
+
+
+class ImportManifestEntry(models.Model):
+    """
+    One source file seen by `manage.py import_pdfs`.
+
+    Re-runs compare size and mtime against the manifest so unchanged files
+    are not re-read, entries are written in the same transaction as their
+    resources so an interrupted run resumes after the last committed chunk,
+    and content_hash identifies duplicate files regardless of their names.
+    """
+    STATUS_CHOICES = [
+        ('imported', 'Imported'),
+        ('duplicate', 'Duplicate'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    ]
+
+    source_path = models.CharField(max_length=1024, unique=True)
+    size = models.PositiveBigIntegerField()
+    mtime_ns = models.BigIntegerField(help_text='Source modification time in nanoseconds')
+    content_hash = models.CharField(max_length=64, db_index=True, help_text='SHA-256 of the file contents')
+    resource = models.ForeignKey(
+        Resource, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_entries',
+        help_text='Resource created from this file, or the one it duplicates'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Import Manifest Entry'
+        verbose_name_plural = 'Import Manifest Entries'
+        ordering = ['source_path']
+
+    def __str__(self):
+        return f"{self.source_path} ({self.status})"
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload in progress.
+
+    Chunks are written to a staging file by lms.uploads; `received` is the
+    offset the next chunk must start at. Finalizing verifies the staging
+    file and creates the resource through ResourceUploadForm.
+    """
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('receiving', 'Receiving Chunk'),
+        ('finalizing', 'Finalizing'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text='Declared size of the whole file in bytes')
+    received = models.PositiveBigIntegerField(default=0, help_text='Bytes stored so far')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    resource = models.ForeignKey(
+        Resource, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_sessions'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Upload Session'
+        verbose_name_plural = 'Upload Sessions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='lms_upload_status_updated'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} bytes, {self.status})"
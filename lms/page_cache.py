@@ -0,0 +1,176 @@
+# lms/page_cache.py
+"""
+Full-page cache for anonymous visitors of the public browsing pages.
+
+The dashboards render the same HTML for every anonymous visitor, so their
+responses are kept in the cache and replayed without touching the database
+or the template engine:
+
+    @page_cache.anonymous('grade:{grade_id}', 'subject:{subject_id}')
+    def subject_dashboard(request, grade_id, subject_id): ...
+
+A page is stored under its path and query string together with the
+curriculum version and the current token of each scope it names (formatted
+with the view's URL kwargs). Changing data never deletes pages; it moves
+the tokens of the scopes it affects, so only the pages depending on them
+miss and are rebuilt:
+
+- curriculum changes move the curriculum version (every page);
+- a saved, deleted or bulk-updated resource moves `resources`,
+  `subject:<id>`, `category:<id>`, `grade:<id>` and `level:<id>` for the
+  place it left and the place it is in now;
+- resource type changes move `types` (every page).
+
+Tokens come from lms.cache_tokens, so a token lost from the cache can
+never bring back pages cached under an older one. Download and view
+counters are folded in without signals, so pages showing them may lag by
+up to LMS_PAGE_CACHE_TIMEOUT seconds (300).
+
+Only GET/HEAD requests from anonymous visitors without pending messages
+are served from or stored in the cache, and only plain 200 responses that
+set no cookies and added no messages are stored. Every response says what
+happened in an X-Page-Cache header: HIT, MISS or BYPASS. Set LMS_PAGE_CACHE
+to False to disable the cache; LMS_PAGE_CACHE_ALIAS picks the cache.
+"""
+import hashlib
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from . import curriculum
+from .cache_tokens import get_or_add_many, new_token
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'lms:pages'
+HEADER = 'X-Page-Cache'
+# Scopes every page depends on besides the curriculum version
+GLOBAL_SCOPES = ('types',)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    return caches[_setting('LMS_PAGE_CACHE_ALIAS', 'default')]
+
+
+def enabled():
+    return _setting('LMS_PAGE_CACHE', True)
+
+
+def timeout():
+    return int(_setting('LMS_PAGE_CACHE_TIMEOUT', 300))
+
+
+def _scope_key(scope):
+    return f'{KEY_PREFIX}:scope:{scope}'
+
+
+def tokens(scopes):
+    """{scope: token}, giving scopes that have none yet a fresh one"""
+    keys = {_scope_key(scope): scope for scope in scopes}
+    found = get_or_add_many(_cache(), list(keys))
+    return {scope: found.get(key, '') for key, scope in keys.items()}
+
+
+def _rotate(scopes):
+    try:
+        _cache().set_many({_scope_key(scope): new_token() for scope in scopes}, None)
+    except Exception as e:
+        logger.error(f"Error invalidating cached pages {sorted(scopes)}: {str(e)}")
+
+
+def invalidate(*scopes):
+    """Drop the pages depending on scopes once the current transaction commits"""
+    scopes = frozenset(scopes)
+    if scopes:
+        transaction.on_commit(lambda: _rotate(scopes))
+
+
+def resource_scopes(subject_id, grade_id):
+    """Scopes of the pages showing resources of a subject in a grade"""
+    tree = curriculum.get_tree()
+    scopes = {'resources'}
+    subject = tree.subject(subject_id)
+    if subject is not None:
+        scopes.add(f'subject:{subject.id}')
+        scopes.add(f'category:{subject.category.id}')
+    grade = tree.grade(grade_id)
+    if grade is not None:
+        scopes.add(f'grade:{grade.id}')
+        scopes.add(f'level:{grade.education_level.id}')
+    return scopes
+
+
+def invalidate_resources(places):
+    """Drop the pages showing resources of some (subject_id, grade_id) places after commit"""
+    scopes = set()
+    for subject_id, grade_id in places:
+        scopes |= resource_scopes(subject_id, grade_id)
+    invalidate(*scopes)
+
+
+def _bypass(request):
+    """Why a request must not use the cache, or None"""
+    if not enabled():
+        return 'disabled'
+    if request.method not in ('GET', 'HEAD'):
+        return 'method'
+    if request.user.is_authenticated:
+        return 'user'
+    # Pending messages must be shown to this visitor only
+    if 'messages' in request.COOKIES:
+        return 'messages'
+    if settings.MESSAGE_STORAGE.endswith('SessionStorage') and settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return 'messages'
+    return None
+
+
+def _page_key(request, scope_tokens):
+    parts = [request.get_full_path(), str(curriculum.current_version())]
+    parts += [f'{scope}={token}' for scope, token in sorted(scope_tokens.items())]
+    return f'{KEY_PREFIX}:page:{hashlib.sha256("|".join(parts).encode()).hexdigest()}'
+
+
+def _storable(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    storage = getattr(request, '_messages', None)
+    return not getattr(storage, 'added_new', False)
+
+
+def anonymous(*scopes):
+    """Serve the decorated view to anonymous visitors from the page cache; see the module docstring"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if _bypass(request):
+                response = view_func(request, *args, **kwargs)
+                response[HEADER] = 'BYPASS'
+                return response
+
+            cache = _cache()
+            names = list(GLOBAL_SCOPES) + [scope.format(**kwargs) for scope in scopes]
+            key = _page_key(request, tokens(names))
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response[HEADER] = 'HIT'
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if _storable(request, response):
+                cache.set(key, (response.content, response['Content-Type']), timeout())
+                response[HEADER] = 'MISS'
+            else:
+                response[HEADER] = 'BYPASS'
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,174 @@
+# lms/pagination.py
+"""
+Keyset (cursor) pagination for resource listings.
+
+Paginator pages with OFFSET, so page N reads and discards every row before
+it, and it runs a COUNT(*) on each request. KeysetPaginator instead
+remembers where a page ended: the cursor holds the sort key values of the
+last (or first) row, and the next page is the rows strictly after them,
+
+    WHERE (download_count, upload_date, id) < (:count, :date, :id)
+
+written as an OR of prefixes plus a range on the leading column, so every
+database can seek into a composite index on the sort columns. Next and
+previous pages cost the same however deep they are. Cursors are signed,
+so clients cannot forge arbitrary filters.
+
+The ordering must end with a unique field (normally `-id`) and its fields
+must not be NULL. Totals are optional and supplied by the caller, usually
+from ResourceStat, since an exact COUNT(*) is what this avoids.
+"""
+import datetime
+
+from django.core import signing
+from django.db.models import Q
+
+SALT = 'lms.pagination'
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was tampered with or belongs to another listing"""
+
+
+def _parse_ordering(ordering):
+    fields = []
+    for spec in ordering:
+        descending = spec.startswith('-')
+        fields.append((spec.lstrip('-'), descending))
+    return fields
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPage:
+    """One page of rows plus the cursors of its neighbours"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, total, per_page):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total = total
+        self.per_page = per_page
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def meta(self):
+        """Paging fields for JSON responses"""
+        return {
+            'next': self.next_cursor,
+            'previous': self.previous_cursor,
+            'per_page': self.per_page,
+            'total': self.total,
+        }
+
+
+class KeysetPaginator:
+    """
+    Page through `queryset` in `ordering` with opaque cursors.
+
+    `total` may be a number or a callable returning one (only called when a
+    page is built); it is passed through for display and never computed here.
+    """
+
+    def __init__(self, queryset, ordering, per_page, total=None, key=''):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.fields = _parse_ordering(self.ordering)
+        self.per_page = per_page
+        self.total = total
+        # Binds cursors to one listing so they cannot be replayed on another
+        self.key = key or f'{queryset.model._meta.label}:{",".join(self.ordering)}'
+
+    def _encode(self, obj, direction):
+        values = [_encode_value(getattr(obj, name)) for name, _ in self.fields]
+        return signing.dumps({'k': self.key, 'd': direction, 'v': values}, salt=SALT, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            payload = signing.loads(cursor, salt=SALT)
+        except signing.BadSignature:
+            raise InvalidCursor('Invalid cursor')
+        if not isinstance(payload, dict) or payload.get('k') != self.key or payload.get('d') not in ('n', 'p'):
+            raise InvalidCursor('Cursor does not belong to this listing')
+        values = payload.get('v')
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor('Invalid cursor')
+        opts = self.queryset.model._meta
+        try:
+            values = [opts.get_field(name).to_python(value) for (name, _), value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor('Invalid cursor')
+        return payload['d'], values
+
+    def _seek(self, values, forward):
+        """Rows strictly after (forward) or before the row with these sort values"""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # A redundant range on the leading column lets the index seek past
+        # earlier pages instead of filtering them out row by row
+        (name, descending), value = self.fields[0], values[0]
+        return Q(**{f'{name}__{"lte" if descending == forward else "gte"}': value}) & condition
+
+    def _fetch(self, values, forward):
+        """
+        Up to per_page rows after (forward) or before the sort values, from
+        the start or the end of the listing without them, in listing order;
+        and whether more rows lie beyond them
+        """
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        if forward:
+            ordering = self.ordering
+        else:
+            ordering = [spec[1:] if spec.startswith('-') else f'-{spec}' for spec in self.ordering]
+
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        return rows, more
+
+    def page(self, cursor=None):
+        """The page a cursor points to; the first page without one"""
+        direction, values = self._decode(cursor) if cursor else ('n', None)
+        forward = direction == 'n'
+        rows, more = self._fetch(values, forward)
+        if not rows and values is not None:
+            # Every row past the cursor went away after it was issued: show
+            # the end of the listing it was heading for (the last page for a
+            # next cursor, the first for a previous one) rather than a page
+            # with nothing on it and no way back
+            values, forward = None, not forward
+            rows, more = self._fetch(None, forward)
+
+        if forward:
+            has_next, has_previous = more, values is not None
+        else:
+            has_next, has_previous = values is not None, more
+        next_cursor = self._encode(rows[-1], 'n') if rows and has_next else None
+        previous_cursor = self._encode(rows[0], 'p') if rows and has_previous else None
+        total = self.total() if callable(self.total) else self.total
+        return KeysetPage(rows, next_cursor, previous_cursor, total, self.per_page)
@@ -0,0 +1,174 @@
+# lms/previews.py
+"""
+Thumbnails and first-page previews for resources.
+
+Listing pages show a small thumbnail and the viewer shows a larger preview
+of page one while the full PDF is still loading. Both are rendered by the
+`render_preview` background job (see lms.processing), queued whenever a
+resource gets a new PDF or image file, and backfilled for existing media
+with `manage.py generate_previews`.
+
+Derivatives are JPEGs in the default storage under
+LMS_DERIVATIVES_PATH/<ab>/<sha256>/<kind>.jpg, keyed by the SHA-256 of
+the file: identical files share one set and a replaced file gets a new
+one. PDF pages are rasterised with PyMuPDF when it is installed, otherwise
+with poppler's pdftoppm; images only need Pillow.
+"""
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from . import processing
+from .models import Resource
+from .storage import hash_file
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+PREVIEW_EXTENSIONS = ('.pdf',) + IMAGE_EXTENSIONS
+JPEG_QUALITY = 80
+
+
+class PreviewUnavailable(Exception):
+    """No renderer is installed for this kind of file"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def sizes():
+    """Maximum width of each derivative kind"""
+    return {
+        'thumb': int(_setting('LMS_THUMBNAIL_WIDTH', 320)),
+        'preview': int(_setting('LMS_PREVIEW_WIDTH', 1200)),
+    }
+
+
+def can_preview(file_name):
+    return bool(file_name) and file_name.lower().endswith(PREVIEW_EXTENSIONS)
+
+
+def derivative_name(digest, kind):
+    prefix = _setting('LMS_DERIVATIVES_PATH', 'derivatives/')
+    return f'{prefix}{digest[:2]}/{digest}/{kind}.jpg'
+
+
+def derivative_url(digest, kind):
+    return default_storage.url(derivative_name(digest, kind))
+
+
+def schedule(resource):
+    """Forget the previews of a replaced file and queue new ones"""
+    if resource.has_preview or resource.content_hash:
+        Resource.objects.filter(pk=resource.pk).update(has_preview=False, content_hash='')
+        resource.has_preview, resource.content_hash = False, ''
+    if can_preview(resource.file.name):
+        transaction.on_commit(lambda: processing.enqueue(resource, 'render_preview'))
+
+
+def _render_pdf_page(path, width):
+    """First page of a PDF as a PIL image about `width` pixels wide"""
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            # Releases before 1.24 only provide the old module name
+            import fitz as pymupdf
+        except ImportError:
+            pymupdf = None
+    if pymupdf is not None:
+        with pymupdf.open(path) as doc:
+            page = doc[0]
+            zoom = width / page.rect.width
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    pdftoppm = _setting('LMS_PDFTOPPM_PATH', None) or shutil.which('pdftoppm')
+    if not pdftoppm:
+        raise PreviewUnavailable('Install PyMuPDF or poppler-utils (pdftoppm) to render PDF previews')
+    with tempfile.TemporaryDirectory(prefix='lms-preview-') as work_dir:
+        output = os.path.join(work_dir, 'page')
+        subprocess.run(
+            [pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-png', '-scale-to-x', str(width), '-scale-to-y', '-1', path, output],
+            check=True, capture_output=True, timeout=processing.job_timeout(),
+        )
+        with Image.open(f'{output}.png') as page:
+            page.load()
+            return page
+
+
+def _open_image(path, width):
+    image = Image.open(path)
+    # JPEG can decode straight at a reduced scale
+    image.draft('RGB', (width, width * 4))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render(resource):
+    """Render and store the derivatives of a resource's file; False if it has none"""
+    file_name = resource.file.name
+    if not can_preview(file_name):
+        return False
+
+    path = resource.file.path
+    digest = hash_file(path)
+    widths = sizes()
+    names = {kind: derivative_name(digest, kind) for kind in widths}
+
+    # Another resource with the same file may have rendered them already
+    if not all(default_storage.exists(name) for name in names.values()):
+        largest = max(widths.values())
+        try:
+            if file_name.lower().endswith('.pdf'):
+                source = _render_pdf_page(path, largest)
+            else:
+                source = _open_image(path, largest)
+        except PreviewUnavailable as e:
+            logger.info(f"No preview for resource {resource.pk}: {e}")
+            return False
+
+        for kind, width in widths.items():
+            image = source.copy()
+            image.thumbnail((width, width * 4), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            default_storage.delete(names[kind])
+            default_storage.save(names[kind], ContentFile(buffer.getvalue()))
+
+    # Only record them if the file was not replaced meanwhile
+    Resource.objects.filter(pk=resource.pk, file=file_name).update(content_hash=digest, has_preview=True)
+    return True
+
+
+def prune():
+    """Delete derivative sets no resource refers to; returns how many were removed"""
+    prefix = _setting('LMS_DERIVATIVES_PATH', 'derivatives/').rstrip('/')
+    if not default_storage.exists(prefix):
+        return 0
+    used = set(Resource.objects.exclude(content_hash='').values_list('content_hash', flat=True))
+    removed = 0
+    for shard in default_storage.listdir(prefix)[0]:
+        for digest in default_storage.listdir(f'{prefix}/{shard}')[0]:
+            if digest in used:
+                continue
+            for name in default_storage.listdir(f'{prefix}/{shard}/{digest}')[1]:
+                default_storage.delete(f'{prefix}/{shard}/{digest}/{name}')
+            default_storage.delete(f'{prefix}/{shard}/{digest}')
+            removed += 1
+    return removed
@@ -0,0 +1,228 @@
+# lms/processing.py
+"""
+Background processing of uploaded resources.
+
+Work that is too slow for a web request (office documents to PDF, previews) is
+recorded as a ProcessingJob row and executed by `manage.py process_jobs`:
+
+- enqueue() stores a pending job next to the freshly saved resource; the
+  upload request returns immediately and the original file is served until
+  the job finishes;
+- claim() hands pending jobs to one worker with a conditional UPDATE, so
+  several worker processes can share the table without double-running a job;
+  jobs left "running" by a dead worker are reclaimed after a grace period;
+- run_job() executes the handler registered for the job's kind and either
+  marks it done, reschedules it with exponential backoff, or gives up after
+  max_attempts and marks the resource as failed.
+
+Handlers stream their output into the resource's storage rather than
+holding whole files in memory.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProcessingJob, Resource, ResourceType
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# kind -> (handler(job), updates Resource.processing_status)
+HANDLERS = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def job_timeout():
+    return int(_setting('LMS_CONVERSION_TIMEOUT', 300))
+
+
+def register(kind, tracks_status=False):
+    """Register the handler for a job kind"""
+    def decorator(func):
+        HANDLERS[kind] = (func, tracks_status)
+        return func
+    return decorator
+
+
+def _tracks_status(kind):
+    return HANDLERS.get(kind, (None, False))[1]
+
+
+def enqueue(resource, kind, max_attempts=None):
+    """Queue a job for a resource unless an identical one is already pending"""
+    job = ProcessingJob.objects.filter(resource=resource, kind=kind, status='pending').first()
+    if job is None:
+        job = ProcessingJob.objects.create(
+            resource=resource,
+            kind=kind,
+            max_attempts=max_attempts or int(_setting('LMS_PROCESSING_MAX_ATTEMPTS', 3)),
+            run_after=timezone.now(),
+        )
+    if _tracks_status(kind) and resource.processing_status != 'processing':
+        Resource.objects.filter(pk=resource.pk).update(processing_status='processing')
+        resource.processing_status = 'processing'
+    logger.info(f"Queued {kind} job {job.id} for resource {resource.pk}")
+    return job
+
+
+def enqueue_many(resource_ids, kind, max_attempts=None, batch_size=500):
+    """Queue jobs for many resources at once, skipping those with one pending"""
+    resource_ids = list(resource_ids)
+    max_attempts = max_attempts or int(_setting('LMS_PROCESSING_MAX_ATTEMPTS', 3))
+    queued = 0
+    for offset in range(0, len(resource_ids), batch_size):
+        batch = resource_ids[offset:offset + batch_size]
+        pending = set(ProcessingJob.objects.filter(
+            resource_id__in=batch, kind=kind, status='pending'
+        ).values_list('resource_id', flat=True))
+        now = timezone.now()
+        jobs = ProcessingJob.objects.bulk_create([
+            ProcessingJob(resource_id=resource_id, kind=kind, max_attempts=max_attempts, run_after=now)
+            for resource_id in batch if resource_id not in pending
+        ])
+        if _tracks_status(kind):
+            Resource.objects.filter(pk__in=batch).update(processing_status='processing')
+        queued += len(jobs)
+    if queued:
+        logger.info(f"Queued {queued} {kind} jobs")
+    return queued
+
+
+def retry(queryset):
+    """Requeue finished or failed jobs immediately with a fresh attempt budget"""
+    jobs = queryset.exclude(status='running')
+    tracked = [kind for kind, (_, tracks_status) in HANDLERS.items() if tracks_status]
+    Resource.objects.filter(
+        pk__in=jobs.filter(kind__in=tracked).values('resource_id')
+    ).update(processing_status='processing')
+    return jobs.update(status='pending', attempts=0, last_error='', run_after=timezone.now())
+
+
+def _set_resource_status(job, status):
+    if _tracks_status(job.kind):
+        Resource.objects.filter(pk=job.resource_id).update(processing_status=status)
+
+
+def reclaim_stale():
+    """Return jobs abandoned by a dead worker to the queue (or fail them)"""
+    cutoff = timezone.now() - timedelta(seconds=job_timeout() * 2)
+    stale = ProcessingJob.objects.filter(status='running', locked_at__lt=cutoff)
+    for job in stale.filter(attempts__gte=F('max_attempts')):
+        if ProcessingJob.objects.filter(pk=job.pk, status='running').update(
+            status='failed', last_error='Worker stopped before the job finished', locked_by='', locked_at=None,
+        ):
+            _set_resource_status(job, 'failed')
+    return stale.update(status='pending', locked_by='', locked_at=None)
+
+
+def claim(worker_id, limit):
+    """Atomically move up to `limit` due jobs to running for this worker"""
+    reclaim_stale()
+    now = timezone.now()
+    candidates = ProcessingJob.objects.filter(
+        status='pending', run_after__lte=now, kind__in=list(HANDLERS)
+    ).order_by('run_after', 'id').values_list('id', flat=True)[:limit * 4]
+
+    claimed = []
+    for job_id in candidates:
+        # Losing the race to another worker simply updates zero rows
+        if ProcessingJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        ):
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def run_job(job_id):
+    """Execute one claimed job; returns True on success"""
+    close_old_connections()
+    try:
+        job = ProcessingJob.objects.select_related('resource').filter(pk=job_id).first()
+        if job is None:
+            return False
+        handler, _ = HANDLERS[job.kind]
+        started = time.monotonic()
+        try:
+            handler(job)
+        except Exception as e:
+            _record_failure(job, e)
+            return False
+        ProcessingJob.objects.filter(pk=job.pk).update(status='done', last_error='', locked_by='', locked_at=None)
+        logger.info(f"{job.kind} job {job.pk} for resource {job.resource_id} finished in {time.monotonic() - started:.1f}s")
+        return True
+    finally:
+        # Worker threads hold their own connection
+        connection.close()
+
+
+def _record_failure(job, error):
+    message = str(error)[:2000]
+    if job.attempts < job.max_attempts:
+        delay = int(_setting('LMS_PROCESSING_RETRY_DELAY', 60)) * 2 ** (job.attempts - 1)
+        ProcessingJob.objects.filter(pk=job.pk).update(
+            status='pending', last_error=message, locked_by='', locked_at=None,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+        logger.warning(f"{job.kind} job {job.pk} failed (attempt {job.attempts}/{job.max_attempts}), retrying in {delay}s: {message}")
+    else:
+        ProcessingJob.objects.filter(pk=job.pk).update(status='failed', last_error=message, locked_by='', locked_at=None)
+        _set_resource_status(job, 'failed')
+        logger.error(f"{job.kind} job {job.pk} for resource {job.resource_id} failed permanently: {message}")
+
+
+@register('convert_pdf', tracks_status=True)
+def convert_pdf(job):
+    """Convert the resource's office document to PDF and swap it in"""
+    from .utils import convert_doc_to_pdf, needs_conversion
+
+    resource = job.resource
+    source_name = resource.file.name
+    if not needs_conversion(source_name):
+        Resource.objects.filter(pk=resource.pk).update(processing_status='ready')
+        return
+
+    with tempfile.TemporaryDirectory(prefix='lms-convert-') as work_dir:
+        input_path = os.path.join(work_dir, os.path.basename(source_name))
+        with resource.file.open('rb') as src, open(input_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        resource.file.close()
+
+        output_path = convert_doc_to_pdf(input_path, timeout=job_timeout())
+
+        with transaction.atomic():
+            resource = Resource.objects.select_for_update().get(pk=resource.pk)
+            if resource.file.name != source_name:
+                logger.info(f"Resource {resource.pk} file replaced during conversion; discarding result")
+                return
+            pdf_type = ResourceType.objects.filter(name='PDF').first()
+            if pdf_type is not None:
+                resource.resource_type = pdf_type
+            storage = resource.file.storage
+            with open(output_path, 'rb') as pdf:
+                resource.file.save(os.path.basename(output_path), File(pdf), save=False)
+            resource.processing_status = 'ready'
+            resource.save()
+            transaction.on_commit(lambda: storage.delete(source_name))
+
+
+@register('render_preview')
+def render_preview(job):
+    """Render the thumbnail and first-page preview of the resource's file"""
+    from .previews import render
+
+    render(job.resource)
@@ -0,0 +1,291 @@
+# lms/renditions.py
+"""
+Per-page renditions of PDF resources for the web viewer.
+
+Instead of handing PDF.js a whole textbook, the viewer asks for the page
+count and then fetches single pages as they are opened, either as WebP
+images sized to the screen or as single-page PDFs. Pages are rendered on
+first request and kept in a disk cache:
+
+- entries live under LMS_RENDITION_CACHE_DIR, keyed by the resource's
+  content hash when known (identical files share pages) or by its file's
+  name, size and mtime, so a replaced file never serves stale pages;
+- requested widths snap to LMS_RENDITION_WIDTHS so the cache holds a few
+  sizes per page rather than one per screen;
+- the cache is bounded by LMS_RENDITION_CACHE_MAX_BYTES and evicts least
+  recently used files first; a hit refreshes the file's mtime, which is
+  the recency clock, so eviction is shared by every worker process.
+
+Rendering uses PyMuPDF when installed, otherwise poppler's pdftoppm,
+pdfseparate and pdfinfo.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'image/webp', 'pdf': 'application/pdf'}
+WEBP_QUALITY = 80
+# Hits refresh an entry's recency at most this often
+TOUCH_INTERVAL = 60
+# Eviction frees space down to this fraction of the limit
+EVICT_TO = 0.9
+
+
+class RenditionUnavailable(Exception):
+    """No PDF renderer is installed"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def widths():
+    return sorted(_setting('LMS_RENDITION_WIDTHS', [480, 800, 1200, 1600, 2000]))
+
+
+def snap_width(requested):
+    """Smallest configured width covering the request, or the largest one"""
+    available = widths()
+    for width in available:
+        if width >= requested:
+            return width
+    return available[-1]
+
+
+def _timeout():
+    return int(_setting('LMS_RENDITION_TIMEOUT', 30))
+
+
+class RenditionCache:
+    """Files on disk bounded by total size, evicted least recently used first"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None
+
+    def path(self, key, name):
+        return os.path.join(self.root, key[:2], key, name)
+
+    def get(self, path):
+        """The cached file, marked as recently used, or None"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+        return path
+
+    def put(self, path, write):
+        """Create path by calling write(temp_path), then enforce the size limit"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+        os.close(fd)
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._added(os.path.getsize(path))
+        return path
+
+    def _entries(self):
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.tmp-'):
+                    continue
+                full_path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, full_path
+
+    def _added(self, size):
+        with self._lock:
+            # Other processes write too: the running total is an estimate,
+            # corrected by a full scan whenever it crosses the limit
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._entries())
+            else:
+                self._total += size
+            if self._total > self.max_bytes:
+                self._total = self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        removed = 0
+        for _, size, full_path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(full_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} page renditions; cache now {total / (1024 * 1024):.1f} MB")
+        return total
+
+
+@lru_cache(maxsize=None)
+def get_cache():
+    root = _setting('LMS_RENDITION_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'lms-renditions'))
+    return RenditionCache(root, int(_setting('LMS_RENDITION_CACHE_MAX_BYTES', 1024 * 1024 * 1024)))
+
+
+def _pymupdf():
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            import fitz as pymupdf
+        except ImportError:
+            return None
+    return pymupdf
+
+
+def _poppler(tool):
+    path = shutil.which(tool)
+    if not path:
+        raise RenditionUnavailable('Install PyMuPDF or poppler-utils to render PDF pages')
+    return path
+
+
+def available():
+    return _pymupdf() is not None or shutil.which('pdftoppm') is not None
+
+
+def _count_pages(path):
+    pymupdf = _pymupdf()
+    if pymupdf is not None:
+        with pymupdf.open(path) as doc:
+            return doc.page_count
+    result = subprocess.run(
+        [_poppler('pdfinfo'), path], check=True, capture_output=True, text=True, timeout=_timeout()
+    )
+    match = re.search(r'^Pages:\s+(\d+)', result.stdout, re.MULTILINE)
+    if not match:
+        raise ValueError(f'Could not read the page count of {path}')
+    return int(match.group(1))
+
+
+def _write_image(path, page, width, output):
+    pymupdf = _pymupdf()
+    if pymupdf is not None:
+        with pymupdf.open(path) as doc:
+            pdf_page = doc[page - 1]
+            zoom = width / pdf_page.rect.width
+            pixmap = pdf_page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    else:
+        with tempfile.TemporaryDirectory(prefix='lms-page-') as work_dir:
+            prefix = os.path.join(work_dir, 'page')
+            subprocess.run(
+                [_poppler('pdftoppm'), '-f', str(page), '-l', str(page), '-singlefile', '-png',
+                 '-scale-to-x', str(width), '-scale-to-y', '-1', path, prefix],
+                check=True, capture_output=True, timeout=_timeout(),
+            )
+            image = Image.open(f'{prefix}.png')
+            image.load()
+    image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+
+
+def _write_pdf(path, page, output):
+    pymupdf = _pymupdf()
+    if pymupdf is not None:
+        with pymupdf.open(path) as doc, pymupdf.open() as single:
+            single.insert_pdf(doc, from_page=page - 1, to_page=page - 1)
+            single.save(output, garbage=3, deflate=True)
+        return
+    with tempfile.TemporaryDirectory(prefix='lms-page-') as work_dir:
+        target = os.path.join(work_dir, 'page.pdf')
+        subprocess.run(
+            [_poppler('pdfseparate'), '-f', str(page), '-l', str(page), path, target],
+            check=True, capture_output=True, timeout=_timeout(),
+        )
+        shutil.move(target, output)
+
+
+def _cache_key(resource, path):
+    if resource.content_hash:
+        return resource.content_hash
+    stat = os.stat(path)
+    return hashlib.sha256(f'{resource.pk}:{resource.file.name}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()
+
+
+def page_count(resource):
+    """Number of pages of a PDF resource, cached next to its renditions"""
+    if not available():
+        raise RenditionUnavailable('Install PyMuPDF or poppler-utils to render PDF pages')
+    path = resource.file.path
+    cache = get_cache()
+    info_path = cache.path(_cache_key(resource, path), 'info.json')
+    if cache.get(info_path):
+        try:
+            with open(info_path) as fh:
+                return json.load(fh)['pages']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    pages = _count_pages(path)
+
+    def write(output):
+        with open(output, 'w') as fh:
+            json.dump({'pages': pages}, fh)
+
+    cache.put(info_path, write)
+    return pages
+
+
+def render_page(resource, page, fmt='webp', width=None):
+    """Path of a cached rendition of one page, rendering it on first request"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown page format {fmt}')
+    if not 1 <= page <= page_count(resource):
+        raise IndexError(f'Page {page} does not exist')
+
+    path = resource.file.path
+    cache = get_cache()
+    key = _cache_key(resource, path)
+    if fmt == 'pdf':
+        target = cache.path(key, f'{page}.pdf')
+    else:
+        width = snap_width(width or widths()[0])
+        target = cache.path(key, f'{page}-{width}.webp')
+
+    if cache.get(target):
+        return target
+    started = time.monotonic()
+    if fmt == 'pdf':
+        cache.put(target, lambda output: _write_pdf(path, page, output))
+    else:
+        cache.put(target, lambda output: _write_image(path, page, width, output))
+    logger.debug(f"Rendered page {page} of resource {resource.pk} as {fmt} in {time.monotonic() - started:.2f}s")
+    return target
@@ -0,0 +1,477 @@
+# lms/search.py
+"""
+Full-text search over resources.
+
+Each Resource has a SearchDocument row holding its title and a body built
+from the description, subject, category, grade and resource type. The
+documents are indexed by the database when it can:
+
+- SQLite: an external-content FTS5 table (lms_searchdocument_fts) kept in
+  sync by triggers, ranked with bm25();
+- PostgreSQL: a generated, GIN-indexed tsvector column ranked with ts_rank();
+- anything else (or SQLite without FTS5): an inverted index held in process
+  memory, rebuilt when the shared version in the cache moves.
+
+All backends rank title matches above body matches, treat every query term
+as a prefix and require all terms to match. Set LMS_SEARCH_BACKEND to
+'python' to force the in-process index.
+
+Subjects, grades and education levels are few, so they are matched against
+the in-memory curriculum tree instead.
+"""
+import logging
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from . import curriculum
+from .cache_tokens import get_or_add, new_counter
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'lms_searchdocument_fts'
+VERSION_KEY = 'lms:search:version'
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+MAX_TERMS = 8
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+_backend_name = None
+
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _token_re.findall(text.lower())
+
+
+def backend():
+    """Name of the search backend in use: 'fts5', 'postgres' or 'python'"""
+    global _backend_name
+    if _backend_name is None:
+        forced = getattr(settings, 'LMS_SEARCH_BACKEND', None)
+        if forced:
+            _backend_name = forced
+        elif connection.vendor == 'postgresql':
+            _backend_name = 'postgres'
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backend_name = 'fts5'
+        else:
+            _backend_name = 'python'
+    return _backend_name
+
+
+# --- Indexing -------------------------------------------------------------
+
+def _document_fields(resource):
+    tree = curriculum.get_tree()
+    subject = tree.subject(resource.subject_id)
+    grade = tree.grade(resource.grade_id)
+    parts = [resource.description, resource.resource_type.name]
+    if subject:
+        parts.append(subject.name)
+        parts.append(subject.category.name)
+    if grade:
+        parts.append(grade.name)
+        parts.append(grade.education_level.name)
+    return {
+        'title': resource.title,
+        'body': ' '.join(part for part in parts if part),
+        'subject_id': resource.subject_id,
+        'grade_id': resource.grade_id,
+        'resource_type_id': resource.resource_type_id,
+        'is_active': resource.is_active,
+        'upload_date': resource.upload_date,
+    }
+
+
+def index_resources(resources):
+    """Create or refresh the search documents of some resources"""
+    from .models import SearchDocument
+
+    resources = list(resources)
+    if not resources:
+        return 0
+    existing = set(SearchDocument.objects.filter(
+        resource_id__in=[r.pk for r in resources]
+    ).values_list('resource_id', flat=True))
+
+    fields = ['title', 'body', 'subject_id', 'grade_id', 'resource_type_id', 'is_active', 'upload_date']
+    to_create, to_update = [], []
+    for resource in resources:
+        doc = SearchDocument(resource_id=resource.pk, **_document_fields(resource))
+        (to_update if resource.pk in existing else to_create).append(doc)
+
+    with transaction.atomic():
+        if to_create:
+            SearchDocument.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            SearchDocument.objects.bulk_update(to_update, fields, batch_size=500)
+
+    if backend() == 'python':
+        _python_index().update(
+            (doc.resource_id, doc.title, doc.body, doc.grade_id, doc.resource_type_id, doc.is_active, doc.upload_date)
+            for doc in to_create + to_update
+        )
+        _bump_version()
+    return len(resources)
+
+
+def unindex_resources(resource_ids):
+    """Drop search documents; rows cascade with the resource, this covers the in-process index"""
+    from .models import SearchDocument
+
+    resource_ids = list(resource_ids)
+    SearchDocument.objects.filter(resource_id__in=resource_ids).delete()
+    if backend() == 'python':
+        _python_index().remove(resource_ids)
+        _bump_version()
+
+
+def set_active(resource_ids, is_active):
+    """Show or hide the documents of some resources with one UPDATE"""
+    from .models import SearchDocument
+
+    documents = SearchDocument.objects.filter(resource_id__in=list(resource_ids))
+    documents.update(is_active=is_active)
+    if backend() == 'python':
+        _python_index().update(documents.values_list(
+            'resource_id', 'title', 'body', 'grade_id', 'resource_type_id', 'is_active', 'upload_date'
+        ))
+        _bump_version()
+
+
+def _resource_queryset():
+    from .models import Resource
+    return Resource.objects.select_related('resource_type').order_by('pk')
+
+
+def reindex(queryset=None, batch_size=1000):
+    """Reindex resources in batches; returns the number indexed"""
+    queryset = queryset if queryset is not None else _resource_queryset()
+    total = 0
+    batch = []
+    for resource in queryset.iterator(chunk_size=batch_size):
+        batch.append(resource)
+        if len(batch) >= batch_size:
+            total += index_resources(batch)
+            batch = []
+    total += index_resources(batch)
+    return total
+
+
+def rebuild():
+    """Recreate every search document and the database index behind them"""
+    from .models import SearchDocument
+
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        total = reindex()
+        if backend() == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    if backend() == 'python':
+        _bump_version(keep_local=False)
+    return total
+
+
+def schedule_index(resource_id):
+    """Index a resource once the surrounding transaction commits"""
+    def run():
+        try:
+            resource = _resource_queryset().filter(pk=resource_id).first()
+            if resource is None:
+                unindex_resources([resource_id])
+            else:
+                index_resources([resource])
+        except Exception as e:
+            logger.error(f"Error indexing resource {resource_id}: {str(e)}")
+    transaction.on_commit(run)
+
+
+def schedule_reindex(**filters):
+    """Reindex resources matching filters (e.g. subject_id=...) after commit"""
+    def run():
+        try:
+            reindex(_resource_queryset().filter(**filters).distinct())
+        except Exception as e:
+            logger.error(f"Error reindexing resources {filters}: {str(e)}")
+    transaction.on_commit(run)
+
+
+# --- Querying -------------------------------------------------------------
+
+def _fts5_match(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _postgres_tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _filter_sql(filters, params):
+    clauses = ['d.is_active']
+    if filters.get('resource_type_id'):
+        clauses.append('d.resource_type_id = %s')
+        params.append(filters['resource_type_id'])
+    if filters.get('grade_ids') is not None:
+        grade_ids = list(filters['grade_ids']) or [0]
+        clauses.append(f"d.grade_id IN ({', '.join(['%s'] * len(grade_ids))})")
+        params.extend(grade_ids)
+    return ' AND '.join(clauses)
+
+
+def _sql_search(terms, filters, offset, limit, count_only):
+    params = []
+    if backend() == 'fts5':
+        source = f"{FTS_TABLE} f JOIN lms_searchdocument d ON d.resource_id = f.rowid"
+        match = f"{FTS_TABLE} MATCH %s"
+        params.append(_fts5_match(terms))
+        rank = f"bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})"
+        order = 'rank ASC'
+    else:
+        source = "lms_searchdocument d, to_tsquery('simple', %s) q"
+        match = 'd.search_vector @@ q'
+        params.append(_postgres_tsquery(terms))
+        rank = 'ts_rank(d.search_vector, q)'
+        order = 'rank DESC'
+    where = f"{match} AND {_filter_sql(filters, params)}"
+
+    with connection.cursor() as cursor:
+        if count_only:
+            cursor.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params)
+            return cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT d.resource_id, {rank} AS rank FROM {source} WHERE {where} "
+            f"ORDER BY {order}, d.upload_date DESC LIMIT %s OFFSET %s",
+            params + [limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndex:
+    """In-process inverted index used when the database has no full-text search"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self._postings = defaultdict(dict)
+        self._docs = {}
+        self._doc_tokens = {}
+        self._sorted_tokens = None
+        self._lock = threading.RLock()
+
+    def update(self, rows):
+        with self._lock:
+            for doc_id, title, body, grade_id, type_id, is_active, upload_date in rows:
+                self._remove(doc_id)
+                weights = defaultdict(float)
+                for token in tokenize(title):
+                    weights[token] += TITLE_WEIGHT
+                for token in tokenize(body):
+                    weights[token] += BODY_WEIGHT
+                for token, weight in weights.items():
+                    self._postings[token][doc_id] = weight
+                self._doc_tokens[doc_id] = tuple(weights)
+                self._docs[doc_id] = (grade_id, type_id, is_active, upload_date.timestamp() if upload_date else 0)
+            self._sorted_tokens = None
+
+    def remove(self, doc_ids):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+            self._sorted_tokens = None
+
+    def _remove(self, doc_id):
+        for token in self._doc_tokens.pop(doc_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+        self._docs.pop(doc_id, None)
+
+    def _expand(self, term):
+        """All indexed tokens starting with term"""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        tokens = self._sorted_tokens
+        i = bisect_left(tokens, term)
+        while i < len(tokens) and tokens[i].startswith(term):
+            yield tokens[i]
+            i += 1
+
+    def search(self, terms, filters):
+        with self._lock:
+            total_docs = max(len(self._docs), 1)
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for token in self._expand(term):
+                    postings = self._postings[token]
+                    idf = math.log(1 + total_docs / len(postings))
+                    for doc_id, weight in postings.items():
+                        term_scores[doc_id] += weight * idf
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: score + term_scores[doc_id] for doc_id, score in scores.items() if doc_id in term_scores}
+                if not scores:
+                    return []
+
+            type_id = filters.get('resource_type_id')
+            grade_ids = filters.get('grade_ids')
+            matches = []
+            for doc_id, score in scores.items():
+                grade_id, doc_type_id, is_active, uploaded = self._docs[doc_id]
+                if not is_active:
+                    continue
+                if type_id and doc_type_id != type_id:
+                    continue
+                if grade_ids is not None and grade_id not in grade_ids:
+                    continue
+                matches.append((-score, -uploaded, doc_id))
+            matches.sort()
+            return [doc_id for _, _, doc_id in matches]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _current_version():
+    # A counter, so a process can tell its own bump from another process's
+    return get_or_add(cache, VERSION_KEY, new_counter)
+
+
+def _bump_version(keep_local=True):
+    """Tell other processes to rebuild; keep our index if it already has the change"""
+    global _index
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = new_counter()
+        cache.set(VERSION_KEY, version, None)
+    index = _index
+    if not keep_local:
+        _index = None
+    elif index is not None and index.version == version - 1:
+        # Nobody else changed the index since we last synced
+        index.version = version
+    return version
+
+
+def _python_index():
+    """The process-wide in-memory index, rebuilt if another process changed it"""
+    global _index
+    version = _current_version()
+    if _index is not None and _index.version == version:
+        return _index
+    from .models import SearchDocument
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            index = InvertedIndex(version)
+            index.update(SearchDocument.objects.values_list(
+                'resource_id', 'title', 'body', 'grade_id', 'resource_type_id', 'is_active', 'upload_date'
+            ).iterator(chunk_size=2000))
+            _index = index
+        return _index
+
+
+class SearchResults:
+    """
+    Lazy, sliceable result set for a resource search.
+
+    Behaves enough like a queryset for django.core.paginator.Paginator:
+    count() runs a COUNT against the index and slicing fetches one ranked
+    page of ids, then loads those resources in a single query.
+    """
+
+    def __init__(self, query, resource_type_id=None, grade_id=None, level_id=None):
+        self.terms = tokenize(query)[:MAX_TERMS]
+        self.filters = {'resource_type_id': _as_int(resource_type_id)}
+        tree = curriculum.get_tree()
+        if grade_id:
+            grade = tree.grade(grade_id)
+            self.filters['grade_ids'] = frozenset([grade.id]) if grade else frozenset()
+        elif level_id:
+            level = tree.level(level_id)
+            self.filters['grade_ids'] = frozenset(g.id for g in level.grades) if level else frozenset()
+        self._count = None
+        self._python_ids = None
+
+    def _ids_python(self):
+        if self._python_ids is None:
+            self._python_ids = _python_index().search(self.terms, self.filters)
+        return self._python_ids
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif backend() == 'python':
+                self._count = len(self._ids_python())
+            else:
+                self._count = _sql_search(self.terms, self.filters, 0, 0, count_only=True)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if not self.terms or stop <= start:
+            return []
+        if backend() == 'python':
+            ids = self._ids_python()[start:stop]
+        else:
+            ids = _sql_search(self.terms, self.filters, start, stop - start, count_only=False)
+        return _load_resources(ids)
+
+
+def _as_int(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _load_resources(ids):
+    from .models import Resource
+
+    resources = Resource.objects.select_related('subject', 'resource_type', 'uploaded_by').in_bulk(ids)
+    return [resources[pk] for pk in ids if pk in resources]
+
+
+def search_resources(query, resource_type_id=None, grade_id=None, level_id=None):
+    """Ranked, filterable resource matches for query; paginate the returned object"""
+    return SearchResults(query, resource_type_id, grade_id, level_id)
+
+
+def search_curriculum(query, limit=10):
+    """Match levels, grades and subjects against the in-memory curriculum tree"""
+    terms = tokenize(query)[:MAX_TERMS]
+    tree = curriculum.get_tree()
+
+    def matches(node):
+        words = tokenize(f'{node.name} {node.description}')
+        return all(any(word.startswith(term) for word in words) for term in terms)
+
+    if not terms:
+        return {'education_levels': [], 'grades': [], 'subjects': []}
+    return {
+        'education_levels': [n for n in tree.levels if matches(n)][:limit],
+        'grades': [n for n in tree.grades_by_id.values() if matches(n)][:limit],
+        'subjects': [n for n in tree.subjects_by_id.values() if matches(n)][:limit],
+    }
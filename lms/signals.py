@@ -0,0 +1,136 @@
+# lms/signals.py
+"""Signal handlers keeping the lms caches, ResourceStat, the search indexes and previews in step with the database"""
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import admin_api, curriculum, page_cache, previews, search, stats, suggest
+from .models import EducationLevel, Grade, SubjectCategory, Subject, Pathway, Resource, ResourceType
+
+CURRICULUM_MODELS = (EducationLevel, Grade, SubjectCategory, Subject, Pathway)
+
+
+def invalidate_curriculum(sender, **kwargs):
+    """Any change to the curriculum hierarchy marks the tree stale"""
+    curriculum.invalidate()
+
+
+for model in CURRICULUM_MODELS:
+    post_save.connect(invalidate_curriculum, sender=model, dispatch_uid=f'curriculum_save_{model.__name__}')
+    post_delete.connect(invalidate_curriculum, sender=model, dispatch_uid=f'curriculum_delete_{model.__name__}')
+
+
+@receiver(m2m_changed, sender=Subject.grades.through, dispatch_uid='curriculum_subject_grades')
+@receiver(m2m_changed, sender=Pathway.subjects.through, dispatch_uid='curriculum_pathway_subjects')
+def invalidate_curriculum_links(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        curriculum.invalidate()
+
+
+@receiver(post_save, sender=ResourceType, dispatch_uid='admin_api_type_save')
+@receiver(post_delete, sender=ResourceType, dispatch_uid='admin_api_type_delete')
+def invalidate_resource_types(sender, **kwargs):
+    """Batched admin reads of resource types are versioned like the curriculum tree"""
+    admin_api.invalidate_types()
+
+
+@receiver(post_init, sender=Resource, dispatch_uid='stats_resource_init')
+def remember_resource_slice(sender, instance, **kwargs):
+    """Keep the slice a resource was loaded with so a move refreshes both"""
+    # Read __dict__ directly: deferred fields must not trigger a query here
+    instance._stats_slice = (instance.__dict__.get('subject_id'), instance.__dict__.get('resource_type_id'))
+
+
+@receiver(post_save, sender=Resource, dispatch_uid='stats_resource_save')
+def refresh_stats_on_save(sender, instance, **kwargs):
+    current = (instance.subject_id, instance.resource_type_id)
+    previous = getattr(instance, '_stats_slice', current)
+    stats.schedule_refresh(current, previous)
+    instance._stats_slice = current
+
+
+@receiver(post_delete, sender=Resource, dispatch_uid='stats_resource_delete')
+def refresh_stats_on_delete(sender, instance, **kwargs):
+    stats.schedule_refresh((instance.subject_id, instance.resource_type_id))
+
+
+@receiver(post_save, sender=Resource, dispatch_uid='search_resource_save')
+@receiver(post_delete, sender=Resource, dispatch_uid='search_resource_delete')
+def index_resource(sender, instance, **kwargs):
+    search.schedule_index(instance.pk)
+
+
+# Names of curriculum objects are part of each resource's search text
+@receiver(post_save, sender=Subject, dispatch_uid='search_subject_save')
+def reindex_subject_resources(sender, instance, created, **kwargs):
+    if not created:
+        search.schedule_reindex(subject_id=instance.pk)
+
+
+@receiver(post_save, sender=SubjectCategory, dispatch_uid='search_category_save')
+def reindex_category_resources(sender, instance, created, **kwargs):
+    if not created:
+        search.schedule_reindex(subject__category_id=instance.pk)
+
+
+@receiver(post_save, sender=ResourceType, dispatch_uid='search_type_save')
+def reindex_type_resources(sender, instance, created, **kwargs):
+    if not created:
+        search.schedule_reindex(resource_type_id=instance.pk)
+
+
+@receiver(post_save, sender=Grade, dispatch_uid='search_grade_save')
+def reindex_grade_resources(sender, instance, created, **kwargs):
+    if not created:
+        search.schedule_reindex(grade_id=instance.pk)
+
+
+@receiver(post_save, sender=EducationLevel, dispatch_uid='search_level_save')
+def reindex_level_resources(sender, instance, created, **kwargs):
+    if not created:
+        search.schedule_reindex(grade__education_level_id=instance.pk)
+
+
+@receiver(post_save, sender=Resource, dispatch_uid='suggest_resource_save')
+def update_resource_suggestions(sender, instance, **kwargs):
+    suggest.schedule_update(instance.pk, instance.title, instance.is_active)
+
+
+@receiver(post_delete, sender=Resource, dispatch_uid='suggest_resource_delete')
+def remove_resource_suggestions(sender, instance, **kwargs):
+    suggest.schedule_update(instance.pk, instance.title, False)
+
+
+@receiver(post_init, sender=Resource, dispatch_uid='previews_resource_init')
+def remember_resource_file(sender, instance, **kwargs):
+    instance._preview_file = instance.__dict__.get('file')
+
+
+@receiver(post_save, sender=Resource, dispatch_uid='previews_resource_save')
+def queue_resource_preview(sender, instance, created, **kwargs):
+    """A new or replaced file needs new thumbnails"""
+    name = instance.file.name
+    previous = getattr(instance, '_preview_file', None)
+    if created or (previous is not None and previous != name):
+        previews.schedule(instance)
+    instance._preview_file = name
+
+
+# After the stats handlers, so pages are rebuilt from refreshed counters
+@receiver(post_init, sender=Resource, dispatch_uid='pages_resource_init')
+def remember_resource_place(sender, instance, **kwargs):
+    instance._page_place = (instance.__dict__.get('subject_id'), instance.__dict__.get('grade_id'))
+
+
+@receiver(post_save, sender=Resource, dispatch_uid='pages_resource_save')
+@receiver(post_delete, sender=Resource, dispatch_uid='pages_resource_delete')
+def invalidate_resource_pages(sender, instance, **kwargs):
+    """Cached pages of the place a resource is in, and of the one it left"""
+    current = (instance.subject_id, instance.grade_id)
+    page_cache.invalidate_resources({current, getattr(instance, '_page_place', current)})
+    instance._page_place = current
+
+
+@receiver(post_save, sender=ResourceType, dispatch_uid='pages_type_save')
+@receiver(post_delete, sender=ResourceType, dispatch_uid='pages_type_delete')
+def invalidate_type_pages(sender, **kwargs):
+    page_cache.invalidate('types')
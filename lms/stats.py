@@ -0,0 +1,199 @@
+# lms/stats.py
+"""
+Maintenance and lookups for the ResourceStat table.
+
+Dashboards read resource counters from ResourceStat instead of counting
+Resource rows. A change to a resource only affects the (subject, resource
+type) slice it belongs to, so that slice is re-aggregated by Resource.grade
+with one indexed query after the transaction commits and its rows are
+rewritten: one row per grade holding that grade's resources and the
+grade=NULL row holding their sum. Download counts folded in by lms.counters
+are applied as increments.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = (
+    'resource_count',
+    'active_count',
+    'premium_count',
+    'downloadable_count',
+    'total_bytes',
+    'total_downloads',
+)
+
+# Aggregates computing STAT_FIELDS from Resource rows
+_active = Q(is_active=True)
+AGGREGATES = {
+    'resource_count': Count('id'),
+    'active_count': Count('id', filter=_active),
+    'premium_count': Count('id', filter=_active & Q(is_premium=True)),
+    'downloadable_count': Count('id', filter=_active & Q(allow_download=True)),
+    'total_bytes': Sum('file_size', filter=_active),
+    'total_downloads': Sum('download_count', filter=_active),
+}
+
+
+def _clean(values):
+    return {field: values.get(field) or 0 for field in STAT_FIELDS}
+
+
+def _with_totals(by_grade):
+    """{grade_id: values} plus the all-grades row summing them under None"""
+    rows = {grade_id: values for grade_id, values in by_grade.items() if grade_id is not None}
+    rows[None] = {field: sum(values[field] for values in by_grade.values()) for field in STAT_FIELDS}
+    return rows
+
+
+def _aggregate(resources):
+    """{(subject_id, resource_type_id): {grade_id: values}} for some resources"""
+    slices = defaultdict(dict)
+    for row in resources.order_by().values('subject_id', 'resource_type_id', 'grade_id').annotate(**AGGREGATES):
+        key = (row.pop('subject_id'), row.pop('resource_type_id'))
+        slices[key][row.pop('grade_id')] = _clean(row)
+    return {key: _with_totals(by_grade) for key, by_grade in slices.items()}
+
+
+def _write_slice(subject_id, resource_type_id, rows):
+    """Make the rows of one (subject, type) slice match {grade_id: values}"""
+    from .models import ResourceStat
+
+    existing_rows = ResourceStat.objects.filter(subject_id=subject_id, resource_type_id=resource_type_id)
+    if not rows or not rows[None]['resource_count']:
+        existing_rows.delete()
+        return
+
+    existing = set(existing_rows.values_list('grade_id', flat=True))
+    stale = existing - set(rows)
+    if stale:
+        # The all-grades row is always wanted, so stale ids are real grades
+        existing_rows.filter(grade_id__in=stale).delete()
+    for grade_id in existing & set(rows):
+        existing_rows.filter(grade_id=grade_id).update(**rows[grade_id])
+    missing = set(rows) - existing
+    if missing:
+        ResourceStat.objects.bulk_create([
+            ResourceStat(grade_id=grade_id, subject_id=subject_id, resource_type_id=resource_type_id, **rows[grade_id])
+            for grade_id in missing
+        ])
+
+
+def refresh(subject_id, resource_type_id):
+    """Recompute the stats rows for one subject and resource type"""
+    refresh_many([(subject_id, resource_type_id)])
+
+
+def refresh_many(keys):
+    """Recompute several (subject_id, resource_type_id) slices with one aggregate query"""
+    from .models import Resource
+
+    keys = {key for key in keys if None not in key}
+    if not keys:
+        return
+    subject_ids = {subject_id for subject_id, _ in keys}
+    aggregated = _aggregate(Resource.objects.filter(subject_id__in=subject_ids))
+    with transaction.atomic():
+        for key in keys:
+            _write_slice(*key, aggregated.get(key))
+
+
+def schedule_refresh(*keys):
+    """Refresh slices once the surrounding transaction commits"""
+    keys = tuple(keys)
+    transaction.on_commit(lambda: _safe(refresh_many, keys))
+
+
+def _safe(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        logger.error(f"Error refreshing resource stats: {str(e)}")
+
+
+def apply_download_deltas(deltas):
+    """Fold {resource_id: downloads} into total_downloads without re-aggregating"""
+    from .models import Resource, ResourceStat
+
+    if not deltas:
+        return
+    by_slice = defaultdict(int)
+    rows = Resource.objects.filter(pk__in=list(deltas), is_active=True).values_list(
+        'id', 'subject_id', 'resource_type_id', 'grade_id'
+    )
+    for resource_id, subject_id, resource_type_id, grade_id in rows:
+        by_slice[(subject_id, resource_type_id, grade_id)] += deltas[resource_id]
+    for (subject_id, resource_type_id, grade_id), delta in by_slice.items():
+        # The all-grades row and the row of the resource's grade
+        ResourceStat.objects.filter(
+            Q(grade__isnull=True) | Q(grade_id=grade_id),
+            subject_id=subject_id, resource_type_id=resource_type_id,
+        ).update(total_downloads=F('total_downloads') + delta)
+
+
+def rebuild():
+    """Recreate the whole table from Resource; returns the number of rows written"""
+    from .models import Resource, ResourceStat
+
+    new_rows = [
+        ResourceStat(grade_id=grade_id, subject_id=subject_id, resource_type_id=resource_type_id, **values)
+        for (subject_id, resource_type_id), rows in _aggregate(Resource.objects.all()).items()
+        for grade_id, values in rows.items()
+    ]
+
+    with transaction.atomic():
+        ResourceStat.objects.all().delete()
+        ResourceStat.objects.bulk_create(new_rows, batch_size=500)
+    return len(new_rows)
+
+
+def totals(subject_ids=None, grade_id=None, resource_type_id=None):
+    """Totals of all grades or of one, optionally restricted to some subjects or a type"""
+    from .models import ResourceStat
+
+    if grade_id is None:
+        rows = ResourceStat.objects.filter(grade__isnull=True)
+    else:
+        rows = ResourceStat.objects.filter(grade_id=grade_id)
+    if subject_ids is not None:
+        rows = rows.filter(subject_id__in=list(subject_ids))
+    if resource_type_id is not None:
+        rows = rows.filter(resource_type_id=resource_type_id)
+    return _clean(rows.aggregate(**{field: Sum(field) for field in STAT_FIELDS}))
+
+
+def active_count(subject_ids=None, grade_ids=None):
+    """Active resources, optionally of some subjects or filed under some grades"""
+    from .models import ResourceStat
+
+    if grade_ids is None:
+        return totals(subject_ids)['active_count']
+    rows = ResourceStat.objects.filter(grade_id__in=list(grade_ids))
+    if subject_ids is not None:
+        rows = rows.filter(subject_id__in=list(subject_ids))
+    return rows.aggregate(total=Sum('active_count'))['total'] or 0
+
+
+def grade_subject_counts(grade_id):
+    """{subject_id: active resources} for every subject of a grade"""
+    from .models import ResourceStat
+
+    rows = ResourceStat.objects.filter(grade_id=grade_id).order_by().values('subject_id').annotate(
+        total=Sum('active_count')
+    )
+    return {row['subject_id']: row['total'] for row in rows}
+
+
+def resource_count(subject_id, grade_id, resource_type_id=None):
+    """Active resources of a subject in a grade, optionally of one type"""
+    from .models import ResourceStat
+
+    rows = ResourceStat.objects.filter(subject_id=subject_id, grade_id=grade_id)
+    if resource_type_id is not None:
+        rows = rows.filter(resource_type_id=resource_type_id)
+    return rows.aggregate(total=Sum('active_count'))['total'] or 0
@@ -0,0 +1,237 @@
+# lms/storage.py
+"""
+Content-addressed storage for resource files.
+
+Every file body is stored once, as a blob named after its SHA-256 under
+LMS_BLOB_ROOT (default MEDIA_ROOT/.blobs). The name Django records for a
+resource (level/grade/type/filename) is a hard link to that blob, so
+file.path, file.url, the media views and nginx keep working unchanged
+while identical files share one copy on disk:
+
+- saving hashes the upload and only creates a link when the blob already
+  exists, so re-uploading a known file writes no data;
+- a blob's link count is its reference count: deleting a name only removes
+  that link, since finding the blob of a name would mean hashing the whole
+  file again; a blob whose last name is gone is left with one link;
+- `manage.py dedupe_media` folds files written before this backend (or by
+  other storages) into blobs and removes blobs nothing links to any more.
+  Run it periodically (it only hashes files not yet linked to a blob) to
+  reclaim the space of deleted resources.
+
+Where hard links are not supported the backend falls back to plain copies.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+HASH_BUFFER_SIZE = 1024 * 1024
+SPOOL_DIR = 'tmp'
+# Spool files older than this were left behind by a crashed process
+STALE_SPOOL_SECONDS = 24 * 60 * 60
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def hash_file(path):
+    """SHA-256 hex digest of a file"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BUFFER_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage whose files are hard links to SHA-256 keyed blobs"""
+
+    @cached_property
+    def blob_root(self):
+        return os.path.abspath(_setting('LMS_BLOB_ROOT', os.path.join(self.location, '.blobs')))
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_root, digest[:2], digest[2:4], digest)
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def _spool(self, content):
+        """Write content to a temporary file next to the blobs, hashing it on the way"""
+        spool_dir = os.path.join(self.blob_root, SPOOL_DIR)
+        self._makedirs(spool_dir)
+        fd, spool_path = tempfile.mkstemp(prefix='upload-', dir=spool_dir)
+        sha256 = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    sha256.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(spool_path)
+            raise
+        return sha256.hexdigest(), spool_path
+
+    def _ensure_blob(self, digest, source):
+        """Create the blob for digest from source unless it already exists"""
+        blob = self.blob_path(digest)
+        if os.path.exists(blob):
+            return blob
+        self._makedirs(os.path.dirname(blob))
+        try:
+            os.link(source, blob)
+        except FileExistsError:
+            # Another process stored the same content first
+            return blob
+        except OSError:
+            # Source on another filesystem (e.g. a temporary upload): copy it over
+            fd, temp_path = tempfile.mkstemp(prefix='copy-', dir=os.path.join(self.blob_root, SPOOL_DIR))
+            try:
+                with os.fdopen(fd, 'wb') as out, open(source, 'rb') as src:
+                    shutil.copyfileobj(src, out, HASH_BUFFER_SIZE)
+                try:
+                    os.link(temp_path, blob)
+                except FileExistsError:
+                    return blob
+            finally:
+                os.remove(temp_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(blob, self.file_permissions_mode)
+        return blob
+
+    def _link(self, blob, name):
+        while True:
+            full_path = self.path(name)
+            self._makedirs(os.path.dirname(full_path))
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+            else:
+                break
+        self._ensure_location_group_id(full_path)
+        return os.path.relpath(full_path, self.location).replace('\\', '/')
+
+    def _save(self, name, content):
+        if hasattr(content, 'temporary_file_path'):
+            source, spooled = content.temporary_file_path(), False
+            digest = hash_file(source)
+        else:
+            digest, source = self._spool(content)
+            spooled = True
+
+        try:
+            for _ in range(3):
+                try:
+                    return self._link(self._ensure_blob(digest, source), name)
+                except FileNotFoundError:
+                    # collect_garbage removed the blob while we were linking to it
+                    continue
+                except OSError as e:
+                    logger.warning(f"Hard links unavailable under {self.location} ({e}); storing {name} as a copy")
+                    break
+            with open(source, 'rb') as fh:
+                return super()._save(name, File(fh))
+        finally:
+            if spooled:
+                try:
+                    os.remove(source)
+                except FileNotFoundError:
+                    pass
+
+    def fold(self, name, digest=None):
+        """
+        Turn a stored plain file into a link to its blob.
+
+        Returns the number of bytes freed: the file's size if an identical
+        blob already existed, 0 if the file itself became the blob or was
+        modified while being folded.
+        """
+        full_path = self.path(name)
+        before = os.stat(full_path)
+        if before.st_nlink > 1:
+            return 0
+        digest = digest or hash_file(full_path)
+        blob = self.blob_path(digest)
+        self._makedirs(os.path.dirname(blob))
+        try:
+            os.link(full_path, blob)
+            return 0
+        except FileExistsError:
+            pass
+
+        # Swap the copy for a link to the existing blob in one rename
+        temp_path = f'{full_path}.{os.getpid()}.fold'
+        os.link(blob, temp_path)
+        after = os.stat(full_path)
+        if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+            os.remove(temp_path)
+            return 0
+        os.replace(temp_path, full_path)
+        return before.st_size
+
+    def files(self):
+        """
+        Names of stored files that are not yet linked to a blob.
+
+        Hidden directories (the blobs, chunked upload staging) are skipped:
+        a staging file still being written must never become a blob.
+        """
+        for directory, dirnames, filenames in os.walk(self.location):
+            dirnames[:] = [
+                d for d in dirnames
+                if not d.startswith('.') and os.path.join(os.path.abspath(directory), d) != self.blob_root
+            ]
+            for filename in filenames:
+                full_path = os.path.join(directory, filename)
+                if os.path.isfile(full_path) and not os.path.islink(full_path) and os.stat(full_path).st_nlink == 1:
+                    yield os.path.relpath(full_path, self.location).replace('\\', '/')
+
+    def collect_garbage(self, dry_run=False):
+        """Remove blobs no stored file links to and stale spool files; returns (blobs, bytes)"""
+        removed, freed = 0, 0
+        now = time.time()
+        for directory, dirnames, filenames in os.walk(self.blob_root):
+            spool = os.path.basename(directory) == SPOOL_DIR and os.path.dirname(directory) == self.blob_root
+            for filename in filenames:
+                full_path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                if spool:
+                    if now - stat.st_mtime > STALE_SPOOL_SECONDS and not dry_run:
+                        os.remove(full_path)
+                    continue
+                if stat.st_nlink == 1:
+                    removed += 1
+                    freed += stat.st_size
+                    if not dry_run:
+                        os.remove(full_path)
+        return removed, freed
+
+
+def resource_storage():
+    """Storage for Resource.file; LMS_CONTENT_ADDRESSED_STORAGE = False restores plain copies"""
+    if _setting('LMS_CONTENT_ADDRESSED_STORAGE', True):
+        return ContentAddressedStorage()
+    return default_storage
@@ -0,0 +1,405 @@
+# lms/suggest.py
+"""
+Typo-tolerant, suggest-as-you-type matching for resource titles, subjects,
+grades and education levels.
+
+A memory-resident trigram index is kept over the vocabulary of those names.
+Each query term is matched against vocabulary tokens by trigram similarity
+(shared / union of padded trigrams, as pg_trgm does) and by prefix, so
+"kiswahli g7" and "integrated sci" both find what was meant. Vocabulary
+tokens point at entries, and entries are ranked by the sum of their best
+per-term similarity, weighted by how rare each term is.
+
+Subject entries exist per (subject, grade) pair, which lets a subject plus
+grade query jump straight to the subject page for that grade.
+
+Resource entries are updated in place from model signals. Curriculum
+entries follow the lms.curriculum tree. Other processes learn about resource
+changes through a shared cache version and rebuild in a background thread,
+serving the previous index meanwhile.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+
+from . import curriculum
+from .cache_tokens import get_or_add, new_counter
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'lms:suggest:version'
+MAX_TERMS = 6
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+CANDIDATE_LIMIT = 1000
+
+RESOURCE = 'resource'
+SUBJECT = 'subject'
+GRADE = 'grade'
+LEVEL = 'level'
+CURRICULUM_KINDS = (SUBJECT, GRADE, LEVEL)
+
+# Ties are broken in favour of navigation targets over individual resources
+KIND_PRIORITY = {SUBJECT: 3, GRADE: 2, LEVEL: 1, RESOURCE: 0}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """Trigram index over vocabulary tokens, with tokens pointing at entries"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.tree = None
+        self._lock = threading.RLock()
+        self._token_ids = {}
+        self._tokens = []
+        self._token_grams = []
+        # Per token: entries of curriculum kinds and of resources, kept apart
+        # so the few navigation entries are never crowded out by resources
+        self._token_nav = []
+        self._token_resources = []
+        self._gram_postings = defaultdict(set)
+        self._entries = {}
+        self._sorted_tokens = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _token_id(self, token):
+        tid = self._token_ids.get(token)
+        if tid is None:
+            tid = len(self._tokens)
+            grams = trigrams(token)
+            self._token_ids[token] = tid
+            self._tokens.append(token)
+            self._token_grams.append(grams)
+            self._token_nav.append(set())
+            self._token_resources.append(set())
+            for gram in grams:
+                self._gram_postings[gram].add(tid)
+            self._sorted_tokens = None
+        return tid
+
+    def _postings(self, key):
+        return self._token_resources if key[0] == RESOURCE else self._token_nav
+
+    def _used(self, tid):
+        return bool(self._token_nav[tid] or self._token_resources[tid])
+
+    def add(self, key, label, text=None):
+        """Add or replace an entry; key is (kind, id, ...)"""
+        with self._lock:
+            self._remove(key)
+            postings = self._postings(key)
+            token_ids = tuple({self._token_id(token) for token in tokenize(text or label)})
+            for tid in token_ids:
+                postings[tid].add(key)
+            # Static tie-break: navigation targets first, then shorter labels
+            self._entries[key] = (label, token_ids, (KIND_PRIORITY[key[0]], -len(label)))
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            postings = self._postings(key)
+            for tid in entry[1]:
+                postings[tid].discard(key)
+
+    def remove_kinds(self, kinds):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in kinds]:
+                self._remove(key)
+
+    def _prefixed(self, term):
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._token_ids)
+        tokens = self._sorted_tokens
+        i = bisect_left(tokens, term)
+        while i < len(tokens) and tokens[i].startswith(term):
+            yield self._token_ids[tokens[i]]
+            i += 1
+
+    def match_term(self, term, threshold):
+        """{token id: similarity} for vocabulary tokens close to term"""
+        grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for tid in self._gram_postings.get(gram, ()):
+                shared[tid] += 1
+
+        matches = {}
+        for tid, n in shared.items():
+            if not self._used(tid):
+                continue
+            similarity = n / (len(grams) + len(self._token_grams[tid]) - n)
+            if similarity >= threshold:
+                matches[tid] = similarity
+        for tid in self._prefixed(term):
+            if self._used(tid):
+                score = EXACT_SCORE if self._tokens[tid] == term else PREFIX_SCORE
+                matches[tid] = max(matches.get(tid, 0), score)
+        return matches
+
+    def lookup(self, terms, limit, threshold):
+        """
+        Top `limit` (key, label, score) entries for the query terms.
+
+        Terms are weighted by rarity and scored from the most selective one
+        down. Navigation entries are always scored; resources are capped at
+        CANDIDATE_LIMIT candidates, and a term matching more resources than
+        that only scores resources that are already candidates, which keeps
+        common words ("notes", "grade") from dominating the lookup time.
+        """
+        with self._lock:
+            total = max(len(self._entries), 1)
+            per_term = []
+            for term in terms:
+                matches = self.match_term(term, threshold)
+                size = sum(len(self._token_nav[tid]) + len(self._token_resources[tid]) for tid in matches)
+                if size:
+                    per_term.append((size, sorted(matches.items(), key=lambda item: -item[1])))
+            if not per_term:
+                return []
+            per_term.sort(key=lambda item: item[0])
+
+            scores = defaultdict(float)
+            resource_candidates = 0
+            max_score = 0.0
+            for size, matches in per_term:
+                weight = math.log(1 + total / size)
+                max_score += weight
+                best = {}
+                for tid, similarity in matches:
+                    for key in self._token_nav[tid]:
+                        if similarity > best.get(key, 0):
+                            best[key] = similarity
+
+                resource_size = sum(len(self._token_resources[tid]) for tid, _ in matches)
+                if resource_size <= CANDIDATE_LIMIT or not resource_candidates:
+                    room = CANDIDATE_LIMIT
+                    for tid, similarity in matches:
+                        for key in self._token_resources[tid]:
+                            if key not in best:
+                                if not room:
+                                    break
+                                room -= 1
+                                best[key] = similarity
+                        if not room:
+                            break
+                else:
+                    for key in scores:
+                        if key[0] != RESOURCE:
+                            continue
+                        for tid, similarity in matches:
+                            if key in self._token_resources[tid]:
+                                best[key] = similarity
+                                break
+
+                for key, similarity in best.items():
+                    if key not in scores and key[0] == RESOURCE:
+                        resource_candidates += 1
+                    scores[key] += similarity * weight
+
+            entries = self._entries
+            keys = list(scores)
+            top = heapq.nlargest(limit, (
+                (score, entries[key][2], -i) for i, (key, score) in enumerate(scores.items())
+            ))
+            return [(keys[-i], entries[keys[-i]][0], score / max_score) for score, _, i in top]
+
+    def correct(self, term, threshold):
+        """Closest vocabulary token for a term, or the term itself if it is known"""
+        with self._lock:
+            tid = self._token_ids.get(term)
+            if tid is not None and self._used(tid):
+                return term
+            matches = self.match_term(term, threshold)
+            if not matches:
+                return term
+            best = max(matches, key=lambda tid: (
+                matches[tid], len(self._token_nav[tid]) + len(self._token_resources[tid])
+            ))
+            return self._tokens[best]
+
+    def load_curriculum(self, tree):
+        """Replace subject/grade/level entries with those of a curriculum tree"""
+        with self._lock:
+            self.remove_kinds(CURRICULUM_KINDS)
+            for level in tree.levels:
+                self.add((LEVEL, level.id), level.name)
+                for grade in level.grades:
+                    self.add((GRADE, grade.id), str(grade), f'{grade.name} {level.name}')
+            for subject in tree.subjects_by_id.values():
+                if not subject.grades:
+                    self.add((SUBJECT, subject.id, None), subject.name)
+                for grade in subject.grades:
+                    self.add((SUBJECT, subject.id, grade.id), f'{subject.name} ({grade.name})', f'{subject.name} {grade.name}')
+            self.tree = tree
+
+
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = threading.Event()
+_last_check = 0.0
+
+
+def _current_version():
+    return get_or_add(cache, VERSION_KEY, new_counter)
+
+
+def build_index(version=None):
+    """Build a complete index from the database and curriculum tree"""
+    from .models import Resource
+
+    started = time.monotonic()
+    index = TrigramIndex(version)
+    for resource_id, title in Resource.objects.filter(is_active=True).values_list('id', 'title').iterator(chunk_size=5000):
+        index.add((RESOURCE, resource_id), title)
+    index.load_curriculum(curriculum.get_tree())
+    logger.info(f"Built suggestion index with {len(index)} entries in {(time.monotonic() - started) * 1000:.0f}ms")
+    return index
+
+
+def _rebuild_in_background(version):
+    global _index
+    try:
+        _index = build_index(version)
+    except Exception as e:
+        logger.error(f"Error rebuilding suggestion index: {str(e)}")
+    finally:
+        _rebuilding.clear()
+        close_old_connections()
+
+
+def get_index():
+    """Return the process-wide index, building it on first use"""
+    global _index, _last_check
+
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index(_current_version())
+                _last_check = time.monotonic()
+            index = _index
+
+    now = time.monotonic()
+    if now - _last_check >= _setting('LMS_SUGGEST_CHECK_INTERVAL', 5):
+        _last_check = now
+        version = _current_version()
+        if index.version != version and not _rebuilding.is_set():
+            # Another process changed resources; keep serving this index meanwhile
+            _rebuilding.set()
+            threading.Thread(
+                target=_rebuild_in_background, args=(version,), name='lms-suggest-rebuild', daemon=True
+            ).start()
+
+    tree = curriculum.get_tree()
+    if index.tree is not tree:
+        index.load_curriculum(tree)
+    return index
+
+
+def _bump_version(index=None):
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = new_counter()
+        cache.set(VERSION_KEY, version, None)
+    if index is not None and index.version == version - 1:
+        # Nobody else changed resources since we last synced
+        index.version = version
+
+
+def update_resources(entries):
+    """
+    Reflect saved or deleted resources, given as (id, title, is_active), in
+    this process and flag them for the others with a single version bump
+    """
+    index = _index
+    if index is not None:
+        for resource_id, title, is_active in entries:
+            if is_active:
+                index.add((RESOURCE, resource_id), title)
+            else:
+                index.remove((RESOURCE, resource_id))
+    # Without a local index the next build reads the database anyway
+    _bump_version(index)
+
+
+def update_resource(resource_id, title, is_active):
+    """Reflect a saved or deleted resource in this process and flag it for the others"""
+    update_resources([(resource_id, title, is_active)])
+
+
+def schedule_update(resource_id, title, is_active):
+    def run():
+        try:
+            update_resource(resource_id, title, is_active)
+        except Exception as e:
+            logger.error(f"Error updating suggestion index for resource {resource_id}: {str(e)}")
+    transaction.on_commit(run)
+
+
+def _entry_url(key):
+    kind = key[0]
+    if kind == RESOURCE:
+        return reverse('lms:view_resource', kwargs={'resource_id': key[1]})
+    if kind == SUBJECT:
+        subject_id, grade_id = key[1], key[2]
+        if grade_id is None:
+            return '#'
+        return reverse('lms:subject_dashboard', kwargs={'grade_id': grade_id, 'subject_id': subject_id})
+    if kind == GRADE:
+        return reverse('lms:grade_dashboard', kwargs={'grade_id': key[1]})
+    return reverse('lms:education_level_dashboard', kwargs={'level_id': key[1]})
+
+
+def suggest(query, limit=8):
+    """Ranked suggestions as dicts ready for JSON"""
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return []
+    threshold = _setting('LMS_SUGGEST_SIMILARITY', 0.3)
+    return [
+        {
+            'type': key[0],
+            'id': key[1],
+            'label': label,
+            'url': _entry_url(key),
+            'score': round(score, 3),
+        }
+        for key, label, score in get_index().lookup(terms, limit, threshold)
+    ]
+
+
+def correct_query(query):
+    """Query with unknown terms replaced by their closest indexed token, or None"""
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return None
+    index = get_index()
+    threshold = _setting('LMS_SUGGEST_SIMILARITY', 0.3)
+    corrected = [index.correct(term, threshold) for term in terms]
+    return ' '.join(corrected) if corrected != terms else None
@@ -3,6 +3,8 @@ from django import template
 from django.template.defaultfilters import stringfilter
 import os
 
+from lms import stats
+
 register = template.Library()
 
 @register.filter
@@ -54,7 +56,7 @@ def filter_by_grade(queryset, grade_id):
     try:
         if not grade_id:
             return queryset
-        return queryset.filter(subject__grades__id=grade_id)
+        return queryset.filter(grade_id=grade_id)
     except:
         return queryset
 
@@ -115,10 +117,18 @@ def get_file_extension(file_name):
 def get_resource_count(subject, grade):
     """Get the number of resources for a subject in a specific grade"""
     try:
-        return subject.resources.filter(subject__grades=grade, is_active=True).count()
+        return stats.resource_count(subject.id, grade.id)
     except:
         return 0
 
+@register.filter
+def get_item(mapping, key):
+    """Look up a key in a dictionary"""
+    try:
+        return mapping.get(key)
+    except:
+        return None
+
 @register.filter
 def get_download_button_text(resource, user):
     """Get appropriate download button text based on user status and resource type"""
@@ -152,17 +162,7 @@ def can_view_resource(resource, user):
 def can_download_resource(resource, user):
     """Check if user can download a resource"""
     try:
-        # Must allow downloads
-        if not resource.allow_download:
-            return False
-        # Staff can download everything
-        if user.is_staff:
-            return True
-        # Non-premium resources can be downloaded by anyone
-        if not resource.is_premium:
-            return True
-        # Premium resources require authentication
-        return user.is_authenticated
+        return resource.can_download(user)
     except:
         return False
 
@@ -239,7 +239,7 @@ def get_resource_by_education_level(resources, education_level_id):
     try:
         if not education_level_id:
             return resources
-        return resources.filter(subject__grades__education_level__id=education_level_id).distinct()
+        return resources.filter(grade__education_level_id=education_level_id)
     except:
         return resources.none()
 
@@ -0,0 +1,54 @@
+# lms/tests/test_budgets.py
+from django.test import override_settings
+from django.urls import reverse
+
+from lms.instrumentation import QueryBudgetExceeded
+
+from .utils import MIDDLEWARE, CatalogueTestCase, clear_caches
+
+
+@override_settings(LMS_ENFORCE_QUERY_BUDGETS=True, MIDDLEWARE=MIDDLEWARE)
+class QueryBudgetTests(CatalogueTestCase):
+    """Every budgeted view stays within its budget with cold and warm caches"""
+
+    def public_urls(self):
+        resource = self.resources[0]
+        return [
+            reverse('lms:summary'),
+            reverse('lms:grade_level_dashboard'),
+            reverse('lms:education_level_dashboard', args=[self.g7.education_level_id]),
+            reverse('lms:grade_dashboard', args=[self.g7.id]),
+            reverse('lms:subject_dashboard', args=[self.g7.id, self.maths.id]),
+            reverse('lms:search') + '?q=notes',
+            reverse('lms:search') + f'?q=notes&grade={self.g5.id}&type={self.notes.id}',
+            reverse('lms:search') + f'?q=science&level={self.g4.education_level_id}',
+            reverse('lms:view_resource', args=[resource.id]),
+        ]
+
+    def get_cold_and_warm(self, url):
+        clear_caches()
+        for state in ('cold', 'warm'):
+            with self.subTest(url=url, caches=state):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_public_views_for_visitors(self):
+        for url in self.public_urls():
+            self.get_cold_and_warm(url)
+
+    def test_public_views_for_signed_in_users(self):
+        self.client.force_login(self.user)
+        for url in self.public_urls():
+            self.get_cold_and_warm(url)
+
+    def test_admin_read(self):
+        self.client.force_login(self.staff)
+        url = reverse('lms:admin_read')
+        self.get_cold_and_warm(f'{url}?include=education_levels,grades,categories,subjects,pathways,resource_types')
+        ids = ','.join(str(resource.id) for resource in self.resources)
+        self.get_cold_and_warm(f'{url}?include=grades,subjects,resources&subjects.grade={self.g7.id}&resources.ids={ids}')
+
+    @override_settings(LMS_QUERY_BUDGETS={'lms:summary': 1})
+    def test_exceeding_a_budget_fails(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'over its budget of 1'):
+            self.client.get(reverse('lms:summary'))
@@ -0,0 +1,86 @@
+# lms/tests/test_bulk.py
+from django.test import override_settings
+
+from lms import bulk, stats
+from lms.models import Resource, ResourceStat, SearchDocument
+from lms.stats import STAT_FIELDS
+
+from .utils import CatalogueTestCase
+
+
+@override_settings(LMS_BULK_CHUNK_SIZE=4)
+class BulkTests(CatalogueTestCase):
+    """Bulk changes leave ResourceStat and the search documents as a full rebuild would"""
+
+    def stat_rows(self):
+        return {
+            (row.pop('grade_id'), row.pop('subject_id'), row.pop('resource_type_id')): row
+            for row in ResourceStat.objects.values('grade_id', 'subject_id', 'resource_type_id', *STAT_FIELDS)
+        }
+
+    def assertStatsMatchRebuild(self):
+        incremental = self.stat_rows()
+        stats.rebuild()
+        self.assertEqual(incremental, self.stat_rows())
+
+    def assertDocumentsMatchResources(self):
+        documents = set(SearchDocument.objects.values_list('resource_id', 'subject_id', 'grade_id', 'is_active'))
+        resources = set(Resource.objects.values_list('id', 'subject_id', 'grade_id', 'is_active'))
+        self.assertEqual(documents, resources)
+
+    def run_bulk(self, func, *args, **kwargs):
+        # Spans several chunks and runs what each chunk defers until commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args, **kwargs)
+
+    def test_fixture_stats_match_rebuild(self):
+        self.assertTrue(ResourceStat.objects.exists())
+        self.assertStatsMatchRebuild()
+
+    def test_set_flags_by_filter(self):
+        selection = bulk.select(subject=self.science.id)
+        expected = selection.filter(is_active=True).count()
+        self.assertEqual(self.run_bulk(bulk.set_flags, selection, is_active=False), expected)
+        self.assertFalse(Resource.objects.filter(subject=self.science, is_active=True).exists())
+        self.assertStatsMatchRebuild()
+        self.assertDocumentsMatchResources()
+        # Nothing left to change
+        self.assertEqual(self.run_bulk(bulk.set_flags, selection, is_active=False), 0)
+
+    def test_set_flags_by_ids(self):
+        ids = [resource.id for resource in self.resources[::2]]
+        changed = self.run_bulk(bulk.set_flags, bulk.select(ids), is_active=True, is_premium=True, allow_download=False)
+        self.assertEqual(changed, len(ids))
+        self.assertEqual(Resource.objects.filter(pk__in=ids, is_active=True, is_premium=True, allow_download=False).count(), len(ids))
+        self.assertStatsMatchRebuild()
+        self.assertDocumentsMatchResources()
+
+    def test_move_keeps_grades_the_subject_is_taught_in(self):
+        selection = bulk.select(subject=self.english.id)
+        before = dict(selection.values_list('id', 'grade_id'))
+        self.assertEqual(self.run_bulk(bulk.move, selection, self.maths.id), len(before))
+        # Mathematics is taught in grades 4 and 7: grade 7 stays, grade 5 takes grade 4
+        after = dict(Resource.objects.filter(pk__in=before).values_list('id', 'grade_id'))
+        self.assertEqual(after, {pk: self.g7.id if grade_id == self.g7.id else self.g4.id for pk, grade_id in before.items()})
+        self.assertEqual(set(before.values()), {self.g5.id, self.g7.id})
+        self.assertFalse(Resource.objects.filter(subject=self.english).exists())
+        self.assertStatsMatchRebuild()
+        self.assertDocumentsMatchResources()
+
+    def test_move_to_a_grade(self):
+        selection = bulk.select(subject=self.science.id)
+        count = selection.count()
+        self.assertEqual(self.run_bulk(bulk.move, selection, self.english.id, self.g7.id), count)
+        self.assertEqual(Resource.objects.filter(subject=self.english, grade=self.g7).count(), count + 3)
+        self.assertStatsMatchRebuild()
+        self.assertDocumentsMatchResources()
+
+    def test_move_rejects_grades_the_subject_is_not_taught_in(self):
+        with self.assertRaises(ValueError):
+            bulk.move(bulk.select(subject=self.science.id), self.kiswahili.id, self.g4.id)
+
+    def test_select_requires_a_selection(self):
+        with self.assertRaises(ValueError):
+            bulk.select()
+        with self.assertRaises(ValueError):
+            bulk.select(colour='red')
@@ -0,0 +1,130 @@
+# lms/tests/test_classifier.py
+from django.test import SimpleTestCase
+
+from lms.classifier import Classifier, benchmark, extract_grade, grade_key, tokenize
+
+
+class ExtractGradeTests(SimpleTestCase):
+    def grade(self, filename):
+        return extract_grade(tokenize(filename))
+
+    def test_grade_spellings(self):
+        cases = {
+            'Grade7_Maths-Notes.pdf': 'g7',
+            'G10 Physics.pdf': 'g10',
+            'gr 5 science': 'g5',
+            'Grade_12-History.docx': 'g12',
+            'PP2 numbers.pdf': 'pp2',
+            'pp1-language-activities': 'pp1',
+            'Playgroup colouring.pdf': 'pg',
+            'PG rhymes': 'pg',
+        }
+        for filename, grade in cases.items():
+            with self.subTest(filename=filename):
+                self.assertEqual(self.grade(filename), grade)
+
+    def test_out_of_range_and_missing_grades(self):
+        for filename in ('Grade 13 notes', 'G0 notes', 'pp3 numbers', 'schemes of work 2024', 'Grade notes'):
+            with self.subTest(filename=filename):
+                self.assertIsNone(self.grade(filename))
+
+    def test_first_grade_wins(self):
+        self.assertEqual(self.grade('G4 revision for grade 5'), 'g4')
+
+    def test_paper_numbers_are_not_pre_primary_grades(self):
+        self.assertIsNone(self.grade('KCSE-BIOLOGY-PP1-2017.pdf'))
+        self.assertIsNone(self.grade('chemistry pp2 marking scheme'))
+        self.assertIsNone(self.grade('KCPE mock pp1'))
+        self.assertEqual(self.grade('Physics PP2 Grade 10'), 'g10')
+        # Pre-primary subjects and term exams keep the grade
+        self.assertEqual(self.grade('PP1 Mathematics end term exam'), 'pp1')
+
+    def test_grade_key(self):
+        self.assertEqual(grade_key('G7'), 'g7')
+        self.assertEqual(grade_key('PP1'), 'pp1')
+        self.assertEqual(grade_key('Grade 10'), 'g10')
+
+
+class ClassifierTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.classifier = Classifier()
+
+    def subject(self, filename):
+        rule = self.classifier.classify(filename).rule
+        return (rule.subject, rule.education_level) if rule else None
+
+    def test_short_keywords_only_match_whole_tokens(self):
+        # "pe" and "cre" must not match inside paper, peace, creative, recreation
+        self.assertIsNone(self.subject('G5 past paper peace'))
+        self.assertEqual(self.subject('G2 creative recreation'), ('Creative Activities', 'Lower Primary'))
+        self.assertEqual(self.subject('G5 PE lesson'), ('PE', 'Upper Primary'))
+        self.assertEqual(self.subject('PP1 CRE stories'), ('CRE', 'Pre-Primary'))
+
+    def test_prefix_keywords(self):
+        self.assertEqual(self.subject('Grade 2 Maths'), ('Mathematics', 'Lower Primary'))
+        self.assertEqual(self.subject('Grade 2 Mathematics'), ('Mathematics', 'Lower Primary'))
+        self.assertEqual(self.subject('G6 musical instruments'), ('Music', 'Upper Primary'))
+
+    def test_phrases_need_adjacent_tokens(self):
+        self.assertEqual(self.subject('G5 Home Science'), ('Home Science', 'Upper Primary'))
+        self.assertNotEqual(self.subject('G5 home work science'), ('Home Science', 'Upper Primary'))
+
+    def test_level_of_the_grade_wins(self):
+        self.assertEqual(self.subject('G8 Mathematics'), ('Mathematics', 'Junior Secondary'))
+        self.assertEqual(self.subject('G11 Mathematics'), ('Mathematics', 'Senior Secondary'))
+
+    def test_longest_phrase_beats_level_free_matches(self):
+        self.assertEqual(self.subject('integrated science notes'), ('Integrated Science', 'Junior Secondary'))
+
+    def test_more_keywords_beat_fewer(self):
+        self.assertEqual(self.subject('G12 religious education'), ('Religious Education', 'Senior Secondary'))
+        self.assertEqual(self.subject('G12 business education'), ('Business Education', 'Senior Secondary'))
+
+    def test_repeated_keywords_count_once(self):
+        # "history" three times is still one keyword against two distinct ones
+        self.assertEqual(
+            self.subject('G12 history history history religious education'),
+            ('Religious Education', 'Senior Secondary'),
+        )
+
+    def test_priority_breaks_ties(self):
+        # Generic "design" ranks below "history"
+        self.assertEqual(self.subject('G12 design history'), ('History and Government', 'Senior Secondary'))
+
+    def test_earlier_rules_break_remaining_ties(self):
+        self.assertEqual(self.subject('creative arts'), ('Psychomotor', 'Pre-Primary'))
+        candidates = self.classifier.classify('creative arts').candidates
+        self.assertEqual([rule.subject for rule in candidates[:2]], ['Psychomotor', 'Creative Activities'])
+
+    def test_past_paper(self):
+        result = self.classifier.classify('KCSE-BIOLOGY-PP1-2017.pdf')
+        self.assertIsNone(result.grade)
+        self.assertEqual(result.rule.subject, 'Biology')
+        self.assertEqual(result.rule.education_level, 'Senior Secondary')
+
+    def test_exam_names_the_level(self):
+        self.assertEqual(self.subject('KJSEA Mathematics 2024'), ('Mathematics', 'Junior Secondary'))
+        self.assertEqual(self.subject('KCPE Mathematics 2019'), ('Mathematics', 'Upper Primary'))
+        # A grade in the name still wins
+        self.assertEqual(self.subject('G8 KCSE Mathematics revision'), ('Mathematics', 'Junior Secondary'))
+
+    def test_unmatched(self):
+        result = self.classifier.classify('G4 timetable.pdf')
+        self.assertIsNone(result.rule)
+        self.assertEqual(result.grade, 'g4')
+        self.assertEqual(result.candidates, ())
+
+
+class BenchmarkTests(SimpleTestCase):
+    # Far below what the classifier manages on a laptop (about 50,000 names a
+    # second), so only a real regression such as a per-name rebuild trips it
+    MIN_PER_SECOND = 10000
+
+    def test_throughput(self):
+        result = benchmark(100000)
+        self.assertEqual(result['count'], 100000)
+        self.assertGreater(result['per_second'], self.MIN_PER_SECOND)
+        self.assertGreater(result['matched_percent'], 80)
+        self.assertGreater(result['grade_percent'], 80)
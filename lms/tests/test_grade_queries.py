@@ -0,0 +1,60 @@
+# lms/tests/test_grade_queries.py
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from lms import curriculum
+from lms.models import Resource
+from lms.templatetags.filters import filter_by_grade, get_resource_by_education_level
+
+from .utils import CatalogueTestCase
+
+# The curriculum tree reads the table on its own; resources must never join it
+SUBJECT_GRADES_JOIN = re.compile(r'JOIN\s+"?lms_subject_grades"?', re.IGNORECASE)
+
+
+class GradeQueryTests(CatalogueTestCase):
+    """Resources are filtered on their own grade column, never through subject.grades"""
+
+    def setUp(self):
+        super().setUp()
+        curriculum.get_tree()
+        # Signed in, so pages are rendered rather than replayed from the page cache
+        self.client.force_login(self.user)
+
+    def assertNoSubjectGradesJoin(self, queries):
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            self.assertIsNone(SUBJECT_GRADES_JOIN.search(query['sql']), query['sql'])
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNoSubjectGradesJoin(queries)
+        return response
+
+    def test_subject_dashboard(self):
+        response = self.get(reverse('lms:subject_dashboard', args=[self.g7.id, self.maths.id]))
+        titles = [resource.title for resource in response.context['page_obj']]
+        self.assertCountEqual(titles, ['Mathematics Grade 7 Notes 1', 'Mathematics Grade 7 Notes 2'])
+
+    def test_search_by_grade(self):
+        response = self.get(reverse('lms:search') + f'?q=notes&grade={self.g5.id}')
+        grades = {result['grade'] for result in response.context['results']['resources']}
+        self.assertEqual(grades, {'Grade 5'})
+
+    def test_search_by_level(self):
+        response = self.get(reverse('lms:search') + f'?q=notes&level={self.g4.education_level_id}')
+        grades = {result['grade'] for result in response.context['results']['resources']}
+        self.assertEqual(grades, {'Grade 4', 'Grade 5'})
+
+    def test_grade_filters(self):
+        with CaptureQueriesContext(connection) as queries:
+            by_grade = list(filter_by_grade(Resource.objects.all(), self.g7.id))
+            by_level = list(get_resource_by_education_level(Resource.objects.all(), self.g4.education_level_id))
+        self.assertNoSubjectGradesJoin(queries)
+        self.assertEqual({resource.grade_id for resource in by_grade}, {self.g7.id})
+        self.assertEqual({resource.grade_id for resource in by_level}, {self.g4.id, self.g5.id})
@@ -0,0 +1,60 @@
+# lms/tests/test_import_pdfs.py
+import io
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from lms.models import EducationLevel, Grade, ImportManifestEntry, Resource
+
+
+class ImportPdfsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        senior = EducationLevel.objects.create(name='Senior Secondary', order=5)
+        Grade.objects.create(name='G10', education_level=senior, order=10)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp(prefix='lms-tests-')
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.pdf_dir = Path(tempfile.mkdtemp(prefix='lms-pdfs-'))
+        self.addCleanup(shutil.rmtree, self.pdf_dir, ignore_errors=True)
+
+    def run_import(self):
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_pdfs', pdf_dir=str(self.pdf_dir), workers=1, stdout=out)
+        return out.getvalue()
+
+    def entry(self, name):
+        return ImportManifestEntry.objects.get(source_path=str(self.pdf_dir / name))
+
+    def test_changed_duplicate_is_imported_as_new(self):
+        original = self.pdf_dir / 'g10 history.pdf'
+        original.write_bytes(b'%PDF-1.4 history notes')
+        shutil.copy(original, self.pdf_dir / 'copy of history.pdf')
+        self.run_import()
+        # The copy sorts first, so the original is the duplicate
+        duplicate = self.entry('g10 history.pdf')
+        self.assertEqual(duplicate.status, 'duplicate')
+        owner = Resource.objects.get(pk=duplicate.resource_id)
+        self.assertEqual(owner.title, 'Copy Of History')
+
+        with open(original, 'ab') as fh:
+            fh.write(b' revised')
+        output = self.run_import()
+
+        self.assertIn('1 imported, 0 updated', output)
+        entry = self.entry('g10 history.pdf')
+        self.assertEqual(entry.status, 'imported')
+        self.assertNotEqual(entry.resource_id, owner.pk)
+        # The resource it used to duplicate keeps its own title and file
+        owner_after = Resource.objects.get(pk=owner.pk)
+        self.assertEqual((owner_after.title, owner_after.file.name), (owner.title, owner.file.name))
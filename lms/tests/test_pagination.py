@@ -0,0 +1,162 @@
+# lms/tests/test_pagination.py
+import datetime
+from urllib.parse import quote
+
+from django.core import signing
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from lms.models import Resource
+from lms.pagination import SALT, InvalidCursor, KeysetPaginator
+from lms.views import RECENT_RESOURCE_ORDERING, SUBJECT_RESOURCE_ORDERING
+
+from .utils import MIDDLEWARE, CatalogueTestCase
+
+
+class KeysetPaginatorTests(CatalogueTestCase):
+    PER_PAGE = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Few distinct download counts and dates, so most sort keys tie up to the id
+        dates = [timezone.now() - datetime.timedelta(days=1), timezone.now()]
+        for resource in Resource.objects.all():
+            Resource.objects.filter(pk=resource.pk).update(
+                download_count=resource.pk % 3, upload_date=dates[resource.pk % 2]
+            )
+
+    def paginator(self, queryset=None, ordering=SUBJECT_RESOURCE_ORDERING, **kwargs):
+        return KeysetPaginator(queryset or Resource.objects.all(), ordering, self.PER_PAGE, **kwargs)
+
+    def expected_ids(self, ordering=SUBJECT_RESOURCE_ORDERING):
+        return list(Resource.objects.order_by(*ordering).values_list('pk', flat=True))
+
+    def walk_forward(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def ids(self, page):
+        return [resource.pk for resource in page]
+
+    def test_walk_forward_sees_every_row_once(self):
+        for ordering in (SUBJECT_RESOURCE_ORDERING, RECENT_RESOURCE_ORDERING):
+            with self.subTest(ordering=ordering):
+                pages = self.walk_forward(self.paginator(ordering=ordering))
+                self.assertEqual([pk for page in pages for pk in self.ids(page)], self.expected_ids(ordering))
+                self.assertFalse(pages[0].has_previous())
+                self.assertTrue(all(len(page) == self.PER_PAGE for page in pages[:-1]))
+
+    def test_walk_backward_returns_the_same_pages(self):
+        paginator = self.paginator()
+        forward = self.walk_forward(paginator)
+        self.assertGreater(len(forward), 2)
+        page, backward = forward[-1], [forward[-1]]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward.append(page)
+            self.assertTrue(page.has_next())
+        backward.reverse()
+        self.assertEqual([self.ids(page) for page in backward], [self.ids(page) for page in forward])
+
+    def test_ties_are_broken_by_id(self):
+        ids = self.expected_ids()
+        counts = list(Resource.objects.order_by(*SUBJECT_RESOURCE_ORDERING).values_list('download_count', 'upload_date'))
+        # The fixture really has ties straddling page boundaries
+        self.assertLess(len(set(counts)), len(counts))
+        self.assertEqual(counts[self.PER_PAGE - 1], counts[self.PER_PAGE])
+        second = self.paginator().page(self.paginator().page().next_cursor)
+        self.assertEqual(self.ids(second), ids[self.PER_PAGE:2 * self.PER_PAGE])
+
+    def test_exact_multiple_has_no_empty_last_page(self):
+        ids = self.expected_ids()
+        Resource.objects.filter(pk__in=ids[2 * self.PER_PAGE:]).delete()
+        pages = self.walk_forward(self.paginator())
+        self.assertEqual([len(page) for page in pages], [self.PER_PAGE, self.PER_PAGE])
+        self.assertIsNone(pages[-1].next_cursor)
+
+    def test_cursor_past_the_end_shows_the_last_page(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        ids = self.expected_ids()
+        Resource.objects.filter(pk__in=ids[self.PER_PAGE:]).delete()
+        page = paginator.page(first.next_cursor)
+        self.assertEqual(self.ids(page), ids[:self.PER_PAGE])
+        self.assertFalse(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_cursor_before_the_start_shows_the_first_page(self):
+        paginator = self.paginator()
+        second = paginator.page(paginator.page().next_cursor)
+        ids = self.expected_ids()
+        Resource.objects.filter(pk__in=ids[:self.PER_PAGE]).delete()
+        page = paginator.page(second.previous_cursor)
+        self.assertEqual(self.ids(page), ids[self.PER_PAGE:2 * self.PER_PAGE])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_tampered_cursors_are_rejected(self):
+        paginator = self.paginator()
+        cursor = paginator.page().next_cursor
+        payload = signing.loads(cursor, salt=SALT)
+        payload['v'][-1] = 1
+        unsigned = signing.dumps(payload, salt='someone else', compress=True)
+        for bad in (cursor[:-2] + ('AA' if not cursor.endswith('AA') else 'BB'), 'garbage', unsigned):
+            with self.subTest(cursor=bad):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(bad)
+
+    def test_malformed_payloads_are_rejected(self):
+        paginator = self.paginator()
+        key = paginator.key
+        for payload in (
+            [1, 2, 3],
+            {'k': key, 'd': 'x', 'v': [1, '2026-01-01T00:00:00+00:00', 3]},
+            {'k': key, 'd': 'n', 'v': [1, 3]},
+            {'k': key, 'd': 'n', 'v': ['many', 'not a date', 3]},
+        ):
+            with self.subTest(payload=payload):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(signing.dumps(payload, salt=SALT, compress=True))
+
+    def test_foreign_cursors_are_rejected(self):
+        cursor = self.paginator().page().next_cursor
+        for other in (
+            self.paginator(ordering=RECENT_RESOURCE_ORDERING),
+            self.paginator(key='lms:my_uploads'),
+        ):
+            with self.subTest(key=other.key):
+                with self.assertRaises(InvalidCursor):
+                    other.page(cursor)
+
+    def test_total_is_passed_through(self):
+        self.assertIsNone(self.paginator().page().total)
+        self.assertEqual(self.paginator(total=lambda: 42).page().meta()['total'], 42)
+
+
+@override_settings(MIDDLEWARE=MIDDLEWARE)
+class ResourceListTests(CatalogueTestCase):
+    def test_html_pages_follow_the_cursor_links(self):
+        # A resource without a grade must not break the page
+        Resource.objects.filter(pk=Resource.objects.filter(is_active=True).first().pk).update(grade=None)
+        url = reverse('lms:resource_list') + '?per_page=5'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertTemplateUsed(response, 'lms/resource_list.html')
+            page = response.context['page_obj']
+            seen.extend(resource.pk for resource in page)
+            for resource in page:
+                self.assertContains(response, reverse('lms:view_resource', args=[resource.pk]))
+            url = None
+            if page.has_next():
+                url = f'?per_page=5&cursor={quote(page.next_cursor, safe="/")}'
+                self.assertContains(response, f'href="{url}"')
+                url = reverse('lms:resource_list') + url
+        self.assertEqual(
+            seen,
+            list(Resource.objects.filter(is_active=True).order_by(*RECENT_RESOURCE_ORDERING).values_list('pk', flat=True)),
+        )
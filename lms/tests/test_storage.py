@@ -0,0 +1,61 @@
+# lms/tests/test_storage.py
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from lms.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp(prefix='lms-storage-')
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def blobs(self):
+        root = self.storage.blob_root
+        return [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(root) if os.path.basename(directory) != 'tmp'
+            for name in names
+        ]
+
+    def test_identical_files_share_a_blob(self):
+        first = self.storage.save('a/notes.pdf', ContentFile(b'same body'))
+        second = self.storage.save('b/notes.pdf', ContentFile(b'same body'))
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(second)))
+        [blob] = self.blobs()
+        self.assertEqual(os.stat(blob).st_nlink, 3)
+
+    def test_delete_does_not_reread_the_file(self):
+        names = [self.storage.save(f'{n}/notes.pdf', ContentFile(b'same body')) for n in 'ab']
+        with mock.patch('lms.storage.hash_file', side_effect=AssertionError('hashed on delete')):
+            for name in names:
+                self.storage.delete(name)
+        self.assertFalse(any(self.storage.exists(name) for name in names))
+        # The blob outlives its names until garbage collection
+        [blob] = self.blobs()
+        self.assertEqual(os.stat(blob).st_nlink, 1)
+        self.assertEqual(self.storage.collect_garbage(), (1, len(b'same body')))
+        self.assertEqual(self.blobs(), [])
+
+    def test_garbage_collection_keeps_blobs_in_use(self):
+        kept = self.storage.save('a/notes.pdf', ContentFile(b'kept'))
+        self.storage.delete(self.storage.save('b/other.pdf', ContentFile(b'dropped')))
+        self.assertEqual(self.storage.collect_garbage(dry_run=True), (1, len(b'dropped')))
+        self.assertEqual(len(self.blobs()), 2)
+        self.storage.collect_garbage()
+        [blob] = self.blobs()
+        self.assertTrue(os.path.samefile(blob, self.storage.path(kept)))
+        self.assertEqual(self.storage.open(kept).read(), b'kept')
+
+    def test_saving_after_garbage_collection_recreates_the_blob(self):
+        self.storage.delete(self.storage.save('a/notes.pdf', ContentFile(b'body')))
+        self.storage.collect_garbage()
+        name = self.storage.save('a/notes.pdf', ContentFile(b'body'))
+        [blob] = self.blobs()
+        self.assertTrue(os.path.samefile(blob, self.storage.path(name)))
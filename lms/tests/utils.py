@@ -0,0 +1,105 @@
+# lms/tests/utils.py
+"""Shared fixtures for the lms tests"""
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from lms import curriculum
+from lms.models import EducationLevel, Grade, Resource, ResourceType, Subject, SubjectCategory
+
+# The project middleware with instrumentation first, as the settings have it
+MIDDLEWARE = [
+    'lms.instrumentation.InstrumentationMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'accounts.middleware.UserActivityMiddleware',
+    'accounts.middleware.SiteSettingsMiddleware',
+]
+
+
+def clear_caches():
+    """Forget every shared and process-local cache, as after a deploy"""
+    cache.clear()
+    curriculum.invalidate()
+
+
+class CatalogueTestCase(TestCase):
+    """
+    A small catalogue in a scratch MEDIA_ROOT: two education levels, three
+    grades, four subjects in two categories, two resource types and three
+    resources per subject and grade, one of them hidden.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp(prefix='lms-tests-')
+        cls._media_settings = override_settings(MEDIA_ROOT=cls._media_root)
+        cls._media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_settings.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        cls.user = User.objects.create_user('learner', 'learner@example.com', 'password')
+
+        # Run the signal handlers' after-commit work: stats, search documents, suggestions
+        with cls.captureOnCommitCallbacks(execute=True):
+            primary = EducationLevel.objects.create(name='Lower Primary', order=1)
+            junior = EducationLevel.objects.create(name='Junior School', order=2)
+            cls.g4 = Grade.objects.create(name='Grade 4', education_level=primary, order=4)
+            cls.g5 = Grade.objects.create(name='Grade 5', education_level=primary, order=5)
+            cls.g7 = Grade.objects.create(name='Grade 7', education_level=junior, order=7)
+            cls.levels = [primary, junior]
+            cls.grades = [cls.g4, cls.g5, cls.g7]
+
+            sciences = SubjectCategory.objects.create(name='Sciences')
+            languages = SubjectCategory.objects.create(name='Languages')
+            cls.science = Subject.objects.create(name='Science', category=sciences)
+            cls.maths = Subject.objects.create(name='Mathematics', category=sciences)
+            cls.english = Subject.objects.create(name='English', category=languages)
+            cls.kiswahili = Subject.objects.create(name='Kiswahili', category=languages)
+            cls.science.grades.set([cls.g4, cls.g5])
+            cls.maths.grades.set([cls.g4, cls.g7])
+            cls.english.grades.set([cls.g5, cls.g7])
+            cls.kiswahili.grades.set([cls.g7])
+            cls.subjects = [cls.science, cls.maths, cls.english, cls.kiswahili]
+
+            cls.pdf = ResourceType.objects.create(name='PDF', description='Documents')
+            cls.notes = ResourceType.objects.create(name='Notes', description='Plain text notes')
+
+            cls.resources = []
+            for subject in cls.subjects:
+                for grade in subject.grades.all():
+                    for n, (resource_type, extension, active) in enumerate(
+                        [(cls.pdf, 'pdf', True), (cls.notes, 'txt', True), (cls.notes, 'txt', False)], start=1
+                    ):
+                        title = f'{subject.name} {grade.name} Notes {n}'
+                        cls.resources.append(Resource.objects.create(
+                            title=title,
+                            description=f'Revision notes for {subject.name}',
+                            subject=subject,
+                            grade=grade,
+                            resource_type=resource_type,
+                            file=ContentFile(f'{title}\n'.encode(), name=f'notes-{n}.{extension}'),
+                            uploaded_by=cls.staff,
+                            allow_download=True,
+                            is_active=active,
+                        ))
+
+    def setUp(self):
+        clear_caches()
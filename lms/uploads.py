@@ -0,0 +1,237 @@
+# lms/uploads.py
+"""
+Resumable chunked uploads for large resources.
+
+Instead of one multipart POST, a client sends the file in pieces:
+
+1. start(): the client declares the file name and size; an UploadSession
+   and an empty staging file are created.
+2. write_chunk(): each PUT carries raw bytes for ?offset=N. The body is
+   streamed straight into the staging file (never through Django's upload
+   handlers), so worker memory stays flat whatever the file size. A chunk
+   must start at the session's current offset; otherwise it is refused
+   with the offset to resume from. An optional X-Chunk-SHA256 header is
+   verified before the offset advances; without one, the bytes of a
+   dropped chunk that did arrive are kept.
+3. finalize(): the staging file must be complete and match the optional
+   SHA-256 of the whole file. It is then handed to ResourceUploadForm as
+   an uploaded file, so validation and saving are exactly those of a
+   normal upload. Staging lives under LMS_UPLOAD_STAGING_DIR, by default
+   inside MEDIA_ROOT, so storage links or moves it instead of copying.
+
+Sessions idle for LMS_UPLOAD_EXPIRY seconds are removed by
+`manage.py clear_stale_uploads`.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Resource, UploadSession
+from .storage import hash_file
+
+logger = logging.getLogger(__name__)
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """A chunked upload request that cannot be honoured; carries the HTTP status"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def chunk_size():
+    """Chunk size suggested to clients"""
+    return int(_setting('LMS_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+
+
+def chunk_threshold():
+    """Files larger than this are uploaded in chunks by the upload page"""
+    return int(_setting('LMS_UPLOAD_CHUNK_THRESHOLD', 20 * 1024 * 1024))
+
+
+def staging_dir():
+    return _setting('LMS_UPLOAD_STAGING_DIR', os.path.join(settings.MEDIA_ROOT, '.uploads'))
+
+
+def staging_path(session):
+    return os.path.join(staging_dir(), session.pk.hex)
+
+
+def start(user, filename, size):
+    """Open an upload session for a file of the declared size"""
+    filename = os.path.basename(filename or '')
+    if not filename:
+        raise UploadError('A file name is required')
+    if size <= 0:
+        raise UploadError('The file is empty')
+    max_size = int(_setting('LMS_UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+    if size > max_size:
+        raise UploadError(f'Files larger than {max_size // (1024 * 1024)} MB cannot be uploaded', status=413)
+
+    # Refuse a file type the form would reject before any bytes are sent
+    field = Resource._meta.get_field('file')
+    try:
+        for validator in field.validators:
+            validator(UploadedFile(name=filename))
+    except ValidationError as e:
+        raise UploadError(' '.join(e.messages))
+
+    session = UploadSession.objects.create(user=user, filename=filename, size=size)
+    os.makedirs(staging_dir(), exist_ok=True)
+    open(staging_path(session), 'wb').close()
+    logger.info(f"Upload session {session.pk} started by {user.username} for {filename} ({size} bytes)")
+    return session
+
+
+def _claim(session, status, **filters):
+    """Move an idle session to a busy status; False if another request holds it"""
+    cutoff = timezone.now() - timedelta(seconds=int(_setting('LMS_UPLOAD_CHUNK_TIMEOUT', 300)))
+    idle = Q(status='active') | Q(status__in=['receiving', 'finalizing'], updated_at__lt=cutoff)
+    return bool(
+        UploadSession.objects.filter(idle, pk=session.pk, **filters).update(status=status, updated_at=timezone.now())
+    )
+
+
+def _release(session, **fields):
+    UploadSession.objects.filter(pk=session.pk).update(status='active', updated_at=timezone.now(), **fields)
+
+
+def _current_offset(session):
+    return UploadSession.objects.filter(pk=session.pk).values_list('received', flat=True).first()
+
+
+def write_chunk(session, offset, stream, length, expected_sha256=None):
+    """Append `length` bytes read from stream at offset; returns the new offset"""
+    max_chunk = int(_setting('LMS_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024))
+    if length <= 0:
+        raise UploadError('Empty chunk')
+    if length > max_chunk:
+        raise UploadError(f'Chunks may not exceed {max_chunk} bytes', status=413)
+    if offset + length > session.size:
+        raise UploadError('Chunk extends past the declared file size')
+    if not _claim(session, 'receiving', received=offset):
+        raise UploadError('Offset does not match the upload', status=409, offset=_current_offset(session))
+
+    sha256 = hashlib.sha256()
+    written = 0
+    try:
+        with open(staging_path(session), 'r+b') as fh:
+            fh.seek(offset)
+            try:
+                while written < length:
+                    block = stream.read(min(READ_BUFFER_SIZE, length - written))
+                    if not block:
+                        break
+                    sha256.update(block)
+                    fh.write(block)
+                    written += len(block)
+            except OSError as e:
+                # Client went away mid-chunk; keep what arrived
+                logger.info(f"Upload {session.pk}: chunk at {offset} interrupted after {written} bytes: {e}")
+
+            error = None
+            if expected_sha256 and (written < length or sha256.hexdigest() != expected_sha256.lower()):
+                error = 'Incomplete chunk' if written < length else 'Chunk checksum mismatch'
+                written = 0
+            fh.truncate(offset + written)
+    except BaseException:
+        _release(session)
+        raise
+
+    _release(session, received=offset + written)
+    if error:
+        raise UploadError(error, offset=offset)
+    return offset + written
+
+
+class StagedUpload(UploadedFile):
+    """A finished staging file presented to forms as an uploaded file"""
+
+    def __init__(self, session):
+        path = staging_path(session)
+        content_type = mimetypes.guess_type(session.filename)[0] or 'application/octet-stream'
+        super().__init__(open(path, 'rb'), session.filename, content_type, session.size)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def finalize(session, expected_sha256=None):
+    """Lock a complete upload for resource creation and return it as an uploaded file"""
+    if not _claim(session, 'finalizing', received=session.size):
+        offset = _current_offset(session)
+        if offset is not None and offset < session.size:
+            raise UploadError('The upload is incomplete', status=409, offset=offset)
+        raise UploadError('The upload is already being finalized', status=409)
+
+    path = staging_path(session)
+    try:
+        if os.path.getsize(path) != session.size:
+            raise UploadError('The staging file does not match the declared size')
+        if expected_sha256 and hash_file(path) != expected_sha256.lower():
+            raise UploadError('File checksum mismatch')
+    except (UploadError, OSError):
+        fail(session)
+        raise
+    return StagedUpload(session)
+
+
+def complete(session, resource):
+    """Record the created resource and drop the staging file"""
+    UploadSession.objects.filter(pk=session.pk).update(
+        status='complete', resource=resource, updated_at=timezone.now()
+    )
+    _remove_staging(session)
+    logger.info(f"Upload session {session.pk} finished as resource {resource.pk}")
+
+
+def reopen(session):
+    """Return a session to the client after the resource form was rejected"""
+    _release(session)
+
+
+def fail(session):
+    UploadSession.objects.filter(pk=session.pk).update(status='failed', updated_at=timezone.now())
+    _remove_staging(session)
+
+
+def abort(session):
+    _remove_staging(session)
+    UploadSession.objects.filter(pk=session.pk).delete()
+
+
+def _remove_staging(session):
+    try:
+        os.remove(staging_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def clear_stale(older_than=None):
+    """Delete sessions idle longer than LMS_UPLOAD_EXPIRY along with their staging files"""
+    if older_than is None:
+        older_than = timedelta(seconds=int(_setting('LMS_UPLOAD_EXPIRY', 24 * 60 * 60)))
+    stale = UploadSession.objects.filter(updated_at__lt=timezone.now() - older_than)
+    removed = 0
+    for session in stale.exclude(status='complete').iterator():
+        _remove_staging(session)
+        removed += 1
+    stale.delete()
+    return removed
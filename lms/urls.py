@@ -1,7 +1,6 @@
 from django.urls import path
-from . import views
+from . import delivery, views
 from django.conf import settings
-from django.conf.urls.static import static
 
 app_name = 'lms'
 
@@ -15,20 +14,28 @@ urlpatterns = [
     path('grade/<int:grade_id>/', views.grade_dashboard, name='grade_dashboard'),
     path('subject/<int:grade_id>/<int:subject_id>/', views.subject_dashboard, name='subject_dashboard'),
     path('view/<int:resource_id>/', views.view_resource, name='view_resource'),
+    path('view/<int:resource_id>/pages/', views.resource_pages, name='resource_pages'),
+    path('view/<int:resource_id>/pages/<int:page>.<str:fmt>', views.resource_page, name='resource_page'),
     path('download/<int:resource_id>/', views.download_resource, name='download_resource'),
     path('search/', views.search, name='search'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
     path('my-downloads/', views.my_downloads, name='my_downloads'),
     path('my-uploads/', views.my_uploads, name='my_uploads'),
     path('category/<int:category_id>/', views.category_dashboard, name='category_dashboard'),
     path('resources/', views.resource_list, name='resource_list'),
     path('debug-grades/', views.debug_grades, name='debug_grades'),
     path('error/', views.error, name='error'),
+    path('metrics/', views.metrics, name='metrics'),
 
     # Upload page
     path('upload/', views.upload_resource, name='upload_resource'),
+    path('upload/chunked/', views.chunked_upload_start, name='chunked_upload_start'),
+    path('upload/chunked/<uuid:upload_id>/', views.chunked_upload, name='chunked_upload'),
+    path('upload/chunked/<uuid:upload_id>/finalize/', views.chunked_upload_finalize, name='chunked_upload_finalize'),
 
     # Admin management pages
     path('superuser/', views.superuser_dashboard, name='superuser_dashboard'),
+    path('superuser/tables/<str:table>/', views.superuser_table, name='superuser_table'),
     path('admin/add-education-level/', views.admin_add_education_level, name='admin_add_education_level'),
     path('admin/add-category/', views.admin_add_category, name='admin_add_category'),
     path('admin/add-grade/', views.admin_add_grade, name='admin_add_grade'),
@@ -37,31 +44,20 @@ urlpatterns = [
     path('admin/add-pathway/', views.admin_add_pathway, name='admin_add_pathway'),
 
     # AJAX API endpoints for admin interface
-    path('admin/get-grades/', views.admin_get_grades, name='admin_get_grades'),
-    path('admin/get-grade/', views.admin_get_grade, name='admin_get_grade'),
+    path('superuser/read/', views.admin_read, name='admin_read'),
+    path('superuser/resources/bulk/', views.admin_bulk_resources, name='admin_bulk_resources'),
     path('admin/edit-grade/', views.admin_edit_grade, name='admin_edit_grade'),
     path('admin/delete-grade/', views.admin_delete_grade, name='admin_delete_grade'),
-    path('admin/get-categories/', views.admin_get_categories, name='admin_get_categories'),
-    path('admin/get-category/', views.admin_get_category, name='admin_get_category'),
     path('admin/edit-category/', views.admin_edit_category, name='admin_edit_category'),
     path('admin/delete-category/', views.admin_delete_category, name='admin_delete_category'),
-    path('admin/get-subjects/', views.admin_get_subjects, name='admin_get_subjects'),
-    path('admin/get-subject/', views.admin_get_subject, name='admin_get_subject'),
     path('admin/edit-subject/', views.admin_edit_subject, name='admin_edit_subject'),
     path('admin/delete-subject/', views.admin_delete_subject, name='admin_delete_subject'),
-    path('admin/get-resource-types/', views.admin_get_resource_types, name='admin_get_resource_types'),
-    path('admin/get-resource-type/', views.admin_get_resource_type, name='admin_get_resource_type'),
     path('admin/edit-resource-type/', views.admin_edit_resource_type, name='admin_edit_resource_type'),
     path('admin/delete-resource-type/', views.admin_delete_resource_type, name='admin_delete_resource_type'),
-    path('admin/get-pathways/', views.admin_get_pathways, name='admin_get_pathways'),
-    path('admin/get-pathway/', views.admin_get_pathway, name='admin_get_pathway'),
     path('admin/edit-pathway/', views.admin_edit_pathway, name='admin_edit_pathway'),
     path('admin/delete-pathway/', views.admin_delete_pathway, name='admin_delete_pathway'),
-    path('admin/get-education-levels/', views.admin_get_education_levels, name='admin_get_education_levels'),
-    path('admin/get-education-level/', views.admin_get_education_level, name='admin_get_education_level'),
     path('admin/edit-education-level/', views.admin_edit_education_level, name='admin_edit_education_level'),
     path('admin/delete-education-level/', views.admin_delete_education_level, name='admin_delete_education_level'),
-    path('admin/get-resource/', views.admin_get_resource, name='admin_get_resource'),
     path('admin/edit-resource/', views.edit_resource, name='admin_edit_resource'),
     path('admin/delete-resource/', views.delete_resource, name='admin_delete_resource'),
     path('admin/toggle-download/', views.admin_toggle_download, name='admin_toggle_download'),
@@ -98,9 +94,11 @@ urlpatterns = [
     path('pathway/<int:pathway_id>/subjects/', views.pathway_subjects, name='pathway_subjects'),
 ]
 
-# Serve media files in development
+# Serve media files in development (with range support for video seeking).
+# Never in production: the route checks no permissions, so the front-end
+# server must serve MEDIA_URL (or only the downloadable files) itself
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += delivery.media_urlpatterns()
 
 # Custom error handlers
 handler404 = 'lms.views.page_not_found'
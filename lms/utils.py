@@ -3,103 +3,130 @@
 Utility functions for the LMS application
 """
 import os
+import shutil
+import signal
+import subprocess
+import sys
 import tempfile
-from django.core.files.base import ContentFile
-from docx2pdf import convert as docx2pdf_convert
+from pathlib import Path
 
-def convert_doc_to_pdf(input_path, output_path=None):
+from django.conf import settings
+
+# Office formats converted to PDF in the background after upload
+CONVERTIBLE_EXTENSIONS = ('.doc', '.docx', '.ppt', '.pptx')
+
+# docx2pdf drives Microsoft Word, so it only handles Word documents
+_DOCX2PDF_SCRIPT = 'import sys; from docx2pdf import convert; convert(sys.argv[1], sys.argv[2])'
+
+
+def needs_conversion(file_name):
+    """True if the file is an office document that is served as PDF once converted"""
+    return file_name.lower().endswith(CONVERTIBLE_EXTENSIONS)
+
+
+def _soffice_path():
+    configured = getattr(settings, 'LMS_SOFFICE_PATH', None)
+    if configured:
+        return configured
+    return shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def _run(args, timeout):
+    """
+    subprocess.run(args, check=True, capture_output=True) that kills the
+    whole process group on timeout: soffice forks a worker (soffice.bin)
+    that would otherwise outlive its launcher and keep its profile locked.
     """
-    Convert DOC/DOCX file to PDF using docx2pdf library
-    
+    posix = os.name == 'posix'
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=posix) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            if posix:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            else:
+                process.kill()
+            process.communicate()
+            raise
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+
+
+def convert_doc_to_pdf(input_path, output_path=None, timeout=None):
+    """
+    Convert a DOC/DOCX/PPT/PPTX file to PDF
+
+    The converter runs in a child process (LibreOffice when available,
+    otherwise docx2pdf) so a hung conversion is killed after `timeout`
+    seconds instead of tying up the caller. Each LibreOffice run gets its
+    own throwaway profile, so concurrent conversions do not contend for
+    (or wait on a crashed run's lock of) the shared user profile.
+
     Args:
-        input_path (str): Path to the input DOC/DOCX file
+        input_path (str): Path to the input document
         output_path (str, optional): Path for the output PDF file
-    
+        timeout (int, optional): Seconds before the converter is killed
+
     Returns:
         str: Path to the converted PDF file
-    
+
     Raises:
-        Exception: If conversion fails
+        Exception: If conversion fails or times out
     """
     if output_path is None:
-        output_path = input_path.replace('.docx', '.pdf').replace('.doc', '.pdf')
-    
+        output_path = os.path.splitext(input_path)[0] + '.pdf'
+    if timeout is None:
+        timeout = getattr(settings, 'LMS_CONVERSION_TIMEOUT', 300)
+
+    soffice = _soffice_path()
     try:
-        docx2pdf_convert(input_path, output_path)
-        return output_path
-    except Exception as e:
-        raise Exception(f"Failed to convert document to PDF: {str(e)}")
+        if soffice:
+            out_dir = os.path.dirname(output_path) or '.'
+            with tempfile.TemporaryDirectory(prefix='lms-soffice-') as work_dir:
+                profile = Path(work_dir, 'profile').as_uri()
+                _run(
+                    [soffice, f'-env:UserInstallation={profile}', '--headless', '--norestore',
+                     '--convert-to', 'pdf', '--outdir', out_dir, input_path],
+                    timeout,
+                )
+            produced = os.path.join(out_dir, os.path.splitext(os.path.basename(input_path))[0] + '.pdf')
+            if produced != output_path and os.path.exists(produced):
+                os.replace(produced, output_path)
+        elif input_path.lower().endswith(('.doc', '.docx')):
+            _run([sys.executable, '-c', _DOCX2PDF_SCRIPT, input_path, output_path], timeout)
+        else:
+            raise Exception("LibreOffice is required to convert presentations")
+    except subprocess.TimeoutExpired:
+        raise Exception(f"Failed to convert document to PDF: timed out after {timeout}s")
+    except subprocess.CalledProcessError as e:
+        detail = (e.stderr or b'').decode(errors='replace').strip()[-500:]
+        raise Exception(f"Failed to convert document to PDF: {detail or e}")
 
-def handle_document_upload(uploaded_file):
+    if not os.path.exists(output_path):
+        raise Exception("Failed to convert document to PDF: converter produced no output")
+    return output_path
+
+
+def handle_document_upload(resource):
     """
-    Handle document upload and conversion to PDF
-    
+    Queue PDF conversion for a freshly saved resource
+
+    The upload is stored as-is and served until the background worker
+    (`manage.py process_jobs`) swaps in the PDF, so the request returns
+    without waiting for the converter.
+
     Args:
-        uploaded_file: Uploaded file object
-    
+        resource: Saved Resource whose file was just uploaded
+
     Returns:
-        tuple: (processed_file, final_resource_type)
-            - processed_file: The file (converted to PDF if needed)
-            - final_resource_type: The resource type (PDF if converted)
-    """
-    from .models import ResourceType
-    
-    # Get the file extension
-    file_name = uploaded_file.name.lower()
-    
-    # Check if it's a document that needs conversion
-    if file_name.endswith(('.doc', '.docx')):
-        # Create temporary files
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx' if file_name.endswith('.docx') else '.doc') as temp_input:
-            # Save uploaded file to temporary location
-            for chunk in uploaded_file.chunks():
-                temp_input.write(chunk)
-            temp_input_path = temp_input.name
-        
-        # Create output path
-        temp_output_path = temp_input_path.replace('.docx', '.pdf').replace('.doc', '.pdf')
-        
-        try:
-            # Convert to PDF
-            convert_doc_to_pdf(temp_input_path, temp_output_path)
-            
-            # Read the converted PDF
-            with open(temp_output_path, 'rb') as pdf_file:
-                pdf_content = pdf_file.read()
-            
-            # Create a new file object
-            from django.core.files.base import ContentFile
-            from django.core.files.uploadedfile import SimpleUploadedFile
-            
-            pdf_file = SimpleUploadedFile(
-                os.path.basename(uploaded_file.name).replace('.docx', '.pdf').replace('.doc', '.pdf'),
-                pdf_content,
-                content_type='application/pdf'
-            )
-            
-            # Clean up temporary files
-            os.unlink(temp_input_path)
-            os.unlink(temp_output_path)
-            
-            # Return the converted PDF and PDF resource type
-            pdf_resource_type = ResourceType.objects.get(name='PDF')
-            return pdf_file, pdf_resource_type
-            
-        except Exception as e:
-            # Clean up temporary files on error
-            if os.path.exists(temp_input_path):
-                os.unlink(temp_input_path)
-            if os.path.exists(temp_output_path):
-                os.unlink(temp_output_path)
-            raise e
-    else:
-        # For non-document files, return as-is
-        pdf_resource_type = ResourceType.objects.get(name='PDF') if file_name.endswith('.pdf') else ResourceType.objects.get(name='Document')
-        return uploaded_file, pdf_resource_type
-
-# Create the directory if it doesn't exist
-def create_utils_module():
-    """
-    This function is just for documentation - create the utils.py file manually
+        bool: True if a conversion job was queued
     """
-    pass
\ No newline at end of file
+    from . import processing
+
+    if not resource.file or not needs_conversion(resource.file.name):
+        return False
+    processing.enqueue(resource, 'convert_pdf')
+    return True
@@ -1,13 +1,17 @@
 import os
 import logging
+import time
 from datetime import timedelta
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, FileResponse, Http404
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, Http404
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.conf import settings
+from django.urls import reverse
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Count
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.exceptions import PermissionDenied
@@ -18,6 +22,10 @@ from django.core.exceptions import ValidationError
 
 
 from .forms import ResourceUploadForm
+from .utils import handle_document_upload
+from . import admin_api, admin_tables, bulk, counters, curriculum, delivery, instrumentation, page_cache, renditions, stats, suggest, uploads
+from . import search as search_index
+from .pagination import InvalidCursor, KeysetPaginator
 
 import logging
 
@@ -31,7 +39,8 @@ from .models import (
     SubjectCategory,
     Resource,
     ResourceType,
-    Pathway
+    Pathway,
+    UploadSession
 )
 from .forms import (
     ResourceUploadForm,
@@ -46,6 +55,10 @@ from .forms import (
 
 logger = logging.getLogger(__name__)
 
+# Keyset orderings; each is backed by a composite index on Resource
+SUBJECT_RESOURCE_ORDERING = ('-download_count', '-upload_date', '-id')
+RECENT_RESOURCE_ORDERING = ('-upload_date', '-id')
+
 
 
 def is_admin(user):
@@ -121,13 +134,16 @@ def success_page(request, content_type=None, content_id=None):
         'content_id': content_id
     })
 
+@instrumentation.query_budget(12)
+@page_cache.anonymous('resources')
 def summary(request):
     """Home page displaying all education levels"""
     try:
-        education_levels = EducationLevel.objects.prefetch_related('grades').all().order_by('order')
-        total_grades = Grade.objects.count()
-        total_subjects = Subject.objects.count()
-        total_resources = Resource.objects.filter(is_active=True).count()
+        tree = curriculum.get_tree()
+        education_levels = tree.levels
+        total_grades = tree.grade_count
+        total_subjects = tree.subject_count
+        total_resources = stats.active_count()
         featured_resources = Resource.objects.filter(
             is_active=True
         ).select_related('subject', 'subject__category').order_by('-download_count', '-upload_date')[:6]
@@ -146,13 +162,16 @@ def summary(request):
         messages.error(request, 'An error occurred while loading the page. Please try again.')
         return render(request, 'lms/error.html', {'message': 'Failed to load summary page.'})
 
+@instrumentation.query_budget(12)
+@page_cache.anonymous('resources')
 def grade_level_dashboard(request):
     """Display all education levels as the main landing page"""
     try:
-        education_levels = EducationLevel.objects.prefetch_related('grades').all().order_by('order')
-        total_grades = Grade.objects.count()
-        total_subjects = Subject.objects.count()
-        total_resources = Resource.objects.filter(is_active=True).count()
+        tree = curriculum.get_tree()
+        education_levels = tree.levels
+        total_grades = tree.grade_count
+        total_subjects = tree.subject_count
+        total_resources = stats.active_count()
         featured_resources = Resource.objects.filter(
             is_active=True
         ).select_related('subject', 'subject__category').order_by('-download_count', '-upload_date')[:8]
@@ -173,49 +192,62 @@ def grade_level_dashboard(request):
 
 @login_required
 @user_passes_test(is_admin)
+@instrumentation.query_budget(12)
 def superuser_dashboard(request):
-    """Superuser dashboard for managing content"""
+    """Superuser dashboard for managing content; tabs load their rows from superuser_table"""
     if not request.user.is_staff:
         logger.warning(f"Unauthorized access to superuser dashboard by {request.user.username}")
         return render(request, 'lms/access_denied.html', status=403)
 
-    education_levels = EducationLevel.objects.all().order_by('order')
-    grades = Grade.objects.select_related('education_level').all().order_by('education_level__order', 'order')
-    categories = SubjectCategory.objects.all().order_by('name')
-    subjects = Subject.objects.select_related('category').prefetch_related('grades').all().order_by('category__name', 'name')
-    resource_types = ResourceType.objects.all().order_by('name')
-    resources = Resource.objects.select_related('subject', 'resource_type', 'uploaded_by').all().order_by('-upload_date')
-    pathways = Pathway.objects.select_related('grade').all().order_by('name')
-
+    tree = curriculum.get_tree()
     context = {
-        'education_levels': education_levels,
-        'grades': grades,
-        'categories': categories,
-        'subjects': subjects,
-        'resource_types': resource_types,
-        'resources': resources,
-        'pathways': pathways,
+        'education_levels': tree.levels,
+        'grades': sorted(tree.grades_by_id.values(), key=lambda g: (g.education_level.order, g.order, g.id)),
+        'categories': sorted(tree.categories_by_id.values(), key=lambda c: c.name),
+        'resource_types': ResourceType.objects.order_by('name'),
+        'grade_count': tree.grade_count,
+        'subject_count': tree.subject_count,
+        'resource_count': stats.totals()['resource_count'],
     }
 
     return render(request, 'lms/superuser_dashboard.html', context)
 
 
+@login_required
+@user_passes_test(is_admin)
+@require_http_methods(["GET"])
+@instrumentation.query_budget(10)
+def superuser_table(request, table):
+    """One page of a superuser dashboard tab as JSON (see lms.admin_tables)"""
+    listing = admin_tables.TABLES.get(table)
+    if listing is None:
+        raise Http404
+    try:
+        return JsonResponse(listing.page(request.GET))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@instrumentation.query_budget(12)
+@page_cache.anonymous('level:{level_id}')
 def education_level_dashboard(request, level_id):
     """Display grades for a specific education level"""
     try:
         logger.debug(f"Loading education level with ID {level_id}")
-        education_level = get_object_or_404(EducationLevel, id=level_id)
+        tree = curriculum.get_tree()
+        education_level = curriculum.lookup_or_404('level', level_id)
         logger.debug(f"Found education level: {education_level.name}")
 
-        grades = Grade.objects.filter(education_level=education_level).order_by('order')
-        logger.debug(f"Found {grades.count()} grades")
+        grades = education_level.grades
+        logger.debug(f"Found {len(grades)} grades")
         if not grades:
             logger.warning(f"No grades found for education level {level_id}")
             messages.warning(request, "No grades available for this education level.")
 
-        subjects_count = Subject.objects.filter(grades__in=grades).distinct().count()
-        resources_count = Resource.objects.filter(subject__grades__in=grades, is_active=True).distinct().count()
-        average_subjects_per_grade = subjects_count / grades.count() if grades.count() > 0 else 0
+        subject_ids = tree.subject_ids_for_level(education_level.id)
+        subjects_count = len(subject_ids)
+        resources_count = stats.active_count(grade_ids=[grade.id for grade in grades])
+        average_subjects_per_grade = subjects_count / len(grades) if grades else 0
 
         context = {
             'education_level': education_level,
@@ -240,10 +272,10 @@ def grade_pathways_dashboard(request, grade_id):
     """Display pathways for a specific grade"""
     try:
         logger.debug(f"Loading pathways for grade ID {grade_id}")
-        grade = get_object_or_404(Grade, id=grade_id)
+        grade = curriculum.lookup_or_404('grade', grade_id)
         logger.debug(f"Found grade: {grade.name}")
-        pathways = Pathway.objects.filter(grade=grade).distinct()
-        logger.debug(f"Found {pathways.count()} pathways")
+        pathways = grade.pathways
+        logger.debug(f"Found {len(pathways)} pathways")
 
         context = {
             'grade': grade,
@@ -263,22 +295,26 @@ def grade_pathways_dashboard(request, grade_id):
 
 
 
+@page_cache.anonymous()
 def pathways_dashboard(request, level_id):
     """Display pathways for Senior Secondary"""
-    education_level = get_object_or_404(EducationLevel, id=level_id)
-    pathways = Pathway.objects.filter(grade__education_level=education_level).distinct()
+    education_level = curriculum.lookup_or_404('level', level_id)
+    pathways = curriculum.get_tree().pathways_for_level(education_level.id)
     context = {
         'education_level': education_level,
         'pathways': pathways,
     }
     return render(request, 'lms/pathways_dashboard.html', context)
 
+@page_cache.anonymous()
 def pathway_subjects(request, pathway_id):
     """Display subjects for a specific pathway"""
-    pathway = get_object_or_404(Pathway, id=pathway_id)
-    subjects = pathway.subjects.all().order_by('name')
+    tree = curriculum.get_tree()
+    pathway = curriculum.lookup_or_404('pathway', pathway_id)
+    subjects = pathway.subjects
     # Use the first grade in senior secondary for subject dashboard links
-    senior_grade = Grade.objects.filter(education_level__name='Senior Secondary').first()
+    senior_level = tree.level_by_name('Senior Secondary')
+    senior_grade = senior_level.grades.first() if senior_level else None
     context = {
         'pathway': pathway,
         'subjects': subjects,
@@ -288,24 +324,22 @@ def pathway_subjects(request, pathway_id):
 
 
 
+@instrumentation.query_budget(12)
+@page_cache.anonymous('grade:{grade_id}')
 def grade_dashboard(request, grade_id):
     """Display subjects for a specific grade"""
     try:
-        grade = get_object_or_404(Grade, id=grade_id)
-        subjects = Subject.objects.filter(grades=grade).select_related('category')
-        pathways = Pathway.objects.filter(grade=grade).prefetch_related('subjects') if grade.education_level.name == 'Senior Secondary' else []
+        grade = curriculum.lookup_or_404('grade', grade_id)
+        pathways = grade.pathways if grade.education_level.name == 'Senior Secondary' else []
         has_pathways = len(pathways) > 0
 
-        categories = {}
-        for subject in subjects:
-            category_name = subject.category.name
-            if category_name not in categories:
-                categories[category_name] = []
-            categories[category_name].append(subject)
+        categories = curriculum.get_tree().subjects_for_grade_by_category(grade.id)
+        resource_counts = stats.grade_subject_counts(grade.id)
 
         context = {
             'grade': grade,
             'categories': categories,
+            'resource_counts': resource_counts,
             'has_pathways': has_pathways,
             'pathways': pathways,
         }
@@ -319,48 +353,54 @@ def grade_dashboard(request, grade_id):
         messages.error(request, 'An error occurred while loading the grade. Please try again.')
         return render(request, 'lms/error.html', {'message': 'Failed to load grade.'})
 
+@instrumentation.query_budget(12)
+@page_cache.anonymous('subject:{subject_id}')
 def subject_dashboard(request, grade_id, subject_id):
     """Display resources for a specific subject and grade"""
     try:
-        grade = get_object_or_404(Grade, id=grade_id)
-        subject = get_object_or_404(Subject, id=subject_id)
+        grade = curriculum.lookup_or_404('grade', grade_id)
+        subject = curriculum.lookup_or_404('subject', subject_id)
 
         # Ensure subject is associated with the grade
-        if not subject.grades.filter(id=grade_id).exists():
+        if not curriculum.get_tree().grade_has_subject(grade.id, subject.id):
             messages.error(request, f"The subject {subject.name} is not associated with {grade.name}.")
             return redirect('lms:grade_dashboard', grade_id=grade_id)
 
-        # Filter resources by subject, grade, and is_active
         resources = Resource.objects.filter(
-            subject=subject,
-            subject__grades=grade,  # Ensure resources are linked to the grade
+            grade_id=grade.id,
+            subject_id=subject.id,
             is_active=True
-        ).select_related('resource_type', 'uploaded_by').order_by('-download_count', '-upload_date')
+        ).select_related('resource_type', 'uploaded_by')
+        all_resource_types = ResourceType.objects.all()
+        selected_type = next((rt for rt in all_resource_types if rt.name == request.GET.get('type')), None)
+        if selected_type:
+            resources = resources.filter(resource_type=selected_type)
+
+        paginator = KeysetPaginator(
+            resources,
+            SUBJECT_RESOURCE_ORDERING,
+            12,
+            total=lambda: stats.resource_count(subject.id, grade.id, selected_type.id if selected_type else None),
+        )
+        try:
+            page_obj = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            page_obj = paginator.page()
 
-        # Group resources by type for template
+        # Group the page's resources by type for the template
         resource_types = {}
-        for resource in resources:
-            type_name = resource.resource_type.name
-            if type_name not in resource_types:
-                resource_types[type_name] = []
-            resource_types[type_name].append(resource)
-
-        # Get all resource types for filter buttons
-        all_resource_types = ResourceType.objects.all()
+        for resource in page_obj:
+            resource_types.setdefault(resource.resource_type.name, []).append(resource)
 
         # Get new_resource_id for highlighting
         new_resource_id = request.GET.get('new_resource_id')
         new_resource = None
         if new_resource_id:
             try:
-                new_resource = Resource.objects.get(id=new_resource_id, subject=subject, subject__grades=grade, is_active=True)
-            except Resource.DoesNotExist:
+                new_resource = Resource.objects.get(id=new_resource_id, grade_id=grade.id, subject_id=subject.id, is_active=True)
+            except (Resource.DoesNotExist, ValueError):
                 logger.warning(f"New resource ID {new_resource_id} not found or invalid for subject {subject_id}, grade {grade_id}")
 
-        paginator = Paginator(resources, 12)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-
         context = {
             'grade': grade,
             'subject': subject,
@@ -368,7 +408,7 @@ def subject_dashboard(request, grade_id, subject_id):
             'new_resource_id': new_resource_id if new_resource else None,
             'resource_types': resource_types,
             'all_resource_types': all_resource_types,
-            'selected_type': request.GET.get('type', ''),
+            'selected_type': selected_type.name if selected_type else '',
         }
 
         return render(request, 'lms/subject_dashboard.html', context)
@@ -381,12 +421,62 @@ def subject_dashboard(request, grade_id, subject_id):
         return render(request, 'lms/error.html', {'message': 'Failed to load subject.'}, status=500)
 
 
+@instrumentation.query_budget(6)
+@require_http_methods(['GET', 'HEAD'])
+def resource_pages(request, resource_id):
+    """Page count and page URL pattern for the per-page PDF viewer"""
+    resource = get_object_or_404(Resource, id=resource_id, is_active=True)
+    if not resource.file.name.lower().endswith('.pdf'):
+        raise Http404('Not a PDF resource')
+    try:
+        count = renditions.page_count(resource)
+    except renditions.RenditionUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=501)
+    except Exception as e:
+        logger.error(f"Error reading pages of resource {resource_id}: {str(e)}")
+        return JsonResponse({'error': 'The document could not be read'}, status=500)
+    base_url = reverse('lms:resource_pages', kwargs={'resource_id': resource.id})
+    return JsonResponse({
+        'page_count': count,
+        'page_url': base_url + '{page}.{format}',
+        'formats': list(renditions.FORMATS),
+        'widths': renditions.widths(),
+    })
+
+
+@instrumentation.query_budget(6)
+@require_http_methods(['GET', 'HEAD'])
+def resource_page(request, resource_id, page, fmt):
+    """One page of a PDF resource as a WebP image (?width=N) or a single-page PDF"""
+    resource = get_object_or_404(Resource, id=resource_id, is_active=True)
+    if fmt not in renditions.FORMATS or not resource.file.name.lower().endswith('.pdf'):
+        raise Http404('Unknown page format')
+    try:
+        width = int(request.GET.get('width', 0))
+    except ValueError:
+        width = 0
+    try:
+        path = renditions.render_page(resource, page, fmt, width)
+    except IndexError:
+        raise Http404('Page not found')
+    except renditions.RenditionUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=501)
+    except Exception as e:
+        logger.error(f"Error rendering page {page} of resource {resource_id}: {str(e)}")
+        return JsonResponse({'error': 'The page could not be rendered'}, status=500)
+
+    filename = f"{os.path.splitext(os.path.basename(resource.file.name))[0]}-page-{page}.{fmt}"
+    response, _ = delivery.deliver(request, path, filename=filename, as_attachment=False, content_type=renditions.FORMATS[fmt])
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
+@instrumentation.query_budget(8)
 def view_resource(request, resource_id):
     """View resource details"""
     try:
         resource = get_object_or_404(Resource, id=resource_id, is_active=True)
-        resource.view_count += 1
-        resource.save(update_fields=['view_count'])
+        counters.record_view(resource)
 
         # Determine viewer type based on file extension
         file_extension = os.path.splitext(resource.file.name)[1].lower()
@@ -430,21 +520,27 @@ def view_resource(request, resource_id):
         return render(request, 'lms/error.html', {'message': 'Failed to view resource.'})
 
 
+@instrumentation.query_budget(6)
+@require_http_methods(["GET", "HEAD"])
 def download_resource(request, resource_id):
-    """Download a resource file"""
+    """Download a resource file, supporting byte ranges and conditional requests"""
     try:
         resource = get_object_or_404(Resource, id=resource_id, is_active=True)
-        resource.download_count += 1
-        resource.save(update_fields=['download_count'])
 
-        logger.info(f"Resource {resource_id} downloaded by {request.user.username if request.user.is_authenticated else 'anonymous'}")
+        # Authorisation stays here even when the transfer is offloaded
+        if not resource.can_download(request.user):
+            logger.warning(f"Download of resource {resource_id} denied for {request.user.username if request.user.is_authenticated else 'anonymous'}")
+            return render(request, 'lms/access_denied.html', status=403)
+
         file_path = resource.file.path
         if os.path.exists(file_path):
-            response = FileResponse(
-                open(file_path, 'rb'),
-                content_type='application/octet-stream'
+            response, counts_as_download = delivery.deliver(
+                request, file_path, filename=os.path.basename(resource.file.name)
             )
-            response['Content-Disposition'] = f'attachment; filename="{resource.filename}"'
+            # Revalidations, HEAD and resumed ranges are not new downloads
+            if counts_as_download:
+                counters.record_download(resource)
+                logger.info(f"Resource {resource_id} downloaded by {request.user.username if request.user.is_authenticated else 'anonymous'}")
             return response
         else:
             messages.error(request, "Resource file not found.")
@@ -461,6 +557,23 @@ def download_resource(request, resource_id):
 
 
 
+def _save_uploaded_resource(request, form):
+    """Save a validated ResourceUploadForm; returns the resource and the page to show next"""
+    resource = form.save(commit=False)
+    resource.uploaded_by = request.user
+    resource.file_size = form.cleaned_data['file'].size if form.cleaned_data.get('file') else resource.file_size
+    resource.save()
+    converting = handle_document_upload(resource)
+
+    # Use the grade from the form for the redirect
+    form_grade = form.cleaned_data['grade']
+    logger.info(f"Resource {resource.id} uploaded by {request.user.username} for subject {resource.subject.id}, grade {form_grade.id}")
+    messages.success(request, f'Resource "{resource.title}" uploaded successfully!')
+    if converting:
+        messages.info(request, 'The document is being converted to PDF and will be replaced shortly.')
+    return resource, f"/subject/{form_grade.id}/{resource.subject.id}/?new_resource_id={resource.id}"
+
+
 @login_required
 @user_passes_test(is_admin)
 def upload_resource(request):
@@ -498,16 +611,7 @@ def upload_resource(request):
         form = ResourceUploadForm(request.POST, request.FILES, initial={'subject': subject, 'grade': grade})
         if form.is_valid():
             try:
-                resource = form.save(commit=False)
-                resource.uploaded_by = request.user
-                resource.file_size = request.FILES['file'].size if request.FILES.get('file') else resource.file_size
-                resource.save()
-
-                # Use the grade from the form for the redirect
-                form_grade = form.cleaned_data['grade']
-                logger.info(f"Resource {resource.id} uploaded by {request.user.username} for subject {resource.subject.id}, grade {form_grade.id}")
-                messages.success(request, f'Resource "{resource.title}" uploaded successfully!')
-                next_url = f"/subject/{form_grade.id}/{resource.subject.id}/?new_resource_id={resource.id}"
+                resource, next_url = _save_uploaded_resource(request, form)
                 if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                     return JsonResponse({
                         'success': True,
@@ -539,8 +643,100 @@ def upload_resource(request):
         'form': form,
         'grade': grade,
         'subject': subject,
+        'chunked_upload_threshold': uploads.chunk_threshold(),
     }
     return render(request, 'lms/upload_resource.html', context)
+
+
+def _upload_error(error):
+    payload = {'success': False, 'error': str(error)}
+    if error.offset is not None:
+        payload['offset'] = error.offset
+    return JsonResponse(payload, status=error.status)
+
+
+def _upload_state(session):
+    return {
+        'upload_id': str(session.pk),
+        'offset': session.received,
+        'size': session.size,
+        'status': session.status,
+        'chunk_size': uploads.chunk_size(),
+    }
+
+
+@login_required
+@user_passes_test(is_admin)
+@require_http_methods(['POST'])
+def chunked_upload_start(request):
+    """Open a resumable upload: POST filename and size"""
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'A numeric size is required'}, status=400)
+    try:
+        session = uploads.start(request.user, request.POST.get('filename'), size)
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse({'success': True, **_upload_state(session)}, status=201)
+
+
+@login_required
+@user_passes_test(is_admin)
+@require_http_methods(['GET', 'HEAD', 'PUT', 'DELETE'])
+def chunked_upload(request, upload_id):
+    """GET the offset to resume from, PUT a chunk at ?offset=N, or DELETE to abandon"""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    if session.status in ('complete', 'failed'):
+        return JsonResponse({'success': False, 'error': f'The upload is {session.status}', **_upload_state(session)}, status=410)
+
+    if request.method == 'DELETE':
+        uploads.abort(session)
+        return JsonResponse({'success': True})
+
+    if request.method == 'PUT':
+        try:
+            offset = int(request.GET.get('offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'A numeric offset is required'}, status=400)
+        try:
+            session.received = uploads.write_chunk(
+                session, offset, request, length, request.headers.get('X-Chunk-SHA256')
+            )
+        except uploads.UploadError as e:
+            return _upload_error(e)
+
+    return JsonResponse({'success': True, **_upload_state(session)})
+
+
+@login_required
+@user_passes_test(is_admin)
+@require_http_methods(['POST'])
+def chunked_upload_finalize(request, upload_id):
+    """Create the resource from a finished upload using the normal upload form"""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    try:
+        staged = uploads.finalize(session, request.POST.get('sha256'))
+    except uploads.UploadError as e:
+        return _upload_error(e)
+
+    try:
+        form = ResourceUploadForm(request.POST, {'file': staged})
+        if not form.is_valid():
+            uploads.reopen(session)
+            logger.error(f"Form validation failed: {form.errors}")
+            return JsonResponse({'success': False, 'error': 'Please correct the errors below.', 'errors': form.errors.as_json()}, status=400)
+        resource, next_url = _save_uploaded_resource(request, form)
+    except Exception as e:
+        uploads.reopen(session)
+        logger.error(f"Unexpected error finalizing upload {session.pk}: {str(e)}")
+        return JsonResponse({'success': False, 'error': 'An unexpected error occurred. Please try again.'}, status=500)
+    finally:
+        staged.close()
+
+    uploads.complete(session, resource)
+    return JsonResponse({'success': True, 'redirect_url': f"/loading/?next={next_url}"})
 # @login_required
 # @user_passes_test(is_admin)
 # def upload_resource(request):
@@ -644,7 +840,7 @@ def edit_resource(request, resource_id=None):
             return redirect('lms:grade_level_dashboard')
 
     if request.method == 'POST':
-        form = ResourceUploadForm(request.POST, request.FILES, instance=resource, initial={'subject': subject or resource.subject, 'grade': grade})
+        form = ResourceUploadForm(request.POST, request.FILES, instance=resource, initial={'subject': subject or resource.subject, 'grade': grade or resource.grade})
         if form.is_valid():
             try:
                 resource = form.save(commit=False)
@@ -683,7 +879,7 @@ def edit_resource(request, resource_id=None):
                 return JsonResponse({'success': False, 'error': 'Please correct the errors below.', 'errors': form.errors.as_json()}, status=400)
             messages.error(request, 'Please correct the errors below.')
     else:
-        form = ResourceUploadForm(instance=resource, initial={'subject': subject or resource.subject, 'grade': grade})
+        form = ResourceUploadForm(instance=resource, initial={'subject': subject or resource.subject, 'grade': grade or resource.grade})
 
     context = {
         'form': form,
@@ -733,7 +929,7 @@ def edit_resource(request):
             return redirect('lms:grade_level_dashboard')
 
     if request.method == 'POST':
-        form = ResourceUploadForm(request.POST, request.FILES, instance=resource, initial={'subject': subject or resource.subject, 'grade': grade})
+        form = ResourceUploadForm(request.POST, request.FILES, instance=resource, initial={'subject': subject or resource.subject, 'grade': grade or resource.grade})
         if form.is_valid():
             try:
                 resource = form.save(commit=False)
@@ -743,6 +939,8 @@ def edit_resource(request):
                     resource.file_size = request.FILES['file'].size
                 resource.uploaded_by = request.user
                 resource.save()
+                if request.FILES.get('file'):
+                    handle_document_upload(resource)
 
                 form_grade = form.cleaned_data['grade']
                 logger.info(f"Resource {resource.id} edited by {request.user.username} for subject {resource.subject.id}, grade {form_grade.id}")
@@ -773,7 +971,7 @@ def edit_resource(request):
                 return JsonResponse({'success': False, 'error': 'Please correct the errors below.', 'errors': form.errors.as_json()}, status=400)
             messages.error(request, 'Please correct the errors below.')
     else:
-        form = ResourceUploadForm(instance=resource, initial={'subject': subject or resource.subject, 'grade': grade})
+        form = ResourceUploadForm(instance=resource, initial={'subject': subject or resource.subject, 'grade': grade or resource.grade})
 
     context = {
         'form': form,
@@ -792,8 +990,8 @@ def delete_resource(request, resource_id):
         resource = get_object_or_404(Resource, id=resource_id)
         if request.method == 'POST':
             resource_title = resource.title
-            subject_id = resource.subject.id
-            grade_id = resource.subject.grades.first().id if resource.subject.grades.exists() else None
+            subject_id = resource.subject_id
+            grade_id = resource.grade_id
             resource.delete()
 
             logger.info(f"Resource {resource_id} ({resource_title}) deleted by {request.user.username}")
@@ -1289,19 +1487,27 @@ def admin_delete_pathway(request, pathway_id):
         messages.error(request, 'An error occurred while deleting the pathway.')
         return render(request, 'lms/error.html', {'message': 'Failed to delete pathway.'})
 
+@page_cache.anonymous('category:{category_id}')
 def category_dashboard(request, category_id):
     """Display subjects for a specific category"""
     try:
         category = get_object_or_404(SubjectCategory, id=category_id)
-        subjects = Subject.objects.filter(category=category).order_by('name')
         grades = Grade.objects.filter(subjects__category=category).distinct().order_by('order')
-        resources = Resource.objects.filter(subject__category=category, is_active=True).order_by('-created_at')
+        # The page lists the category's subjects for one grade, ?grade_id or the first
+        grade_id = request.GET.get('grade_id', '')
+        grade = grades.filter(id=grade_id).first() if grade_id.isdigit() else grades.first()
+        if grade is None:
+            raise Http404
+        subjects = Subject.objects.filter(category=category, grades=grade).prefetch_related('grades').order_by('name')
+        resources = Resource.objects.filter(grade=grade, subject__category=category, is_active=True).order_by('-upload_date')
 
         context = {
             'category': category,
+            'grade': grade,
             'subjects': subjects,
             'grades': grades,
             'resources': resources,
+            'resource_counts': stats.grade_subject_counts(grade.id),
         }
 
         return render(request, 'lms/category_dashboard.html', context)
@@ -1315,12 +1521,43 @@ def category_dashboard(request, category_id):
         return render(request, 'lms/error.html', {'message': 'Failed to load category.'})
 
 def resource_list(request):
-    """Display a paginated list of all resources"""
+    """Display a paginated list of all resources; ?format=json returns the page as JSON"""
+    try:
+        per_page = min(max(int(request.GET.get('per_page', 10)), 1), 100)
+    except ValueError:
+        per_page = 10
+    paginator = KeysetPaginator(
+        Resource.objects.filter(is_active=True).select_related('subject', 'grade', 'resource_type'),
+        RECENT_RESOURCE_ORDERING,
+        per_page,
+        total=stats.active_count,
+    )
+    as_json = request.GET.get('format') == 'json'
     try:
-        resources = Resource.objects.filter(is_active=True).select_related('subject', 'resource_type').order_by('-created_at')
-        paginator = Paginator(resources, 10)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor as e:
+        if as_json:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        page_obj = paginator.page()
+
+    try:
+        if as_json:
+            return JsonResponse({
+                'success': True,
+                'resources': [
+                    {
+                        'id': r.id,
+                        'title': r.title,
+                        'subject': r.subject.name,
+                        'type': r.resource_type.name,
+                        'upload_date': r.upload_date.strftime('%Y-%m-%d'),
+                        'download_count': r.download_count,
+                        'url': reverse('lms:view_resource', args=[r.id]),
+                    }
+                    for r in page_obj
+                ],
+                'page': page_obj.meta(),
+            })
 
         context = {
             'page_obj': page_obj,
@@ -1350,236 +1587,33 @@ def debug_grades(request):
 
 # AJAX views for dynamic content loading
 @require_http_methods(["GET"])
-def admin_get_subjects(request):
-    """Get subjects for a specific grade (AJAX)"""
-    grade_id = request.GET.get('grade_id')
-    if grade_id:
-        try:
-            grade = Grade.objects.get(id=grade_id)
-            subjects = Subject.objects.filter(grades=grade).order_by('name')
-            data = [
-                {
-                    'id': subject.id,
-                    'name': subject.name,
-                    'category': subject.category.name if subject.category else ''
-                }
-                for subject in subjects
-            ]
-            return JsonResponse({'subjects': data})
-        except Grade.DoesNotExist:
-            return JsonResponse({'error': 'Grade not found'}, status=404)
-    return JsonResponse({'error': 'Grade ID required'}, status=400)
-
-@require_http_methods(["GET"])
-def admin_get_grades(request):
-    """Get grades for a specific education level (AJAX)"""
-    level_id = request.GET.get('level_id')
-    if level_id:
-        try:
-            level = EducationLevel.objects.get(id=level_id)
-            grades = Grade.objects.filter(education_level=level).order_by('order')
-            data = [
-                {
-                    'id': grade.id,
-                    'name': grade.name,
-                    'order': grade.order
-                }
-                for grade in grades
-            ]
-            return JsonResponse({'grades': data})
-        except EducationLevel.DoesNotExist:
-            return JsonResponse({'error': 'Education level not found'}, status=404)
-    return JsonResponse({'error': 'Level ID required'}, status=400)
-
-@require_http_methods(["GET"])
-def admin_get_education_levels(request):
-    """Get all education levels for admin interface"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_education_levels by {request.user.username}")
-        raise Http404
-
-    try:
-        education_levels = EducationLevel.objects.all().order_by('order')
-        education_level_data = [
-            {
-                'id': el.id,
-                'name': el.name,
-                'description': el.description,
-                'order': el.order,
-                'icon': el.icon
-            }
-            for el in education_levels
-        ]
-        return JsonResponse({'success': True, 'education_levels': education_level_data})
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)})
-
-@require_http_methods(["GET"])
-def admin_get_education_level(request):
-    """Get a specific education level for editing"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_education_level by {request.user.username}")
-        raise Http404
-
-    education_level_id = request.GET.get('education_level_id')
-    if not education_level_id:
-        return JsonResponse({'success': False, 'error': 'Education level ID required'}, status=400)
-
-    try:
-        education_level = EducationLevel.objects.get(id=education_level_id)
-        return JsonResponse({
-            'success': True,
-            'id': education_level.id,
-            'name': education_level.name,
-            'description': education_level.description,
-            'order': education_level.order,
-            'icon': education_level.icon
-        })
-    except EducationLevel.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Education level not found'}, status=404)
-
-@require_http_methods(["GET"])
-def admin_get_grade(request):
-    """Get a specific grade for editing"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_grade by {request.user.username}")
-        raise Http404
-
-    grade_id = request.GET.get('grade_id')
-    if not grade_id:
-        return JsonResponse({'success': False, 'error': 'Grade ID required'}, status=400)
-
-    try:
-        grade = Grade.objects.get(id=grade_id)
-        return JsonResponse({
-            'success': True,
-            'id': grade.id,
-            'name': grade.name,
-            'education_level_id': grade.education_level.id,
-            'order': grade.order,
-            'description': grade.description
-        })
-    except Grade.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Grade not found'}, status=404)
-
-@require_http_methods(["GET"])
-def admin_get_category(request):
-    """Get a specific category for editing"""
+@instrumentation.query_budget(12)
+def admin_read(request):
+    """Batched reads of curriculum entities and resources for the admin UI (see lms.admin_api)"""
     if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_category by {request.user.username}")
+        logger.warning(f"Unauthorized access to admin_read by {request.user.username}")
         raise Http404
 
-    category_id = request.GET.get('category_id')
-    if not category_id:
-        return JsonResponse({'success': False, 'error': 'Category ID required'}, status=400)
-
     try:
-        category = SubjectCategory.objects.get(id=category_id)
-        return JsonResponse({
-            'success': True,
-            'id': category.id,
-            'name': category.name,
-            'description': category.description,
-            'icon': category.icon
-        })
-    except SubjectCategory.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Category not found'}, status=404)
-
-@require_http_methods(["GET"])
-def admin_get_subject(request):
-    """Get a specific subject for editing"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_subject by {request.user.username}")
-        raise Http404
-
-    subject_id = request.GET.get('subject_id')
-    if not subject_id:
-        return JsonResponse({'success': False, 'error': 'Subject ID required'}, status=400)
-
-    try:
-        subject = Subject.objects.get(id=subject_id)
-        return JsonResponse({
-            'success': True,
-            'id': subject.id,
-            'name': subject.name,
-            'category_id': subject.category.id if subject.category else None,
-            'description': subject.description,
-            'grade_ids': [grade.id for grade in subject.grades.all()]
-        })
-    except Subject.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Subject not found'}, status=404)
-
-@require_http_methods(["GET"])
-def admin_get_resource_type(request):
-    """Get a specific resource type for editing"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_resource_type by {request.user.username}")
-        raise Http404
-
-    resource_type_id = request.GET.get('resource_type_id')
-    if not resource_type_id:
-        return JsonResponse({'success': False, 'error': 'Resource type ID required'}, status=400)
-
-    try:
-        resource_type = ResourceType.objects.get(id=resource_type_id)
-        return JsonResponse({
-            'success': True,
-            'id': resource_type.id,
-            'name': resource_type.name,
-            'description': resource_type.description,
-            'mime_type': resource_type.mime_type,
-            'file_extension': resource_type.file_extension
-        })
-    except ResourceType.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Resource type not found'}, status=404)
-
-@require_http_methods(["GET"])
-def admin_get_pathway(request):
-    """Get a specific pathway for editing"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_pathway by {request.user.username}")
-        raise Http404
-
-    pathway_id = request.GET.get('pathway_id')
-    if not pathway_id:
-        return JsonResponse({'success': False, 'error': 'Pathway ID required'}, status=400)
-
-    try:
-        pathway = Pathway.objects.get(id=pathway_id)
-        return JsonResponse({
-            'success': True,
-            'id': pathway.id,
-            'name': pathway.name,
-            'description': pathway.description,
-            'grade_id': pathway.grade.id
-        })
-    except Pathway.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Pathway not found'}, status=404)
-
-@require_http_methods(["GET"])
-def admin_get_resource(request):
-    """Get a specific resource for editing"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_resource by {request.user.username}")
-        raise Http404
-
-    resource_id = request.GET.get('resource_id')
-    if not resource_id:
-        return JsonResponse({'success': False, 'error': 'Resource ID required'}, status=400)
-
-    try:
-        resource = Resource.objects.get(id=resource_id)
-        return JsonResponse({
-            'success': True,
-            'id': resource.id,
-            'title': resource.title,
-            'description': resource.description,
-            'subject_id': resource.subject.id,
-            'resource_type_id': resource.resource_type.id if resource.resource_type else None,
-            'is_active': resource.is_active
-        })
-    except Resource.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Resource not found'}, status=404)
+        spec = admin_api.parse(request.GET)
+    except admin_api.BadRequest as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    version = admin_api.data_version()
+    etag = admin_api.version_etag(spec, version)
+    if etag is not None and etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        body = admin_api.read(spec, version)
+        etag = etag or admin_api.body_etag(body)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['X-Data-Version'] = version
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @require_http_methods(["POST"])
 @csrf_exempt
@@ -1609,77 +1643,13 @@ def admin_toggle_download(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-@require_http_methods(["GET"])
-def admin_get_resource_types(request):
-    """Get all resource types for admin interface"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_resource_types by {request.user.username}")
-        raise Http404
-
-    try:
-        resource_types = ResourceType.objects.all().order_by('name')
-        resource_type_data = [
-            {
-                'id': rt.id,
-                'name': rt.name,
-                'description': rt.description,
-                'mime_type': rt.mime_type,
-                'file_extension': rt.file_extension
-            }
-            for rt in resource_types
-        ]
-        return JsonResponse({'success': True, 'resource_types': resource_type_data})
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=500)
-
-@require_http_methods(["GET"])
-def admin_get_pathways(request):
-    """Get all pathways for admin interface"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_pathways by {request.user.username}")
-        raise Http404
-
-    try:
-        pathways = Pathway.objects.all().order_by('name')
-        pathway_data = [
-            {
-                'id': p.id,
-                'name': p.name,
-                'description': p.description,
-                'grade_id': p.grade.id if p.grade else None
-            }
-            for p in pathways
-        ]
-        return JsonResponse({'success': True, 'pathways': pathway_data})
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=500)
-
-@require_http_methods(["GET"])
-def admin_get_categories(request):
-    """Get all categories for admin interface"""
-    if not request.user.is_staff:
-        logger.warning(f"Unauthorized access to admin_get_categories by {request.user.username}")
-        raise Http404
-
-    try:
-        categories = SubjectCategory.objects.all().order_by('name')
-        category_data = [
-            {
-                'id': c.id,
-                'name': c.name,
-                'description': c.description,
-                'icon': c.icon
-            }
-            for c in categories
-        ]
-        return JsonResponse({'success': True, 'categories': category_data})
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=500)
-
+@instrumentation.query_budget(16)
 def search(request):
     """Search for resources, subjects, and grades"""
     query = request.GET.get('q', '').strip()
     resource_type = request.GET.get('type', '')
+    grade_id = request.GET.get('grade', '')
+    level_id = request.GET.get('level', '')
 
     results = {
         'resources': [],
@@ -1687,53 +1657,49 @@ def search(request):
         'grades': [],
         'education_levels': []
     }
+    page_obj = None
+    corrected_query = None
+    tree = curriculum.get_tree()
 
     if query:
-        resource_query = Resource.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query)
-        ).filter(is_active=True)
-
-        if resource_type:
-            resource_query = resource_query.filter(resource_type__id=resource_type)
-
-        resources = resource_query.select_related('subject', 'uploaded_by')[:10]
-        results['resources'] = [
-            {
+        matches = search_index.search_resources(query, resource_type, grade_id, level_id)
+        if not matches.count():
+            # Nothing matched as typed; retry with misspelled terms corrected
+            corrected = suggest.correct_query(query)
+            if corrected:
+                matches = search_index.search_resources(corrected, resource_type, grade_id, level_id)
+                corrected_query = corrected
+        paginator = Paginator(matches, getattr(settings, 'LMS_SEARCH_PAGE_SIZE', 20))
+        page_obj = paginator.get_page(request.GET.get('page'))
+
+        results['resources'] = []
+        for r in page_obj.object_list:
+            grade = tree.grade(r.grade_id)
+            results['resources'].append({
                 'id': r.id,
                 'title': r.title,
                 'description': r.description,
                 'subject': r.subject.name,
-                'grade': r.subject.grades.first().name if r.subject.grades.exists() else '',
-                'type': r.get_resource_type_display(),
+                'grade': grade.name if grade else '',
+                'type': r.resource_type.name,
                 'uploaded_by': r.uploaded_by.username,
                 'upload_date': r.upload_date.strftime('%Y-%m-%d'),
-                'url': f'/subject/{r.subject.grades.first().id}/{r.subject.id}/'
-            }
-            for r in resources
-        ]
+                'url': f'/subject/{grade.id}/{r.subject_id}/' if grade else '#'
+            })
 
-        subjects = Subject.objects.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query)
-        ).prefetch_related('grades')[:10]
+        curriculum_matches = search_index.search_curriculum(corrected_query or query)
 
         results['subjects'] = [
             {
                 'id': s.id,
                 'name': s.name,
                 'description': s.description,
-                'grades': [g.name for g in s.grades.all()],
-                'url': f'/subject/{s.grades.first().id}/{s.id}/' if s.grades.exists() else '#'
+                'grades': [g.name for g in s.grades],
+                'url': f'/subject/{s.grades.first().id}/{s.id}/' if s.grades else '#'
             }
-            for s in subjects
+            for s in curriculum_matches['subjects']
         ]
 
-        grades = Grade.objects.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query)
-        ).select_related('education_level')[:10]
-
         results['grades'] = [
             {
                 'id': g.id,
@@ -1742,14 +1708,9 @@ def search(request):
                 'education_level': g.education_level.name,
                 'url': f'/grade/{g.id}/'
             }
-            for g in grades
+            for g in curriculum_matches['grades']
         ]
 
-        education_levels = EducationLevel.objects.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query)
-        )[:10]
-
         results['education_levels'] = [
             {
                 'id': el.id,
@@ -1757,18 +1718,60 @@ def search(request):
                 'description': el.description,
                 'url': f'/education-level/{el.id}/'
             }
-            for el in education_levels
+            for el in curriculum_matches['education_levels']
         ]
 
     context = {
         'query': query,
+        'corrected_query': corrected_query,
         'results': results,
+        'page_obj': page_obj,
         'resource_type': resource_type,
+        'grade_id': grade_id,
+        'level_id': level_id,
         'all_resource_types': ResourceType.objects.all(),
+        'all_education_levels': tree.levels,
     }
 
     return render(request, 'lms/search_results.html', context)
 
+@instrumentation.query_budget(10)
+@require_http_methods(["GET"])
+def search_suggest(request):
+    """Typo-tolerant autocomplete suggestions as JSON"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+
+    try:
+        started = time.perf_counter()
+        suggestions = suggest.suggest(query, limit) if query else []
+        return JsonResponse({
+            'success': True,
+            'query': query,
+            'suggestions': suggestions,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+        })
+    except Exception as e:
+        logger.error(f"Error building suggestions for '{query}': {str(e)}")
+        return JsonResponse({'success': False, 'error': 'Failed to load suggestions'}, status=500)
+
+@require_http_methods(['GET'])
+def metrics(request):
+    """Request metrics of every worker in the Prometheus text format"""
+    # Empty by default: behind a reverse proxy on the same host every request
+    # arrives from 127.0.0.1, so no address can be trusted unless configured
+    allowed = getattr(settings, 'LMS_METRICS_ALLOWED_IPS', [])
+    # REMOTE_ADDR only: a forwarded header would let anyone claim to be local
+    if request.META.get('REMOTE_ADDR') not in allowed and not request.user.is_staff:
+        raise Http404()
+    return HttpResponse(
+        instrumentation.render_prometheus(instrumentation.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
 def my_downloads(request):
     """Display user's downloaded resources"""
     if not request.user.is_authenticated:
@@ -2436,6 +2439,38 @@ def admin_toggle_resource_visibility(request):
         logger.error(f"Error toggling resource visibility {resource_id}: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+@require_http_methods(["POST"])
+def admin_bulk_resources(request):
+    """Apply a bulk change to resources picked by ids and/or filters (AJAX, see lms.bulk)"""
+    if not request.user.is_staff:
+        logger.warning(f"Unauthorized access to admin_bulk_resources by {request.user.username}")
+        return JsonResponse({'success': False, 'error': 'Unauthorized'}, status=403)
+
+    action = request.POST.get('action')
+    if action != 'move' and action not in bulk.FLAG_ACTIONS:
+        return JsonResponse({'success': False, 'error': f'Unknown action {action}'}, status=400)
+    try:
+        ids = request.POST.get('ids')
+        ids = [int(pk) for pk in ids.split(',') if pk.strip()] if ids else None
+        filters = {name: int(request.POST[name]) for name in bulk.FILTERS if request.POST.get(name)}
+        if action == 'move':
+            subject_id = int(request.POST.get('subject_id', ''))
+            grade_id = int(request.POST['grade_id']) if request.POST.get('grade_id') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'ids, filters, subject_id and grade_id must be numeric'}, status=400)
+
+    try:
+        resources = bulk.select(ids, **filters)
+        if action == 'move':
+            updated = bulk.move(resources, subject_id, grade_id)
+        else:
+            updated = bulk.set_flags(resources, **bulk.FLAG_ACTIONS[action][1])
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    logger.info(f"Bulk {action} changed {updated} resources, by {request.user.username}")
+    return JsonResponse({'success': True, 'action': action, 'updated': updated})
+
 @require_http_methods(["GET"])
 def get_resource_stats(request):
     """Get statistics for a specific resource (AJAX)"""
@@ -2445,9 +2480,10 @@ def get_resource_stats(request):
 
     try:
         resource = Resource.objects.get(id=resource_id)
+        pending = counters.pending_counts(resource.id)
         stats = {
-            'view_count': resource.view_count,
-            'download_count': resource.download_count,
+            'view_count': resource.view_count + pending[counters.VIEW_COUNT],
+            'download_count': resource.download_count + pending[counters.DOWNLOAD_COUNT],
             'upload_date': resource.upload_date.strftime('%Y-%m-%d'),
             'last_download': resource.download_logs.order_by('-downloaded_at').first().downloaded_at.strftime('%Y-%m-%d %H:%M:%S') if resource.download_logs.exists() else None
         }